@@ -1,10 +1,24 @@
 import streamlit as st
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import tempfile
 import os
+import config
 from src.audio_handler import AudioHandler
 from src.stt_engine import STTEngine
+from src.translator import Translator
+from src.tts_engine import TTSEngine
+from src.preloader import ModelPreloader
+from src.stt_scheduler import STTBatchScheduler
+from src.worker_pool import get_worker_pool
+from src import multipart_stream
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("api_server")
 
 # ایجاد Flask app برای API
 api_app = Flask(__name__)
@@ -12,16 +26,49 @@ api_app = Flask(__name__)
 # ایجاد instance های سراسری
 audio_handler = None
 stt_engine = None
+translator = None
+tts_engine = None
+preloader = None
+stt_scheduler = None
 
 def initialize_api_components():
     """راه‌اندازی کامپوننت‌های API"""
-    global audio_handler, stt_engine
+    global audio_handler, stt_engine, translator, tts_engine, preloader, stt_scheduler
     
     if audio_handler is None:
         audio_handler = AudioHandler()
     
     if stt_engine is None:
         stt_engine = STTEngine()
+    
+    # با فعال بودن worker pool، ترجمه و سنتز (مثل batch های STT) در process های
+    # استنتاج اجرا می‌شوند و translator و tts_engine نماینده همان اجزا در pool هستند
+    pool = get_worker_pool()
+    if pool is not None:
+        pool.start()
+    
+    if translator is None:
+        translator = pool.engine('translator', timeout=config.API_REQUEST_TIMEOUT) if pool is not None else Translator()
+    
+    if tts_engine is None:
+        tts_engine = pool.engine('tts', timeout=config.API_REQUEST_TIMEOUT) if pool is not None else TTSEngine()
+    
+    if preloader is None:
+        # با فعال بودن worker pool مدل‌ها در process های استنتاج بارگذاری و warmup می‌شوند؛
+        # Whisper محلی (فقط برای جلسات WebSocket) پیش از نیاز بارگذاری نمی‌شود
+        preloader = ModelPreloader({} if pool is not None else {
+            'stt_engine': stt_engine,
+            'translator': translator,
+            'tts_engine': tts_engine
+        })
+    
+    if stt_scheduler is None:
+        # درخواست‌های همزمان در batch های کوچک به Whisper داده می‌شوند؛ با فعال بودن
+        # worker pool هر batch در کم‌بارترین process استنتاج اجرا می‌شود
+        if pool is not None:
+            stt_scheduler = STTBatchScheduler(pool.engine('stt'), concurrency=pool.num_workers)
+        else:
+            stt_scheduler = STTBatchScheduler(stt_engine)
 
 @api_app.route('/api/microphone-permission', methods=['POST'])
 def handle_microphone_permission():
@@ -40,13 +87,17 @@ def handle_microphone_permission():
 def process_audio():
     """پردازش فایل صوتی ضبط شده از مرورگر"""
     try:
-        # بررسی وجود فایل صوتی
-        if 'audio' not in request.files:
-            return jsonify({'success': False, 'error': 'فایل صوتی یافت نشد'})
-        
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
-            return jsonify({'success': False, 'error': 'فایل صوتی انتخاب نشده'})
+        # بدنه خام audio/* مستقیماً از جریان درخواست رمزگشایی می‌شود (حین دریافت)
+        if request.mimetype.startswith('audio/'):
+            audio_file = request.stream
+        else:
+            # بررسی وجود فایل صوتی
+            if 'audio' not in request.files:
+                return jsonify({'success': False, 'error': 'فایل صوتی یافت نشد'})
+            
+            audio_file = request.files['audio']
+            if audio_file.filename == '':
+                return jsonify({'success': False, 'error': 'فایل صوتی انتخاب نشده'})
         
         # راه‌اندازی کامپوننت‌ها
         initialize_api_components()
@@ -58,12 +109,12 @@ def process_audio():
             return jsonify({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
         
         # بررسی حداقل مدت زمان صوتی
-        duration = len(audio_data) / 16000
+        duration = audio_data.duration
         if duration < 0.5:  # حداقل 0.5 ثانیه
             return jsonify({'success': False, 'error': 'مدت زمان صوتی کافی نیست'})
         
         # تشخیص گفتار
-        transcribed_text = stt_engine.transcribe(audio_data)
+        transcribed_text = stt_scheduler.transcribe(audio_data, timeout=config.API_REQUEST_TIMEOUT)
         
         if transcribed_text:
             return jsonify({
@@ -75,6 +126,8 @@ def process_audio():
         else:
             return jsonify({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
             
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': 'زمان پردازش درخواست به پایان رسید'}), 504
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -82,13 +135,17 @@ def process_audio():
 def process_uploaded_audio():
     """پردازش فایل صوتی آپلود شده"""
     try:
-        # بررسی وجود فایل صوتی
-        if 'audio' not in request.files:
-            return jsonify({'success': False, 'error': 'فایل صوتی یافت نشد'})
-        
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
-            return jsonify({'success': False, 'error': 'فایل صوتی انتخاب نشده'})
+        # بدنه خام audio/* مستقیماً از جریان درخواست رمزگشایی می‌شود (حین دریافت)
+        if request.mimetype.startswith('audio/'):
+            audio_file = request.stream
+        else:
+            # بررسی وجود فایل صوتی
+            if 'audio' not in request.files:
+                return jsonify({'success': False, 'error': 'فایل صوتی یافت نشد'})
+            
+            audio_file = request.files['audio']
+            if audio_file.filename == '':
+                return jsonify({'success': False, 'error': 'فایل صوتی انتخاب نشده'})
         
         # راه‌اندازی کامپوننت‌ها
         initialize_api_components()
@@ -100,41 +157,228 @@ def process_uploaded_audio():
             return jsonify({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
         
         # تشخیص گفتار
-        transcribed_text = stt_engine.transcribe(audio_data)
+        transcribed_text = stt_scheduler.transcribe(audio_data, timeout=config.API_REQUEST_TIMEOUT)
         
         if transcribed_text:
             return jsonify({
                 'success': True,
                 'transcription': transcribed_text,
-                'duration': len(audio_data) / 16000  # مدت زمان بر حسب ثانیه
+                'duration': audio_data.duration  # مدت زمان بر حسب ثانیه
             })
         else:
             return jsonify({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
             
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': 'زمان پردازش درخواست به پایان رسید'}), 504
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@api_app.route('/api/synthesize', methods=['POST'])
+def synthesize_speech():
+    """سنتز جریانی متن انگلیسی: PCM هر جمله به محض آماده شدن ارسال می‌شود"""
+    try:
+        data = request.get_json(silent=True) or {}
+        text = data.get('text', '')
+        if not text.strip():
+            return jsonify({'success': False, 'error': 'متنی برای سنتز ارسال نشده'})
+        
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+        
+        # اولین chunk پیش از ارسال هدرها گرفته می‌شود؛ نرخ نمونه از خود صدا خوانده می‌شود
+        # (موتور ممکن است در worker pool باشد)
+        chunks = tts_engine.synthesize_stream(text)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return jsonify({'success': False, 'error': 'خطا در سنتز گفتار'})
+        
+        def body():
+            yield first_chunk.tobytes()
+            for chunk in chunks:
+                yield chunk.tobytes()
+        
+        # PCM خام 16 بیتی little-endian مونو با انتقال chunked
+        return Response(
+            stream_with_context(body()),
+            mimetype=multipart_stream.pcm_content_type(first_chunk.sample_rate),
+            headers={'X-Sample-Rate': str(first_chunk.sample_rate)}
+        )
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@api_app.route('/api/translate', methods=['POST'])
+def translate_audio():
+    """
+    خط لوله کامل روی سرور (STT → ترجمه → TTS) در یک درخواست: پاسخ multipart جریانی
+    شامل متن فارسی، سپس متن انگلیسی و سپس صدای هر جمله به محض سنتز
+    """
+    try:
+        # بدنه خام audio/* مستقیماً از جریان درخواست رمزگشایی می‌شود (حین دریافت)
+        if request.mimetype.startswith('audio/'):
+            audio_file = request.stream
+        else:
+            # بررسی وجود فایل صوتی
+            if 'audio' not in request.files:
+                return jsonify({'success': False, 'error': 'فایل صوتی یافت نشد'})
+            
+            audio_file = request.files['audio']
+            if audio_file.filename == '':
+                return jsonify({'success': False, 'error': 'فایل صوتی انتخاب نشده'})
+        
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+        
+        # پردازش فایل صوتی و تشخیص گفتار پیش از شروع پاسخ
+        audio_data = audio_handler.process_uploaded_audio(audio_file)
+        
+        if audio_data is None:
+            return jsonify({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
+        
+        transcribed_text = stt_scheduler.transcribe(audio_data, timeout=config.API_REQUEST_TIMEOUT)
+        
+        if not transcribed_text:
+            return jsonify({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
+        
+        def generate():
+            yield multipart_stream.text_part('transcription', transcribed_text)
+            try:
+                translated_text = translator.translate(transcribed_text)
+                if not translated_text:
+                    # ترجمه خالی برای متن غیرخالی یعنی خطای مترجم (translate خطا را با "" پنهان می‌کند)، نه سکوت
+                    yield multipart_stream.error_part('خطا در ترجمه متن')
+                    yield multipart_stream.end()
+                    return
+                yield multipart_stream.text_part('translation', translated_text)
+                
+                for chunk in tts_engine.synthesize_stream(translated_text):
+                    yield multipart_stream.audio_part(chunk)
+            except FutureTimeoutError:
+                yield multipart_stream.error_part('زمان پردازش درخواست به پایان رسید')
+            except Exception as e:
+                yield multipart_stream.error_part(str(e))
+            yield multipart_stream.end()
+        
+        return Response(stream_with_context(generate()), mimetype=multipart_stream.CONTENT_TYPE)
+        
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': 'زمان پردازش درخواست به پایان رسید'}), 504
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def _is_ready():
+    """
+    آمادگی دریافت ترافیک: بدون worker pool، بارگذاری و warmup مدل‌های محلی؛ با worker pool
+    (که process اصلی مدلی از پیش بارگذاری نمی‌کند)، بارگذاری و warmup موفق تمام مدل‌های
+    تمام worker ها
+    """
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.is_ready()
+    return preloader is not None and preloader.is_ready()
+
+def _model_status():
+    """وضعیت بارگذاری/warmup هر مدل؛ با worker pool به تفکیک هر worker"""
+    pool = get_worker_pool()
+    if pool is not None:
+        return {f"worker-{worker['index']}": worker['models'] for worker in pool.get_stats()['processes']}
+    return preloader.get_status() if preloader is not None else {}
+
 @api_app.route('/api/health', methods=['GET'])
 def health_check():
-    """بررسی وضعیت API"""
+    """بررسی وضعیت API و وضعیت بارگذاری/warmup هر مدل"""
+    model_status = _model_status()
     return jsonify({
         'status': 'healthy',
+        'ready': _is_ready(),
         'components': {
             'audio_handler': audio_handler is not None,
-            'stt_engine': stt_engine is not None
-        }
+            'stt_engine': stt_engine is not None,
+            'translator': translator is not None,
+            'tts_engine': tts_engine is not None
+        },
+        'models': model_status,
+        'stt_batching': stt_scheduler.get_stats() if stt_scheduler is not None else None,
+        'worker_pool': get_worker_pool().get_stats() if get_worker_pool() is not None else None
     })
 
-def run_api_server(port=5000):
+@api_app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """آمادگی دریافت ترافیک: فقط پس از بارگذاری و warmup تمام مدل‌ها 200 برمی‌گرداند"""
+    if _is_ready():
+        return jsonify({'ready': True})
+    
+    model_status = _model_status()
+    pool = get_worker_pool()
+    return jsonify({
+        'ready': False,
+        'models': model_status,
+        'worker_pool': pool.get_stats() if pool is not None else None
+    }), 503
+
+@api_app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """metric های process با قالب متنی Prometheus"""
+    if not config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.registry.render(), content_type=metrics.registry.content_type)
+
+@api_app.route('/api/trace', methods=['GET'])
+def trace_endpoint():
+    """trace های اخیر با قالب Chrome trace-event (برای باز کردن در ui.perfetto.dev)"""
+    if not tracing.tracer.enabled:
+        return jsonify({'error': 'Tracing is disabled'}), 404
+    return jsonify(tracing.tracer.to_chrome_trace())
+
+@api_app.before_request
+def _start_request_timer():
+    g.request_start_time = time.perf_counter()
+    # trace هر درخواست POST در context همین thread فعال می‌ماند تا پایان درخواست
+    # (برای پاسخ‌های جریانی، تا آخرین بخش)
+    if request.method == 'POST' and tracing.tracer.enabled:
+        g.trace = tracing.start_trace(request.path)
+        g.trace_token = tracing.activate(g.trace)
+
+@api_app.teardown_request
+def _finish_request_trace(error=None):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        tracing.record(trace, 'request', g.request_start_time, time.perf_counter(), path=request.path)
+        tracing.deactivate(g.pop('trace_token'))
+
+@api_app.after_request
+def _record_request_metrics(response):
+    """ثبت تعداد، وضعیت و تأخیر درخواست پس از ارسال کامل پاسخ (برای پاسخ‌های جریانی، تا آخرین بخش)"""
+    if not config.METRICS_ENABLED:
+        return response
+
+    # مسیرهای ناشناخته با یک برچسب شمرده می‌شوند تا تعداد سری‌ها محدود بماند
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'other'
+    status = response.status_code
+    start_time = g.request_start_time
+    response.call_on_close(
+        lambda: metrics.observe_request(endpoint, status, time.perf_counter() - start_time)
+    )
+    return response
+
+def run_api_server(port=None):
     """اجرای سرور API"""
     try:
-        api_app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+        api_app.run(host='0.0.0.0', port=port or config.API_PORT, debug=False, threaded=True)
     except Exception as e:
-        print(f"Error running API server: {e}")
+        logger.error("Error running API server", error=str(e))
 
 # اجرای API در thread جداگانه
 def start_api_server():
-    """شروع سرور API در thread جداگانه"""
+    """شروع سرور API در thread جداگانه (سرور asyncio یا Flask بر اساس config.API_SERVER)"""
+    if config.API_SERVER == "asgi":
+        import asgi_server
+        return asgi_server.start_api_server()
+    
+    initialize_api_components()
+    if config.PRELOAD_MODELS:
+        preloader.start()
+    
     api_thread = threading.Thread(target=run_api_server, daemon=True)
     api_thread.start()
-    print(f"API server started on port 5000")
+    logger.info("API server started", port=config.API_PORT)
@@ -58,6 +58,7 @@ st.markdown("""
 <link rel="stylesheet" href="static/css/audio_recorder.css">
 <script src="static/js/audio_recorder.js"></script>
 <script src="static/js/streamlit_audio_recorder.js"></script>
+<script src="static/js/streaming_client.js"></script>
 """, unsafe_allow_html=True)
 
 # کلاس اصلی برنامه
@@ -245,6 +246,24 @@ class LinguaStreamApp:
                                             border-radius: 10px; width: 0%; transition: width 0.1s;">
                 </div>
             </div>
+            
+            <!-- ترجمه زنده: صدا به صورت پیوسته از طریق WebSocket ارسال می‌شود -->
+            <div style="text-align: center; margin: 20px 0;">
+                <button id="liveStartBtn" onclick="startLiveTranslation()" 
+                        style="background: #1E88E5; color: white; border: none; 
+                               padding: 15px 30px; border-radius: 50px; font-size: 18px; 
+                               cursor: pointer; margin: 10px;">
+                    🔴 ترجمه زنده
+                </button>
+                <button id="liveStopBtn" onclick="stopLiveTranslation()" 
+                        style="background: #666; color: white; border: none; 
+                               padding: 15px 30px; border-radius: 50px; font-size: 18px; 
+                               cursor: pointer; margin: 10px; display: none;">
+                    ⏹️ توقف ترجمه زنده
+                </button>
+            </div>
+            <div id="liveTranscript" class="transcribed-text"></div>
+            <div id="liveTranslation" class="transcribed-text" style="direction: ltr; text-align: left; margin-top: 10px;"></div>
         </div>
         
         <script>
@@ -357,7 +376,7 @@ class LinguaStreamApp:
                 return
             
             # بررسی حداقل مدت زمان صوتی
-            duration = len(audio_data) / config.SAMPLE_RATE
+            duration = audio_data.duration
             if duration < config.MIN_AUDIO_DURATION:
                 st.warning(f"⚠️ مدت زمان صوتی کافی نیست. حداقل {config.MIN_AUDIO_DURATION} ثانیه نیاز است.")
                 return
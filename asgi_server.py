@@ -0,0 +1,526 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import config
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+from src.audio_handler import AudioHandler
+from src.stt_engine import STTEngine
+from src.translator import Translator
+from src.tts_engine import TTSEngine
+from src.preloader import ModelPreloader
+from src.inference_executor import InferenceExecutor, ServerOverloaded
+from src.audio_buffer import AudioBuffer
+from src.streaming_session import StreamingSession
+from src.stt_scheduler import STTBatchScheduler
+from src.worker_pool import get_worker_pool
+from src import multipart_stream
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("asgi_server")
+
+# نسخه asyncio سرور API با همان مسیرهای api_server.py؛ استنتاج در یک thread pool
+# محدود اجرا می‌شود تا در بار ناگهانی، درخواست‌های اضافه به جای رقابت روی مدل رد شوند
+
+# ایجاد instance های سراسری
+audio_handler = None
+stt_engine = None
+translator = None
+tts_engine = None
+preloader = None
+executor = None
+stt_scheduler = None
+
+def initialize_api_components():
+    """راه‌اندازی کامپوننت‌های API"""
+    global audio_handler, stt_engine, translator, tts_engine, preloader, executor, stt_scheduler
+
+    if audio_handler is None:
+        audio_handler = AudioHandler()
+
+    if stt_engine is None:
+        stt_engine = STTEngine()
+
+    # با فعال بودن worker pool، ترجمه و سنتز (مثل batch های STT) در process های
+    # استنتاج اجرا می‌شوند و translator و tts_engine نماینده همان اجزا در pool هستند
+    pool = get_worker_pool()
+    if pool is not None:
+        pool.start()
+
+    if translator is None:
+        translator = pool.engine('translator', timeout=config.API_REQUEST_TIMEOUT) if pool is not None else Translator()
+
+    if tts_engine is None:
+        tts_engine = pool.engine('tts', timeout=config.API_REQUEST_TIMEOUT) if pool is not None else TTSEngine()
+
+    if preloader is None:
+        # با فعال بودن worker pool مدل‌ها در process های استنتاج بارگذاری و warmup می‌شوند؛
+        # Whisper محلی (فقط برای جلسات WebSocket) پیش از نیاز بارگذاری نمی‌شود
+        preloader = ModelPreloader({} if pool is not None else {
+            'stt_engine': stt_engine,
+            'translator': translator,
+            'tts_engine': tts_engine
+        })
+
+    if executor is None:
+        executor = InferenceExecutor()
+
+    if stt_scheduler is None:
+        # درخواست‌های همزمان در batch های کوچک به Whisper داده می‌شوند؛ با فعال بودن
+        # worker pool هر batch در کم‌بارترین process استنتاج اجرا می‌شود
+        if pool is not None:
+            stt_scheduler = STTBatchScheduler(pool.engine('stt'), concurrency=pool.num_workers)
+        else:
+            stt_scheduler = STTBatchScheduler(stt_engine)
+
+def _overloaded_response(error):
+    return JSONResponse(
+        {'success': False, 'error': 'سرور مشغول است، لطفاً کمی بعد دوباره تلاش کنید'},
+        status_code=503,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+def _timeout_response():
+    return JSONResponse({'success': False, 'error': 'زمان پردازش درخواست به پایان رسید'}, status_code=504)
+
+async def _read_audio_file(request):
+    """
+    دریافت فایل صوتی از form-data (فیلد audio) یا بدنه خام audio/*؛
+    در صورت خطا (None, پیام خطا) برمی‌گرداند
+    """
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('audio/'):
+        return io.BytesIO(await request.body()), None
+
+    form = await request.form()
+    audio_file = form.get('audio')
+    # بررسی وجود فایل صوتی
+    if audio_file is None or not hasattr(audio_file, 'file'):
+        return None, 'فایل صوتی یافت نشد'
+    if not audio_file.filename:
+        return None, 'فایل صوتی انتخاب نشده'
+    return audio_file.file, None
+
+async def _transcribe_upload(audio_file):
+    """
+    رمزگشایی در thread pool استنتاج و تشخیص گفتار از طریق زمان‌بند batch؛ انتظار
+    برای نتیجه batch هیچ thread ی از pool را اشغال نمی‌کند
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.API_REQUEST_TIMEOUT
+
+    audio_data = await executor.run(
+        audio_handler.process_uploaded_audio, audio_file, timeout=config.API_REQUEST_TIMEOUT
+    )
+    if audio_data is None:
+        return None, ""
+
+    future = asyncio.wrap_future(stt_scheduler.submit(audio_data))
+    return audio_data, await asyncio.wait_for(future, max(0.0, deadline - loop.time()))
+
+async def handle_microphone_permission(request):
+    """مدیریت درخواست دسترسی میکروفن"""
+    try:
+        data = await request.json()
+        if data and data.get('granted'):
+            return JSONResponse({'success': True, 'message': 'دسترسی میکروفن تأیید شد'})
+        else:
+            return JSONResponse({'success': False, 'error': 'دسترسی میکروفن رد شد'})
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+async def process_audio(request):
+    """پردازش فایل صوتی ضبط شده از مرورگر"""
+    try:
+        audio_file, error = await _read_audio_file(request)
+        if error:
+            return JSONResponse({'success': False, 'error': error})
+
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+
+        audio_data, transcribed_text = await _transcribe_upload(audio_file)
+
+        if audio_data is None:
+            return JSONResponse({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
+
+        # بررسی حداقل مدت زمان صوتی
+        duration = audio_data.duration
+        if duration < 0.5:  # حداقل 0.5 ثانیه
+            return JSONResponse({'success': False, 'error': 'مدت زمان صوتی کافی نیست'})
+
+        if transcribed_text:
+            return JSONResponse({
+                'success': True,
+                'transcription': transcribed_text,
+                'duration': duration,
+                'file_size': len(audio_data)
+            })
+        else:
+            return JSONResponse({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
+
+    except ServerOverloaded as e:
+        return _overloaded_response(e)
+    except asyncio.TimeoutError:
+        return _timeout_response()
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+async def process_uploaded_audio(request):
+    """پردازش فایل صوتی آپلود شده"""
+    try:
+        audio_file, error = await _read_audio_file(request)
+        if error:
+            return JSONResponse({'success': False, 'error': error})
+
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+
+        audio_data, transcribed_text = await _transcribe_upload(audio_file)
+
+        if audio_data is None:
+            return JSONResponse({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
+
+        if transcribed_text:
+            return JSONResponse({
+                'success': True,
+                'transcription': transcribed_text,
+                'duration': audio_data.duration  # مدت زمان بر حسب ثانیه
+            })
+        else:
+            return JSONResponse({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
+
+    except ServerOverloaded as e:
+        return _overloaded_response(e)
+    except asyncio.TimeoutError:
+        return _timeout_response()
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+async def synthesize_speech(request):
+    """سنتز جریانی متن انگلیسی: PCM هر جمله به محض آماده شدن ارسال می‌شود"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+        text = (data or {}).get('text', '')
+        if not text.strip():
+            return JSONResponse({'success': False, 'error': 'متنی برای سنتز ارسال نشده'})
+
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+
+        chunks = executor.iterate(tts_engine.synthesize_stream(text), timeout=config.API_REQUEST_TIMEOUT)
+        # اولین chunk پیش از ارسال هدرها گرفته می‌شود تا 503 هنوز قابل برگرداندن باشد؛
+        # نرخ نمونه از خود صدا خوانده می‌شود (موتور ممکن است در worker pool باشد)
+        first_chunk = await chunks.__anext__()
+
+        async def body():
+            yield first_chunk.tobytes()
+            async for chunk in chunks:
+                yield chunk.tobytes()
+
+        # PCM خام 16 بیتی little-endian مونو با انتقال chunked
+        return StreamingResponse(
+            body(),
+            media_type=multipart_stream.pcm_content_type(first_chunk.sample_rate),
+            headers={'X-Sample-Rate': str(first_chunk.sample_rate)}
+        )
+
+    except StopAsyncIteration:
+        return JSONResponse({'success': False, 'error': 'خطا در سنتز گفتار'})
+    except ServerOverloaded as e:
+        return _overloaded_response(e)
+    except asyncio.TimeoutError:
+        return _timeout_response()
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+async def translate_audio(request):
+    """
+    خط لوله کامل روی سرور (STT → ترجمه → TTS) در یک درخواست: پاسخ multipart جریانی
+    شامل متن فارسی، سپس متن انگلیسی و سپس صدای هر جمله به محض سنتز
+    """
+    try:
+        audio_file, error = await _read_audio_file(request)
+        if error:
+            return JSONResponse({'success': False, 'error': error})
+
+        # راه‌اندازی کامپوننت‌ها
+        initialize_api_components()
+
+        # تا پایان تشخیص گفتار هنوز می‌توان 503/504 برگرداند
+        audio_data, transcribed_text = await _transcribe_upload(audio_file)
+
+        if audio_data is None:
+            return JSONResponse({'success': False, 'error': 'خطا در پردازش فایل صوتی'})
+        if not transcribed_text:
+            return JSONResponse({'success': False, 'error': 'هیچ متنی تشخیص داده نشد'})
+
+        async def body():
+            yield multipart_stream.text_part('transcription', transcribed_text)
+            try:
+                translated_text = await executor.run(
+                    translator.translate, transcribed_text, timeout=config.API_REQUEST_TIMEOUT
+                )
+                if not translated_text:
+                    # ترجمه خالی برای متن غیرخالی یعنی خطای مترجم (translate خطا را با "" پنهان می‌کند)، نه سکوت
+                    yield multipart_stream.error_part('خطا در ترجمه متن')
+                    yield multipart_stream.end()
+                    return
+                yield multipart_stream.text_part('translation', translated_text)
+
+                chunks = executor.iterate(
+                    tts_engine.synthesize_stream(translated_text), timeout=config.API_REQUEST_TIMEOUT
+                )
+                async for chunk in chunks:
+                    yield multipart_stream.audio_part(chunk)
+            except ServerOverloaded:
+                yield multipart_stream.error_part('سرور مشغول است، لطفاً کمی بعد دوباره تلاش کنید')
+            except asyncio.TimeoutError:
+                yield multipart_stream.error_part('زمان پردازش درخواست به پایان رسید')
+            except Exception as e:
+                yield multipart_stream.error_part(str(e))
+            yield multipart_stream.end()
+
+        return StreamingResponse(body(), media_type=multipart_stream.CONTENT_TYPE)
+
+    except ServerOverloaded as e:
+        return _overloaded_response(e)
+    except asyncio.TimeoutError:
+        return _timeout_response()
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+async def stream_audio(websocket):
+    """
+    ترجمه جریانی: کلاینت فریم‌های PCM 16 بیتی مونو 16kHz (پیام باینری) و در پایان
+    {"type": "stop"} می‌فرستد؛ سرور رویدادهای partial و final (متن و ترجمه) را
+    به محض آماده شدن برمی‌گرداند
+    """
+    await websocket.accept()
+    initialize_api_components()
+    frames = asyncio.Queue()
+    stop = object()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message.get('bytes'):
+                    frames.put_nowait(AudioBuffer.from_bytes(message['bytes']).as_float32())
+                elif message.get('text') and json.loads(message['text']).get('type') == 'stop':
+                    break
+        finally:
+            frames.put_nowait(stop)
+
+    async def run_step(func, *args):
+        # در صورت پر بودن ظرفیت استنتاج، صدا در صف می‌ماند و کمی بعد دوباره تلاش می‌شود
+        while True:
+            try:
+                return await executor.run(func, *args)
+            except ServerOverloaded as e:
+                await websocket.send_json({'type': 'busy', 'retry_after': e.retry_after})
+                await asyncio.sleep(0.1)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        session = await run_step(StreamingSession, stt_engine, translator)
+        await websocket.send_json({'type': 'ready', 'sample_rate': config.SAMPLE_RATE})
+
+        finished = False
+        while not finished:
+            # تمام فریم‌های رسیده از آخرین گام با هم پردازش می‌شوند
+            batch = [await frames.get()]
+            while not frames.empty():
+                batch.append(frames.get_nowait())
+            if batch[-1] is stop:
+                batch.pop()
+                finished = True
+
+            events = await run_step(session.feed, batch) if batch else []
+            if finished:
+                events += await run_step(session.finish)
+            for event in events:
+                await websocket.send_json(event)
+
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error("Error in audio stream", error=str(e))
+        metrics.ERRORS.inc(component="api")
+        try:
+            await websocket.send_json({'type': 'error', 'error': str(e)})
+            await websocket.close()
+        except Exception:
+            pass
+    finally:
+        receiver.cancel()
+
+def _is_ready():
+    """
+    آمادگی دریافت ترافیک: بدون worker pool، بارگذاری و warmup مدل‌های محلی؛ با worker pool
+    (که process اصلی مدلی از پیش بارگذاری نمی‌کند)، بارگذاری و warmup موفق تمام مدل‌های
+    تمام worker ها
+    """
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.is_ready()
+    return preloader is not None and preloader.is_ready()
+
+def _model_status():
+    """وضعیت بارگذاری/warmup هر مدل؛ با worker pool به تفکیک هر worker"""
+    pool = get_worker_pool()
+    if pool is not None:
+        return {f"worker-{worker['index']}": worker['models'] for worker in pool.get_stats()['processes']}
+    return preloader.get_status() if preloader is not None else {}
+
+async def health_check(request):
+    """بررسی وضعیت API، وضعیت بارگذاری/warmup هر مدل و ظرفیت استنتاج"""
+    model_status = _model_status()
+    return JSONResponse({
+        'status': 'healthy',
+        'ready': _is_ready(),
+        'components': {
+            'audio_handler': audio_handler is not None,
+            'stt_engine': stt_engine is not None,
+            'translator': translator is not None,
+            'tts_engine': tts_engine is not None
+        },
+        'models': model_status,
+        'inference': executor.get_stats() if executor is not None else None,
+        'stt_batching': stt_scheduler.get_stats() if stt_scheduler is not None else None,
+        'worker_pool': get_worker_pool().get_stats() if get_worker_pool() is not None else None
+    })
+
+async def readiness_check(request):
+    """آمادگی دریافت ترافیک: فقط پس از بارگذاری و warmup تمام مدل‌ها 200 برمی‌گرداند"""
+    if _is_ready():
+        return JSONResponse({'ready': True})
+
+    model_status = _model_status()
+    pool = get_worker_pool()
+    return JSONResponse({
+        'ready': False,
+        'models': model_status,
+        'worker_pool': pool.get_stats() if pool is not None else None
+    }, status_code=503)
+
+async def metrics_endpoint(request):
+    """metric های process با قالب متنی Prometheus"""
+    if not config.METRICS_ENABLED:
+        return JSONResponse({'error': 'Metrics are disabled'}, status_code=404)
+    return Response(metrics.registry.render(), media_type=metrics.registry.content_type)
+
+async def trace_endpoint(request):
+    """trace های اخیر با قالب Chrome trace-event (برای باز کردن در ui.perfetto.dev)"""
+    if not tracing.tracer.enabled:
+        return JSONResponse({'error': 'Tracing is disabled'}, status_code=404)
+    return JSONResponse(tracing.tracer.to_chrome_trace())
+
+class RequestTracingMiddleware:
+    """شروع یک trace برای هر درخواست POST و فعال کردن آن در context درخواست"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or not tracing.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = tracing.start_trace(scope['path'])
+        with tracing.use(trace), tracing.span('request', path=scope['path']):
+            await self.app(scope, receive, send)
+
+class RequestMetricsMiddleware:
+    """
+    middleware خالص ASGI: ثبت تعداد، وضعیت و تأخیر هر درخواست HTTP تا ارسال کامل پاسخ
+    (برای پاسخ‌های جریانی، تا آخرین بخش)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        # مسیرهای ناشناخته با یک برچسب شمرده می‌شوند تا تعداد سری‌ها محدود بماند
+        endpoint = scope['path'] if scope['path'] in _ROUTE_PATHS else 'other'
+        status = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.observe_request(endpoint, status, time.perf_counter() - start_time)
+
+routes = [
+    Route('/api/microphone-permission', handle_microphone_permission, methods=['POST']),
+    Route('/api/process_audio', process_audio, methods=['POST']),
+    Route('/api/process-audio', process_uploaded_audio, methods=['POST']),
+    Route('/api/synthesize', synthesize_speech, methods=['POST']),
+    Route('/api/translate', translate_audio, methods=['POST']),
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/ready', readiness_check, methods=['GET']),
+    Route('/api/metrics', metrics_endpoint, methods=['GET']),
+    Route('/api/trace', trace_endpoint, methods=['GET']),
+    WebSocketRoute('/api/stream', stream_audio),
+]
+_ROUTE_PATHS = {route.path for route in routes}
+
+# ایجاد ASGI app برای API
+api_app = Starlette(routes=routes, middleware=[
+    Middleware(RequestMetricsMiddleware),
+    Middleware(RequestTracingMiddleware)
+])
+
+def run_api_server(port=None):
+    """اجرای سرور ASGI با uvicorn (یک event loop؛ استنتاج در thread pool محدود)"""
+    try:
+        server = uvicorn.Server(uvicorn.Config(
+            api_app,
+            host='0.0.0.0',
+            port=port or config.API_PORT,
+            log_level='warning'
+        ))
+        asyncio.run(server.serve())
+    except Exception as e:
+        logger.error("Error running API server", error=str(e))
+
+# اجرای API در thread جداگانه
+def start_api_server():
+    """شروع سرور ASGI در thread جداگانه"""
+    initialize_api_components()
+    if config.PRELOAD_MODELS:
+        preloader.start()
+
+    api_thread = threading.Thread(target=run_api_server, daemon=True)
+    api_thread.start()
+    logger.info("ASGI API server started", port=config.API_PORT)
+
+if __name__ == "__main__":
+    initialize_api_components()
+    if config.PRELOAD_MODELS:
+        preloader.start()
+    run_api_server()
@@ -0,0 +1 @@
+# بنچمارک‌های تأخیر مراحل LinguaStream
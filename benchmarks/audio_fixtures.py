@@ -0,0 +1,92 @@
+import os
+import wave
+import numpy as np
+from scipy.signal import lfilter
+import config
+from src.audio_buffer import AudioBuffer
+from src.playback import resample
+
+# فرمنت‌های تقریبی مصوت‌های فارسی (آ، اِ، ای، او، اَ، اُ) بر حسب هرتز
+_VOWEL_FORMANTS = [
+    (730, 1090), (530, 1840), (270, 2290), (300, 870), (660, 1700), (570, 840)
+]
+
+def _resonator(signal, frequency, bandwidth, sample_rate):
+    """فیلتر تشدید مرتبه دوم (مدل ساده یک فرمنت)"""
+    r = np.exp(-np.pi * bandwidth / sample_rate)
+    theta = 2 * np.pi * frequency / sample_rate
+    return lfilter([1 - r], [1, -2 * r * np.cos(theta), r * r], signal)
+
+def synthesize_speech_like(duration, sample_rate=None, seed=0):
+    """
+    صدای مصنوعی شبه گفتار: قطار پالس با زیروبمی متغیر که از فرمنت‌های مصوت‌های
+    فارسی عبور می‌کند، با پوش هجایی حدود 4 هجا در ثانیه و مکث بین کلمات.
+    برای سنجش تأخیر کافی است؛ برای خروجی معنادار Whisper از فایل‌های واقعی (audio_dir) استفاده کنید.
+    """
+    sample_rate = sample_rate or config.SAMPLE_RATE
+    rng = np.random.default_rng(seed)
+    total = int(duration * sample_rate)
+    audio = np.zeros(total, dtype=np.float64)
+
+    position = 0
+    while position < total:
+        # یک کلمه 2 تا 4 هجایی و سپس مکث کوتاه
+        for _ in range(rng.integers(2, 5)):
+            length = int(rng.uniform(0.18, 0.28) * sample_rate)
+            end = min(position + length, total)
+            if end <= position:
+                break
+            t = np.arange(end - position) / sample_rate
+
+            # منبع صوتی: پالس‌های حنجره با زیروبمی 100 تا 160 هرتز و کمی نویز تنفس
+            f0 = rng.uniform(100, 160) * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+            phase = np.cumsum(f0 / sample_rate)
+            source = (np.diff(np.floor(phase), prepend=0) > 0).astype(np.float64)
+            source += rng.normal(0, 0.02, len(source))
+
+            f1, f2 = _VOWEL_FORMANTS[rng.integers(len(_VOWEL_FORMANTS))]
+            syllable = _resonator(source, f1, 80, sample_rate) + 0.5 * _resonator(source, f2, 120, sample_rate)
+            audio[position:end] = syllable * np.hanning(len(syllable))
+            position = end
+        position += int(rng.uniform(0.08, 0.2) * sample_rate)
+
+    peak = np.max(np.abs(audio))
+    if peak > 0:
+        audio *= 0.5 / peak
+    return AudioBuffer(audio.astype(np.float32), sample_rate=sample_rate)
+
+def load_wav(path, sample_rate=None):
+    """خواندن فایل WAV 16 بیتی (مونو یا استریو) و تبدیل به AudioBuffer مونو float32 با نرخ SAMPLE_RATE"""
+    sample_rate = sample_rate or config.SAMPLE_RATE
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit PCM WAV fixtures are supported: {path}")
+        buffer = AudioBuffer.from_bytes(
+            wav_file.readframes(wav_file.getnframes()),
+            sample_rate=wav_file.getframerate(),
+            channels=wav_file.getnchannels()
+        )
+
+    audio = buffer.to_mono().as_float32()
+    if buffer.sample_rate != sample_rate:
+        audio = resample(audio, buffer.sample_rate, sample_rate)
+    return AudioBuffer(audio, sample_rate=sample_rate)
+
+def load_clips(durations, audio_dir=None):
+    """
+    کلیپ‌های بنچمارک: فایل‌های WAV پوشه audio_dir (نام فایل به عنوان برچسب) یا
+    صدای مصنوعی با طول‌های durations (ثانیه)
+    """
+    if audio_dir:
+        clips = {}
+        for name in sorted(os.listdir(audio_dir)):
+            if name.lower().endswith(".wav"):
+                clips[os.path.splitext(name)[0]] = load_wav(os.path.join(audio_dir, name))
+        if not clips:
+            raise ValueError(f"No WAV fixtures found in {audio_dir}")
+        return clips
+
+    return {
+        f"{duration:g}s": synthesize_speech_like(duration, seed=index)
+        for index, duration in enumerate(durations)
+    }
@@ -0,0 +1,409 @@
+"""
+بنچمارک تأخیر مراحل LinguaStream
+
+اجرا از ریشه پروژه:
+    python -m benchmarks.run_benchmarks --mode stub
+    python -m benchmarks.run_benchmarks --mode real --audio-dir fixtures/ --baseline benchmarks/baseline.json
+
+حالت stub مدل‌ها را با جایگزین‌های بدون دانلود (benchmarks/stubs.py) عوض می‌کند تا سربار
+خط لوله بدون استنتاج سنجیده شود؛ حالت real همان مدل‌های config.py را بارگذاری می‌کند.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # ویندوز: حافظه پیک گزارش نمی‌شود
+    resource = None
+
+import config
+from src.audio_buffer import AudioBuffer
+from src.stt_engine import STTEngine
+from src.translator import Translator, PARITY_SENTENCES
+from src.tts_engine import TTSEngine
+from src import tracing
+from benchmarks.audio_fixtures import load_clips
+from benchmarks.stubs import attach_stub_models
+
+# جملات انگلیسی ورودی سنتز (ترجمه PARITY_SENTENCES)
+ENGLISH_SENTENCES = [
+    "Hello, how are you?",
+    "The weather is very nice today.",
+    "Please send me this document by tomorrow.",
+    "Our next meeting is at three in the afternoon.",
+    "Thank you, you helped me a lot!"
+]
+
+# تعداد جملات متن‌های ورودی ترجمه و سنتز
+TEXT_SIZES = [1, 3, 6]
+
+# تغییر کمتر از این مقدار (ثانیه) در مقایسه با baseline پسرفت حساب نمی‌شود (نویز زمان‌سنجی)
+MIN_REGRESSION_DELTA = 0.001
+
+def _percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "mean": float(values.mean()),
+        "max": float(values.max())
+    }
+
+def peak_rss_mb():
+    """حافظه پیک process (RSS) از ابتدای اجرا"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # لینوکس بر حسب کیلوبایت و macOS بر حسب بایت
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _make_text(sentences, count):
+    return " ".join(sentences[index % len(sentences)] for index in range(count))
+
+def _measure(func, inputs, warmup):
+    """اجرای func روی هر ورودی؛ warmup اجرای اول در آمار حساب نمی‌شوند"""
+    for item in inputs[:warmup]:
+        func(item)
+
+    latencies = []
+    outputs = []
+    for item in inputs[warmup:]:
+        start_time = time.perf_counter()
+        outputs.append(func(item))
+        latencies.append(time.perf_counter() - start_time)
+    return latencies, outputs
+
+def _report(latencies, media_durations=None):
+    """
+    آمار یک مورد: صدک‌های تأخیر، throughput (اجرا در ثانیه) و در صورت وجود طول صدا
+    (ورودی STT یا خروجی TTS)، ضریب بلادرنگ RTF = تأخیر / طول صدا
+    """
+    report = {
+        "iterations": len(latencies),
+        "latency": _percentiles(latencies),
+        "throughput_per_s": len(latencies) / sum(latencies) if sum(latencies) > 0 else None
+    }
+    if media_durations:
+        report["rtf"] = _percentiles([
+            latency / duration for latency, duration in zip(latencies, media_durations) if duration > 0
+        ])
+    return report
+
+def bench_stt(engine, clips, iterations, warmup):
+    results = {}
+    for label, clip in clips.items():
+        samples = clip.as_float32()
+        # هر اجرا بافر خود را دارد چون نرمال‌سازی درجا انجام می‌شود
+        inputs = [AudioBuffer(samples.copy(), sample_rate=clip.sample_rate) for _ in range(warmup + iterations)]
+        latencies, _ = _measure(engine.transcribe, inputs, warmup)
+        results[label] = _report(latencies, [clip.duration] * len(latencies))
+        results[label]["audio_duration"] = clip.duration
+    return results
+
+def bench_translate(translator, iterations, warmup):
+    results = {}
+    for count in TEXT_SIZES:
+        text = _make_text(PARITY_SENTENCES, count)
+        latencies, _ = _measure(translator.translate, [text] * (warmup + iterations), warmup)
+        results[f"{count}_sentences"] = _report(latencies)
+        results[f"{count}_sentences"]["characters"] = len(text)
+    return results
+
+def bench_tts(engine, iterations, warmup):
+    def synthesize(text):
+        # خروجی جریانی کامل مصرف می‌شود؛ طول کل صدا برای RTF برگردانده می‌شود
+        return sum(chunk.duration for chunk in engine.synthesize_stream(text))
+
+    results = {}
+    for count in TEXT_SIZES:
+        text = _make_text(ENGLISH_SENTENCES, count)
+        latencies, durations = _measure(synthesize, [text] * (warmup + iterations), warmup)
+        results[f"{count}_sentences"] = _report(latencies, durations)
+        results[f"{count}_sentences"]["characters"] = len(text)
+    return results
+
+class ReplayAudioHandler:
+    """
+    جایگزین AudioHandler در حلقه LinguaStream: کلیپ‌ها به جای میکروفن به حلقه داده می‌شوند
+    و زمان تحویل هر جمله، اولین صدای ترجمه و پایان صدای آن ثبت می‌شود
+    """
+
+    def __init__(self, clips, realtime=False):
+        self.clips = clips
+        self.realtime = realtime
+        self.next_index = 0
+        self.available_at = None
+        self.captured = []
+        self.first_audio = {}
+        self.finished = []
+        self.done = threading.Event()
+
+    def start_stream(self):
+        self.available_at = time.perf_counter()
+
+    def capture_chunk(self, timeout=0.1):
+        if self.next_index >= len(self.clips):
+            time.sleep(timeout)
+            return None
+
+        clip = self.clips[self.next_index]
+        if self.realtime:
+            # هر جمله فقط پس از پایان گفتن آن (طول کلیپ) در دسترس است
+            ready = self.available_at + clip.duration
+            remaining = ready - time.perf_counter()
+            if remaining > 0:
+                time.sleep(min(remaining, timeout))
+                if time.perf_counter() < ready:
+                    return None
+            self.available_at = ready
+
+        self.next_index += 1
+        self.captured.append(time.perf_counter())
+        return AudioBuffer(clip.as_float32().copy(), sample_rate=clip.sample_rate)
+
+    def capture_utterance(self, timeout=0.1):
+        clip = self.capture_chunk(timeout)
+        if clip is None:
+            return None, None
+        return clip, tracing.start_trace("utterance", duration=round(clip.duration, 2))
+
+    def play_audio(self, audio_data, sample_rate=None):
+        self.first_audio.setdefault(len(self.finished), time.perf_counter())
+
+    def end_playback(self):
+        self.finished.append(time.perf_counter())
+        if len(self.finished) == len(self.clips):
+            self.done.set()
+
+    def cleanup(self):
+        pass
+
+def bench_loop(clips, iterations, stub, delay_scale, use_cache, realtime, timeout):
+    """حلقه کامل LinguaStream.process_loop (تقطیع شده تا صف پخش) روی کلیپ‌ها"""
+    from main import LinguaStream
+
+    app = LinguaStream()
+    if stub:
+        attach_stub_models(app.stt_engine, app.translator, app.tts_engine, delay_scale)
+    else:
+        app.preloader.start()
+        app.preloader.wait()
+    if not use_cache:
+        app.translator.cache = None
+        app.tts_engine.cache = None
+
+    # جملات کوتاه‌تر از MIN_AUDIO_DURATION در حلقه نادیده گرفته می‌شوند
+    playable = [clip for clip in clips.values() if clip.duration >= config.MIN_AUDIO_DURATION]
+    handler = ReplayAudioHandler(playable * iterations, realtime=realtime)
+    app.audio_handler = handler
+
+    thread = threading.Thread(target=app.process_loop, name="benchmark-loop", daemon=True)
+    start_time = time.perf_counter()
+    thread.start()
+    completed = handler.done.wait(timeout)
+    elapsed = time.perf_counter() - start_time
+
+    pipeline_stats = {stage.name: stage.get_stats() for stage in app.pipeline.stages}
+    app.is_running = False
+    thread.join(timeout=1.0)
+    app.cleanup()
+
+    finished = len(handler.finished)
+    end_to_end = [handler.finished[index] - handler.captured[index] for index in range(finished)]
+    first_audio = [handler.first_audio[index] - handler.captured[index] for index in sorted(handler.first_audio)]
+    audio_seconds = sum(clip.duration for clip in handler.clips[:finished])
+    return {
+        "all": {
+            "utterances": len(handler.clips),
+            "completed": finished if completed else f"{finished} (timed out)",
+            "realtime": realtime,
+            "latency": _percentiles(end_to_end) if end_to_end else None,
+            "first_audio_latency": _percentiles(first_audio) if first_audio else None,
+            "throughput_per_s": finished / elapsed if elapsed > 0 else None,
+            # برای اجرای بدون تأخیر ورودی: زمان کل / طول کل صدا
+            "rtf": {"overall": elapsed / audio_seconds} if audio_seconds else None,
+            "stages": pipeline_stats
+        }
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """مقایسه p50/p95 تأخیر هر مورد با baseline؛ افزایش بیش از tolerance پسرفت است"""
+    rows = []
+    for stage, cases in results["stages"].items():
+        for label, report in cases.items():
+            previous = baseline.get("stages", {}).get(stage, {}).get(label)
+            if not previous or not previous.get("latency") or not report.get("latency"):
+                continue
+            for metric in ("p50", "p95"):
+                old = previous["latency"][metric]
+                new = report["latency"][metric]
+                change = (new - old) / old if old > 0 else 0.0
+                rows.append({
+                    "stage": stage,
+                    "case": label,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": change,
+                    "regression": change > tolerance and new - old > MIN_REGRESSION_DELTA
+                })
+    return rows
+
+def print_summary(results):
+    print(f"\nMode: {results['mode']}  |  peak RSS: {results['peak_rss_mb']:.1f} MB" if results["peak_rss_mb"]
+          else f"\nMode: {results['mode']}")
+    print(f"{'stage':<10} {'case':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RTF p50':>8} {'ops/s':>8}")
+    for stage, cases in results["stages"].items():
+        for label, report in cases.items():
+            latency = report.get("latency")
+            if not latency:
+                print(f"{stage:<10} {label:<14} {'-':>9}")
+                continue
+            rtf = report.get("rtf") or {}
+            rtf_value = rtf.get("p50", rtf.get("overall"))
+            print(
+                f"{stage:<10} {label:<14} {latency['p50'] * 1000:>9.2f} {latency['p95'] * 1000:>9.2f} "
+                f"{latency['p99'] * 1000:>9.2f} {rtf_value if rtf_value is not None else float('nan'):>8.3f} "
+                f"{report['throughput_per_s'] or 0:>8.1f}"
+            )
+
+    for row in results.get("comparison", []):
+        marker = "REGRESSION" if row["regression"] else "ok"
+        print(f"  {row['stage']}/{row['case']} {row['metric']}: {row['baseline'] * 1000:.2f} -> "
+              f"{row['current'] * 1000:.2f} ms ({row['change']:+.1%}) {marker}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LinguaStream per-stage latency benchmarks")
+    parser.add_argument("--mode", choices=["stub", "real"], default="stub",
+                        help="stub: مدل‌های جایگزین بدون دانلود؛ real: مدل‌های config.py")
+    parser.add_argument("--stages", default="stt,translate,tts,loop",
+                        help="مراحل اجرا (جدا شده با ویرگول)")
+    parser.add_argument("--durations", default="1,3,5,10",
+                        help="طول کلیپ‌های صوتی مصنوعی (ثانیه)")
+    parser.add_argument("--audio-dir", default=None,
+                        help="پوشه فایل‌های WAV فارسی به جای صدای مصنوعی")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--loop-iterations", type=int, default=3,
+                        help="تعداد تکرار کل کلیپ‌ها در حلقه LinguaStream")
+    parser.add_argument("--realtime", action="store_true",
+                        help="ارسال جملات حلقه با سرعت گفتار (به جای پشت سر هم)")
+    parser.add_argument("--loop-timeout", type=float, default=600.0)
+    parser.add_argument("--stub-rtf", type=float, default=0.0,
+                        help="زمان استنتاج شبیه‌سازی شده مدل‌های stub نسبت به طول صدا")
+    parser.add_argument("--cache", action="store_true",
+                        help="فعال نگه داشتن کش ترجمه و سنتز (پیش‌فرض: غیرفعال تا تکرارها از کش نخوانند)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--trace", default=None,
+                        help="ذخیره trace جملات حلقه (Chrome trace JSON برای Perfetto) در این فایل")
+    parser.add_argument("--baseline", default=None, help="فایل JSON نتایج قبلی برای مقایسه")
+    parser.add_argument("--save-baseline", default=None, help="ذخیره نتایج این اجرا به عنوان baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="حداکثر افزایش نسبی مجاز p50/p95 نسبت به baseline")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    stub = args.mode == "stub"
+    clips = load_clips([float(value) for value in args.durations.split(",")], args.audio_dir)
+
+    results = {
+        "mode": args.mode,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {
+            "whisper_model": config.WHISPER_MODEL,
+            "stt_backend": config.STT_BACKEND,
+            "translation_model": config.TRANSLATION_MODEL_NAME,
+            "translation_backend": config.TRANSLATION_BACKEND,
+            "tts_model": config.TTS_MODEL_NAME,
+            "thread_count": config.THREAD_COUNT
+        },
+        "load_time": {},
+        "stages": {},
+        "peak_rss_mb_after": {}
+    }
+
+    if args.trace:
+        tracing.tracer.enabled = True
+        config.TRACE_FILE = args.trace
+
+    stt_engine = STTEngine()
+    translator = Translator()
+    tts_engine = TTSEngine()
+    if stub:
+        attach_stub_models(stt_engine, translator, tts_engine, args.stub_rtf)
+    else:
+        for name, engine in (("stt", stt_engine), ("translate", translator), ("tts", tts_engine)):
+            start_time = time.perf_counter()
+            engine._load_model()
+            results["load_time"][name] = time.perf_counter() - start_time
+    if not args.cache:
+        translator.cache = None
+        tts_engine.cache = None
+
+    try:
+        for stage in stages:
+            print(f"\n=== Benchmark stage: {stage} ===")
+            if stage == "stt":
+                results["stages"]["stt"] = bench_stt(stt_engine, clips, args.iterations, args.warmup)
+            elif stage == "translate":
+                results["stages"]["translate"] = bench_translate(translator, args.iterations, args.warmup)
+            elif stage == "tts":
+                results["stages"]["tts"] = bench_tts(tts_engine, args.iterations, args.warmup)
+            elif stage == "loop":
+                results["stages"]["loop"] = bench_loop(
+                    clips, args.loop_iterations, stub, args.stub_rtf, args.cache, args.realtime, args.loop_timeout
+                )
+            else:
+                raise ValueError(f"Unknown benchmark stage: {stage}")
+            # RSS پیک تجمعی است: مقدار پس از هر مرحله
+            results["peak_rss_mb_after"][stage] = peak_rss_mb()
+    finally:
+        for engine in (stt_engine, translator, tts_engine):
+            engine.release()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != args.mode:
+            print(f"Warning: baseline mode '{baseline.get('mode')}' differs from '{args.mode}'")
+        results["comparison"] = compare_with_baseline(results, baseline, args.tolerance)
+        regressions = [row for row in results["comparison"] if row["regression"]]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_summary(results)
+    print(f"\nResults written to {args.output}")
+    if args.trace:
+        print(f"Trace written to {tracing.tracer.dump()}")
+    if regressions:
+        print(f"{len(regressions)} latency regression(s) beyond {args.tolerance:.0%} of baseline")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import threading
+import time
+import numpy as np
+from src.translator import PARITY_SENTENCES
+
+# مدل‌های جایگزین بدون دانلود: رابط همان مدل‌های واقعی را دارند تا کد موتورها
+# (نرمال‌سازی، قفل‌ها، تقسیم جمله، batch بندی، کش و خط لوله) بدون تغییر اجرا شود
+# و سربار خط لوله جدا از زمان استنتاج سنجیده شود
+
+_PERSIAN_WORDS = " ".join(PARITY_SENTENCES).replace("،", "").split()
+
+# تعداد تقریبی کلمات در هر ثانیه گفتار فارسی
+_WORDS_PER_SECOND = 2.5
+
+class StubWhisperBackend:
+    """جایگزین backend های Whisper: متن فارسی متناسب با طول صدا"""
+
+    def __init__(self, delay_per_second=0.0):
+        # زمان شبیه‌سازی شده استنتاج به ازای هر ثانیه صدا (0 = فقط سربار)
+        self.delay_per_second = delay_per_second
+
+    def _text(self, audio):
+        duration = len(audio) / 16000
+        if self.delay_per_second:
+            time.sleep(duration * self.delay_per_second)
+        count = max(1, int(duration * _WORDS_PER_SECOND))
+        words = [_PERSIAN_WORDS[index % len(_PERSIAN_WORDS)] for index in range(count)]
+        # هر 8 کلمه یک جمله تا مراحل ترجمه و سنتز جمله به جمله کار کنند
+        sentences = [" ".join(words[start:start + 8]) + "." for start in range(0, len(words), 8)]
+        return " ".join(sentences)
+
+    def transcribe(self, audio, language="fa", word_timestamps=False, initial_prompt=None):
+        return {"text": self._text(audio), "language": language, "segments": []}
+
+    def transcribe_batch(self, audio_list, language="fa"):
+        return [self.transcribe(audio, language) for audio in audio_list]
+
+    def get_device(self):
+        return "CPU (stub)"
+
+class _StubTokenizer:
+    def __call__(self, sentences):
+        return {"input_ids": [sentence.split() + ["</s>"] for sentence in sentences]}
+
+class StubTranslationPipeline:
+    """جایگزین pipeline ترجمه transformers: یک کلمه انگلیسی به ازای هر کلمه ورودی"""
+
+    def __init__(self, delay_per_token=0.0):
+        self.tokenizer = _StubTokenizer()
+        self.delay_per_token = delay_per_token
+
+    def __call__(self, sentences, **kwargs):
+        if self.delay_per_token:
+            time.sleep(sum(len(sentence.split()) for sentence in sentences) * self.delay_per_token)
+        return [
+            {"translation_text": " ".join(["word"] * len(sentence.split())).capitalize() + "."}
+            for sentence in sentences
+        ]
+
+class _StubSynthesizer:
+    output_sample_rate = 24000
+
+class StubTTSModel:
+    """جایگزین مدل XTTS: موج سینوسی با طول متناسب با متن (حدود 15 کاراکتر در ثانیه)"""
+
+    def __init__(self, delay_per_second=0.0):
+        self.synthesizer = _StubSynthesizer()
+        self.delay_per_second = delay_per_second
+
+    def tts(self, text, language=None, speaker=None):
+        duration = max(0.2, len(text) / 15)
+        if self.delay_per_second:
+            time.sleep(duration * self.delay_per_second)
+        t = np.arange(int(duration * self.synthesizer.output_sample_rate)) / self.synthesizer.output_sample_rate
+        return 0.3 * np.sin(2 * np.pi * 220 * t)
+
+def attach_stub_models(stt_engine, translator, tts_engine, delay_scale=0.0):
+    """
+    قرار دادن مدل‌های جایگزین در موتورها به جای بارگذاری از رجیستری؛ با delay_scale > 0
+    زمان استنتاج تقریبی (RTF = delay_scale) هم شبیه‌سازی می‌شود
+    """
+    stt_engine.model = StubWhisperBackend(delay_per_second=delay_scale)
+    stt_engine.model_lock = threading.RLock()
+    stt_engine.model_loaded = True
+
+    translator.translator = StubTranslationPipeline(delay_per_token=delay_scale * 0.02)
+    translator.model_lock = threading.RLock()
+    translator.model_loaded = True
+
+    tts_engine.tts_model = StubTTSModel(delay_per_second=delay_scale)
+    tts_engine.model_lock = threading.RLock()
+    tts_engine.sample_rate = tts_engine.tts_model.synthesizer.output_sample_rate
+    tts_engine.speaker_latents = None
+    tts_engine.model_loaded = True
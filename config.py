@@ -2,11 +2,23 @@
 
 # تنظیمات مدل‌ها
 WHISPER_MODEL = "base"  # گزینه‌ها: tiny, base, small, medium, large
+STT_BACKEND = "openai"  # گزینه‌ها: openai (PyTorch)، ctranslate2 (faster-whisper با int8)
+STT_COMPUTE_TYPE = "int8"  # نوع محاسبات backend ctranslate2
+STT_CPU_THREADS = 0     # تعداد thread های CPU برای ctranslate2 (0 = خودکار)
 TRANSLATION_MODEL_NAME = "facebook/m2m100_418M"
+TRANSLATION_SOURCE_LANG = "fa"
+TRANSLATION_TARGET_LANG = "en"
+TRANSLATION_BACKEND = "pytorch"  # گزینه‌ها: pytorch (fp32)، int8 (کوانتیزاسیون پویا)، onnx (نیازمند optimum)
 TTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
 TTS_SPEAKER_WAV = None  # مسیر فایل صوتی نمونه صدای کاربر
+TTS_DEFAULT_SPEAKER = "Ana Florence"  # صدای پیش‌فرض XTTS-v2 در نبود نمونه صدای کاربر
 TTS_LANGUAGE = "en"     # زبان خروجی TTS
 TTS_USE_GPU = True      # استفاده از GPU برای XTTS-v2
+TTS_STREAM_MAX_CHARS = 120  # حداکثر طول هر قطعه در سنتز جریانی (کاراکتر)
+TTS_CACHE_ENABLED = True    # کش PCM عبارات تکراری
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024       # سقف حجم کش حافظه (بایت)
+TTS_CACHE_PERSIST = True    # ذخیره PCM روی دیسک در CACHE_DIR/tts
+TTS_CACHE_MAX_DISK_BYTES = 512 * 1024 * 1024  # سقف حجم کش دیسک (بایت)
 
 # تنظیمات صوتی
 SAMPLE_RATE = 16000     # نرخ نمونه برای Whisper (16kHz)
@@ -18,11 +30,27 @@ BIT_DEPTH = 16          # عمق بیت
 MAX_LATENCY = 3.0       # حداکثر تأخیر مجاز (ثانیه)
 BUFFER_SIZE = 4096      # اندازه بافر صوتی
 THREAD_COUNT = 4        # تعداد thread های پردازش
+WORKER_PROCESSES = 0    # process های استنتاج API، هر کدام با THREAD_COUNT / WORKER_PROCESSES thread (0 = استنتاج در همان process)
+PIPELINE_QUEUE_SIZE = 2 # ظرفیت صف بین مراحل خط لوله
+STT_BATCH_SIZE = 8      # حداکثر تعداد کلیپ در هر batch تشخیص گفتار
+STT_BATCH_MAX_WAIT_MS = 10  # حداکثر انتظار برای تکمیل batch درخواست‌های همزمان API (میلی‌ثانیه)
+STT_SCHEDULER_MAX_PENDING = 64  # حداکثر کلیپ در صف زمان‌بند batch
+TRANSLATION_BATCH_TOKENS = 1024  # سقف توکن هر batch ترجمه (با احتساب padding)
+TRANSLATION_MAX_BATCH_SIZE = 16  # حداکثر تعداد جمله در هر batch ترجمه
+
+# تنظیمات سرور API
+API_SERVER = "asgi"     # گزینه‌ها: asgi (starlette + uvicorn)، flask
+API_PORT = 5000         # پورت سرور API
+API_INFERENCE_WORKERS = 2  # حداکثر استنتاج همزمان در سرور asgi
+API_MAX_PENDING = 8     # حداکثر درخواست در انتظار؛ بیشتر از آن با 503 رد می‌شود
+API_RETRY_AFTER = 1     # مقدار هدر Retry-After در پاسخ 503 (ثانیه)
+API_REQUEST_TIMEOUT = MAX_LATENCY * 2  # حداکثر زمان پردازش هر درخواست (ثانیه)
 
 # تنظیمات Streamlit
 STREAMLIT_TITLE = "LinguaStream - ترجمه همزمان با صدای شخصی"
 STREAMLIT_PORT = 8501   # پورت Streamlit
 MAX_FILE_SIZE = 25     # حداکثر اندازه فایل آپلود (MB)
+DECODE_READ_SIZE = 64 * 1024  # اندازه هر بلوک ورودی به ffmpeg هنگام رمزگشایی (بایت)
 
 # تنظیمات کلون صدا
 MIN_VOICE_DURATION = 6  # حداقل مدت زمان نمونه صدا (ثانیه)
@@ -31,7 +59,16 @@ VOICE_SAMPLE_RATE = 24000  # نرخ نمونه برای نمونه صدای کا
 
 # تنظیمات مدل‌ها و مسیرها
 MODELS_DIR = "models"   # پوشه ذخیره مدل‌ها
+PRELOAD_MODELS = True   # بارگذاری و warmup همزمان مدل‌ها هنگام راه‌اندازی
+WARMUP_TRANSLATION_TEXT = "سلام، حال شما چطور است؟"  # ورودی warmup مترجم
+WARMUP_TTS_TEXT = "Hello."  # ورودی warmup موتور TTS
 TEMP_DIR = "temp"       # پوشه فایل‌های موقت
+CACHE_DIR = "cache"     # پوشه کش‌های پایدار
+
+# تنظیمات کش ترجمه
+TRANSLATION_CACHE_ENABLED = True
+TRANSLATION_CACHE_MEMORY_ENTRIES = 2048            # ظرفیت LRU حافظه (تعداد ورودی)
+TRANSLATION_CACHE_MAX_DISK_BYTES = 64 * 1024 * 1024  # سقف حجم کش روی دیسک (بایت)
 
 # تنظیمات رابط کاربری
 UI_REFRESH_RATE = 0.5   # نرخ به‌روزرسانی UI (ثانیه)
@@ -42,3 +79,27 @@ ENABLE_VOICE_PREVIEW = True  # فعال‌سازی پیش‌نمایش صدا
 MIN_AUDIO_DURATION = 1.0  # حداقل مدت زمان صوتی برای پردازش (ثانیه)
 MAX_AUDIO_DURATION = 30.0 # حداکثر مدت زمان صوتی برای پردازش (ثانیه)
 VOICE_ACTIVITY_THRESHOLD = 0.01  # آستانه تشخیص فعالیت صوتی
+VAD_HANGOVER_DURATION = 0.5  # مدت سکوت لازم برای پایان یک جمله (ثانیه)
+VAD_PRE_ROLL_DURATION = 0.2  # صدای نگه‌داشته شده قبل از شروع گفتار (ثانیه)
+UTTERANCE_QUEUE_SIZE = 16  # حداکثر جملات در انتظار پردازش
+
+# تنظیمات تشخیص گفتار جریانی
+STREAM_STEP_DURATION = 1.0     # فاصله رمزگشایی مجدد با رسیدن صدای جدید (ثانیه)
+STREAM_WINDOW_DURATION = 15.0  # حداکثر طول پنجره لغزان پیش از کوتاه شدن (ثانیه)
+STREAM_PROMPT_WORDS = 30       # تعداد کلمات تأیید شده برای زمینه رمزگشایی
+
+# تنظیمات پخش صدا
+PLAYBACK_SAMPLE_RATE = 0         # نرخ نمونه دستگاه خروجی (0 = نرخ پیش‌فرض دستگاه)
+PLAYBACK_JITTER_DURATION = 0.1   # صدای بافر شده پیش از شروع (یا ادامه پس از underrun) پخش (ثانیه)
+PLAYBACK_BUFFER_DURATION = 2.0   # ظرفیت بافر پخش (ثانیه)
+PLAYBACK_QUEUE_SIZE = 32         # حداکثر chunk های در انتظار پخش
+
+# تنظیمات لاگ و metric ها
+LOG_LEVEL = "INFO"      # سطح لاگ: DEBUG، INFO، WARNING، ERROR
+LOG_FORMAT = "text"     # قالب لاگ: text (کلید=مقدار) یا json (یک شیء JSON در هر خط)
+METRICS_ENABLED = True  # ارائه metric ها با قالب Prometheus در /api/metrics
+
+# تنظیمات ردیابی هر جمله (خروجی Chrome trace-event قابل نمایش در Perfetto)
+TRACING_ENABLED = False                        # ثبت span های هر جمله/درخواست (غیرفعال = بدون سربار)
+TRACE_FILE = "traces/linguastream_trace.json"  # فایل خروجی هنگام خروج برنامه
+TRACE_MAX_TRACES = 200                         # حداکثر trace های نگه‌داشته شده در حافظه
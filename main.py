@@ -1,4 +1,3 @@
-import pyaudio
 import numpy as np
 import threading
 import time
@@ -13,6 +12,10 @@ from src.audio_handler import AudioHandler
 from src.stt_engine import STTEngine
 from src.translator import Translator
 from src.tts_engine import TTSEngine
+from src.pipeline import Pipeline
+from src.preloader import ModelPreloader
+from src.playback import END_OF_STREAM
+from src import tracing
 
 class LinguaStream:
     def __init__(self):
@@ -23,52 +26,73 @@ class LinguaStream:
         self.stt_engine = STTEngine()
         self.translator = Translator()
         self.tts_engine = TTSEngine()
+        self.preloader = ModelPreloader({
+            'stt_engine': self.stt_engine,
+            'translator': self.translator,
+            'tts_engine': self.tts_engine
+        })
         
+        self.pipeline = None
         self.is_running = False
         print("✅ LinguaStream آماده است!")
 
+    def _stt_stage(self, audio_chunk):
+        """مرحله گفتار به متن"""
+        print("\n🔄 تشخیص گفتار...")
+        farsi_text = self.stt_engine.transcribe(audio_chunk)
+        print(f"📝 متن فارسی: {farsi_text}")
+        return farsi_text if farsi_text.strip() else None
+
+    def _translate_stage(self, farsi_text):
+        """مرحله ترجمه"""
+        print("🌐 ترجمه...")
+        english_text = self.translator.translate(farsi_text)
+        print(f"📝 متن انگلیسی: {english_text}")
+        return english_text if english_text.strip() else None
+
+    def _tts_stage(self, english_text):
+        """مرحله متن به گفتار: هر جمله به محض سنتز به مرحله پخش می‌رود"""
+        print("🔊 سنتز گفتار...")
+        yield from self.tts_engine.synthesize_stream(english_text)
+        yield END_OF_STREAM
+
+    def _playback_stage(self, translated_audio):
+        """مرحله پخش صدا: فقط صف‌بندی؛ پخش در worker پخش همزمان با جمله بعدی انجام می‌شود"""
+        if translated_audio is END_OF_STREAM:
+            self.audio_handler.end_playback()
+        else:
+            self.audio_handler.play_audio(translated_audio)
+        return None
+
     def process_loop(self):
-        """حلقه اصلی برای ضبط، پردازش و پخش صوتی"""
+        """حلقه اصلی: ضبط جملات و ارسال آن‌ها به خط لوله پردازش"""
         print("🎤 شروع ترجمه همزمان...")
         self.is_running = True
         
+        # هر مرحله worker خود را دارد تا جمله بعدی همزمان با سنتز جمله قبلی تشخیص داده شود
+        self.pipeline = Pipeline([
+            ("stt", self._stt_stage),
+            ("translate", self._translate_stage),
+            ("tts", self._tts_stage),
+            ("playback", self._playback_stage),
+        ])
+        self.pipeline.start()
+        self.audio_handler.start_stream()
+        
         while self.is_running:
             try:
-                # 1. ضبط chunk صوتی
-                audio_chunk = self.audio_handler.capture_chunk()
+                # 1. دریافت جمله کامل (تقطیع شده با VAD) و trace آن
+                audio_chunk, trace = self.audio_handler.capture_utterance()
                 if audio_chunk is None:
-                    time.sleep(0.1)
                     continue
 
                 # بررسی حداقل مدت زمان صوتی
-                duration = len(audio_chunk) / config.SAMPLE_RATE
-                if duration < config.MIN_AUDIO_DURATION:
-                    continue
-
-                # 2. گفتار به متن
-                print("\n🔄 تشخیص گفتار...")
-                farsi_text = self.stt_engine.transcribe(audio_chunk)
-                print(f"📝 متن فارسی: {farsi_text}")
-
-                if not farsi_text.strip():
+                if audio_chunk.duration < config.MIN_AUDIO_DURATION:
                     continue
 
-                # 3. ترجمه
-                print("🌐 ترجمه...")
-                english_text = self.translator.translate(farsi_text)
-                print(f"📝 متن انگلیسی: {english_text}")
-
-                if not english_text.strip():
-                    continue
-
-                # 4. متن به گفتار
-                print("🔊 سنتز گفتار...")
-                translated_audio_bytes = self.tts_engine.synthesize(english_text)
-                
-                if translated_audio_bytes:
-                    # 5. پخش صدا
-                    self.audio_handler.play_audio(translated_audio_bytes)
-                    print("✅ ترجمه کامل شد!")
+                # 2. ارسال به خط لوله (در صورت پر بودن صف‌ها، ضبط منتظر می‌ماند)
+                while self.is_running and not self.pipeline.submit(audio_chunk, timeout=0.1, trace=trace):
+                    pass
 
             except KeyboardInterrupt:
                 print("\n⏹️ توقف توسط کاربر...")
@@ -83,6 +107,12 @@ class LinguaStream:
             print("🎯 شروع سیستم ترجمه همزمان...")
             print("برای توقف، Ctrl+C را فشار دهید")
             
+            # بارگذاری همزمان مدل‌ها پیش از شروع ضبط تا اولین جمله سریع پردازش شود
+            if config.PRELOAD_MODELS:
+                print("⏳ بارگذاری مدل‌ها...")
+                self.preloader.start()
+                self.preloader.wait()
+            
             # اجرای پردازش در thread جداگانه
             processing_thread = threading.Thread(target=self.process_loop)
             processing_thread.daemon = True
@@ -101,8 +131,16 @@ class LinguaStream:
     def cleanup(self):
         """پاک‌سازی منابع"""
         self.is_running = False
+        # ابتدا خط لوله تخلیه می‌شود؛ مرحله پخش در حال اجرا، worker پخش متوقف شده را
+        # دوباره راه‌اندازی می‌کرد و موتورها حین اجرای مراحل آزاد می‌شدند
+        if self.pipeline:
+            self.pipeline.stop(timeout=5.0)
         if self.audio_handler:
             self.audio_handler.cleanup()
+        for engine in (self.stt_engine, self.translator, self.tts_engine):
+            engine.release()
+        if tracing.tracer.enabled:
+            print(f"📈 trace جملات در {tracing.tracer.dump()} ذخیره شد (قابل نمایش در ui.perfetto.dev)")
         print("🧹 منابع پاک‌سازی شدند")
 
 def main():
@@ -0,0 +1,124 @@
+import numpy as np
+import config
+
+# مقیاس تبدیل PCM 16 بیتی به float در بازه [-1, 1]
+_INT16_SCALE = 32768.0
+
+class AudioBuffer:
+    """
+    نگهدارنده سبک صدای PCM که بین تمام مراحل (ضبط، STT، TTS، پخش) منتقل می‌شود.
+    نمونه‌ها بدون کپی نگه داشته می‌شوند؛ تبدیل نوع داده فقط هنگام نیاز و یک بار
+    انجام و نتیجه (به همراه peak) ذخیره می‌شود.
+    """
+
+    __slots__ = ("samples", "sample_rate", "channels", "normalized", "_float32", "_int16", "_peak")
+
+    def __init__(self, samples, sample_rate=None, channels=1, normalized=False):
+        self.samples = samples
+        self.sample_rate = sample_rate or config.SAMPLE_RATE
+        self.channels = channels
+        # True یعنی peak نمونه‌ها قبلاً به 1.0 رسانده شده
+        self.normalized = normalized
+        self._float32 = samples if samples.dtype == np.float32 else None
+        self._int16 = samples if samples.dtype == np.int16 else None
+        self._peak = 1.0 if normalized else None
+
+    @classmethod
+    def from_bytes(cls, data, sample_rate=None, channels=1):
+        """ساخت بافر از PCM 16 بیتی خام (bytes یا memoryview) بدون کپی"""
+        return cls(np.frombuffer(data, dtype=np.int16), sample_rate=sample_rate, channels=channels)
+
+    @classmethod
+    def wrap(cls, audio, sample_rate=None):
+        """AudioBuffer را همان‌طور برمی‌گرداند و numpy array یا bytes را در بافر می‌پیچد"""
+        if isinstance(audio, cls):
+            return audio
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            return cls.from_bytes(audio, sample_rate=sample_rate)
+        return cls(np.asarray(audio), sample_rate=sample_rate)
+
+    @property
+    def dtype(self):
+        return self.samples.dtype
+
+    def __len__(self):
+        """تعداد فریم‌ها (نمونه در هر کانال)"""
+        return len(self.samples) // self.channels
+
+    @property
+    def duration(self):
+        return len(self) / self.sample_rate
+
+    @property
+    def peak(self):
+        """بیشینه قدر مطلق دامنه در مقیاس float (یک بار محاسبه می‌شود)"""
+        if self._peak is None:
+            if len(self.samples) == 0:
+                self._peak = 0.0
+            else:
+                # max/min به جای abs تا آرایه موقت هم‌اندازه ساخته نشود
+                peak = max(float(self.samples.max()), -float(self.samples.min()))
+                if self.samples.dtype == np.int16:
+                    peak /= _INT16_SCALE
+                self._peak = peak
+        return self._peak
+
+    def as_float32(self):
+        """نمونه‌ها به صورت float32 در بازه [-1, 1]"""
+        if self._float32 is None:
+            if self.samples.dtype == np.int16:
+                self._float32 = self.samples.astype(np.float32)
+                self._float32 *= 1.0 / _INT16_SCALE
+            else:
+                self._float32 = self.samples.astype(np.float32)
+        return self._float32
+
+    def as_int16(self):
+        """نمونه‌ها به صورت PCM 16 بیتی"""
+        if self._int16 is None:
+            audio = np.clip(self.as_float32(), -1.0, 1.0)
+            audio *= _INT16_SCALE - 1
+            self._int16 = audio.astype(np.int16)
+        return self._int16
+
+    def tobytes(self):
+        """PCM 16 بیتی خام برای پخش، ذخیره یا ارسال"""
+        return self.as_int16().tobytes()
+
+    def normalize(self, inplace=True):
+        """
+        رساندن peak به 1.0 و برگرداندن آرایه float32. در حالت inplace روی
+        آرایه float32 خود بافر (در صورت قابل نوشتن بودن) تقسیم می‌شود؛ بافر
+        قبلاً نرمال‌شده بدون هیچ پیمایش اضافه برگردانده می‌شود.
+        """
+        if self.normalized:
+            return self.as_float32()
+
+        peak = self.peak
+        if not inplace:
+            audio = self.as_float32()
+            return audio / peak if peak > 0 else audio
+
+        audio = self.as_float32()
+        if not audio.flags.writeable:
+            audio = audio.copy()
+        if peak > 0:
+            audio *= 1.0 / peak
+
+        self.samples = audio
+        self._float32 = audio
+        self._int16 = None
+        self._peak = 1.0 if peak > 0 else 0.0
+        self.normalized = True
+        return audio
+
+    def to_mono(self):
+        """میانگین کانال‌ها به صورت یک بافر مونو جدید"""
+        if self.channels == 1:
+            return self
+        mono = self.as_float32().reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        return AudioBuffer(mono, sample_rate=self.sample_rate)
+
+    def __repr__(self):
+        return (f"AudioBuffer({len(self)} frames, {self.dtype}, {self.sample_rate} Hz, "
+                f"{self.channels} ch, {self.duration:.2f} s)")
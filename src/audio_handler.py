@@ -6,126 +6,438 @@ import io
 import wave
 import tempfile
 import os
+import queue
+import subprocess
+import collections
 from pydub import AudioSegment
 from pydub.utils import which
+from src.audio_buffer import AudioBuffer
+from src.ring_buffer import RingBuffer
+from src.playback import PlaybackEngine
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("audio_handler")
+
+class VoiceActivityDetector:
+    """تشخیص فعالیت صوتی مبتنی بر انرژی و تقطیع جریان صوتی به جملات کامل"""
+
+    def __init__(self, sample_rate=None, threshold=None, hangover_duration=None,
+                 pre_roll_duration=None, min_duration=None, max_duration=None):
+        self.sample_rate = sample_rate or config.SAMPLE_RATE
+        self.threshold = config.VOICE_ACTIVITY_THRESHOLD if threshold is None else threshold
+        hangover_duration = config.VAD_HANGOVER_DURATION if hangover_duration is None else hangover_duration
+        pre_roll_duration = config.VAD_PRE_ROLL_DURATION if pre_roll_duration is None else pre_roll_duration
+        min_duration = config.MIN_AUDIO_DURATION if min_duration is None else min_duration
+        max_duration = config.MAX_AUDIO_DURATION if max_duration is None else max_duration
+
+        self.hangover_samples = int(hangover_duration * self.sample_rate)
+        self.pre_roll_samples = int(pre_roll_duration * self.sample_rate)
+        self.min_samples = int(min_duration * self.sample_rate)
+        self.max_samples = int(max_duration * self.sample_rate)
+        # سکوت انتهای آخرین جمله (ثانیه)؛ زمانی که VAD پس از پایان گفتار منتظر ماند
+        self.last_trailing_silence = 0.0
+        self.reset()
+
+    def reset(self):
+        """پاک کردن وضعیت جمله در حال ساخت"""
+        self.in_speech = False
+        self.frames = []
+        self.total_samples = 0
+        self.silence_samples = 0
+        self.pre_roll = collections.deque()
+        self.pre_roll_length = 0
+
+    def is_speech(self, frame):
+        """بررسی عبور انرژی (RMS) فریم از آستانه"""
+        if len(frame) == 0:
+            return False
+        return float(np.sqrt(np.mean(np.square(frame)))) >= self.threshold
+
+    def process_frame(self, frame):
+        """
+        پردازش یک فریم float32 و برگرداندن جمله کامل در صورت پایان گفتار
+        """
+        if self.is_speech(frame):
+            if not self.in_speech:
+                # شروع گفتار: صدای پیش از شروع هم نگه داشته می‌شود
+                self.in_speech = True
+                self.frames = list(self.pre_roll)
+                self.total_samples = self.pre_roll_length
+                self.pre_roll.clear()
+                self.pre_roll_length = 0
+            self.silence_samples = 0
+            self._append(frame)
+        elif self.in_speech:
+            self._append(frame)
+            self.silence_samples += len(frame)
+            if self.silence_samples >= self.hangover_samples:
+                return self._finish()
+        else:
+            self.pre_roll.append(frame)
+            self.pre_roll_length += len(frame)
+            while self.pre_roll and self.pre_roll_length - len(self.pre_roll[0]) >= self.pre_roll_samples:
+                self.pre_roll_length -= len(self.pre_roll.popleft())
+            return None
+
+        # جملات طولانی‌تر از حداکثر مجاز بدون انتظار برای سکوت ارسال می‌شوند
+        if self.total_samples >= self.max_samples:
+            return self._finish()
+        return None
+
+    def flush(self):
+        """برگرداندن جمله ناتمام (مثلاً هنگام توقف ضبط)"""
+        if not self.in_speech:
+            return None
+        return self._finish()
+
+    def _append(self, frame):
+        self.frames.append(frame)
+        self.total_samples += len(frame)
+
+    def _finish(self):
+        frames = self.frames
+        speech_samples = self.total_samples - self.silence_samples
+        self.last_trailing_silence = self.silence_samples / self.sample_rate
+        self.reset()
+
+        # جملات کوتاه‌تر از حداقل مدت زمان (مثلاً نویز لحظه‌ای) نادیده گرفته می‌شوند
+        if speech_samples < self.min_samples:
+            return None
+        return AudioBuffer(np.concatenate(frames), sample_rate=self.sample_rate)
 
 class AudioHandler:
     def __init__(self):
         self.is_recording = False
-        self.audio_buffer = []
-        self.buffer_lock = threading.Lock()
         
         # تنظیمات صوتی
         self.sample_rate = config.SAMPLE_RATE
         self.chunk_size = config.CHUNK_SIZE
         self.channels = config.CHANNELS
         
-        print(f"Audio Handler initialized - Sample Rate: {self.sample_rate}, Chunk Size: {self.chunk_size}")
+        # بافر ضبط: حلقوی با ظرفیت ثابت MAX_AUDIO_DURATION (thread ضبط می‌نویسد، مصرف‌کننده می‌خواند)
+        self.audio_buffer = RingBuffer(
+            int(config.MAX_AUDIO_DURATION * self.sample_rate),
+            dtype=np.float32,
+            sample_rate=self.sample_rate
+        )
+        
+        # ضبط پیوسته و تقطیع بر اساس فعالیت صوتی
+        self.is_streaming = False
+        self.vad = VoiceActivityDetector(sample_rate=self.sample_rate)
+        self.utterance_queue = queue.Queue(maxsize=config.UTTERANCE_QUEUE_SIZE)
+        self._pyaudio = None
+        self._stream = None
+        self._capture_thread = None
+        
+        # پخش در worker جداگانه تا پردازش جمله بعدی متوقف نشود
+        self.playback = PlaybackEngine()
+        
+        logger.info("Audio Handler initialized", sample_rate=self.sample_rate, chunk_size=self.chunk_size)
     
     def process_uploaded_audio(self, audio_file):
-        """پردازش فایل صوتی آپلود شده"""
+        """پردازش فایل صوتی آپلود شده و برگرداندن AudioBuffer نرمال‌شده (float32)"""
+        start_time = time.perf_counter()
+        try:
+            try:
+                samples = self.decode_audio_stream(audio_file)
+            except RuntimeError as e:
+                # برخی کانتینرها (مثلاً m4a با moov در انتهای فایل) از pipe قابل خواندن نیستند
+                if not (hasattr(audio_file, 'seekable') and audio_file.seekable()):
+                    raise
+                logger.warning("Pipe decode failed, falling back to file decode", error=str(e))
+                audio_file.seek(0)
+                samples = self._decode_with_temp_file(audio_file)
+            
+            # تبدیل به float32 و نرمال‌سازی درجا (یک بار؛ مراحل بعد دوباره نرمال نمی‌کنند)
+            audio_data = AudioBuffer(samples, sample_rate=self.sample_rate)
+            audio_data.normalize()
+            tracing.record(
+                tracing.current_trace(), "decode", start_time, time.perf_counter(), duration=audio_data.duration
+            )
+            metrics.observe_audio_stage("decode", time.perf_counter() - start_time, audio_data.duration)
+            return audio_data
+            
+        except Exception as e:
+            logger.error("Error processing uploaded audio", error=str(e))
+            metrics.ERRORS.inc(component="decode")
+            return None
+    
+    def decode_audio_stream(self, audio_file):
+        """
+        رمزگشایی جریان صوتی با ffmpeg از طریق pipe (بدون فایل موقت): ورودی همزمان با
+        خوانده شدن به ffmpeg داده می‌شود و خروجی PCM 16 بیتی مونو با نرخ نمونه Whisper است
+        """
+        process = subprocess.Popen(
+            [
+                which("ffmpeg") or "ffmpeg",
+                "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ac", "1", "-ar", str(self.sample_rate),
+                "pipe:1"
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+        def feed():
+            try:
+                while True:
+                    block = audio_file.read(config.DECODE_READ_SIZE)
+                    if not block:
+                        break
+                    process.stdin.write(block)
+            except (BrokenPipeError, OSError):
+                # ffmpeg زودتر خارج شده؛ خطای آن از stderr گزارش می‌شود
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+        
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        
+        # stdout یک بار و یکجا خوانده می‌شود تا np.frombuffer بدون کپی اضافه ساخته شود
+        output = process.stdout.read()
+        feeder.join()
+        errors = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(errors.decode('utf-8', errors='replace').strip() or "ffmpeg failed")
+        
+        return np.frombuffer(output, dtype=np.int16)
+    
+    def _decode_with_temp_file(self, audio_file):
+        """رمزگشایی از طریق فایل موقت برای کانتینرهایی که به seek نیاز دارند"""
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
         try:
-            # ذخیره فایل موقت
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
             temp_file.write(audio_file.read())
             temp_file.close()
             
-            # تبدیل به فرمت مناسب
             audio_segment = AudioSegment.from_file(temp_file.name)
-            
-            # تبدیل به مونو و نرخ نمونه مناسب
-            audio_segment = audio_segment.set_channels(1)
-            audio_segment = audio_segment.set_frame_rate(self.sample_rate)
-            
-            # تبدیل به numpy array
-            audio_data = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
-            
-            # نرمال‌سازی
-            if len(audio_data) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-            
-            # پاک کردن فایل موقت
+            audio_segment = audio_segment.set_channels(1).set_frame_rate(self.sample_rate).set_sample_width(2)
+            return np.frombuffer(audio_segment.raw_data, dtype=np.int16)
+        finally:
             os.unlink(temp_file.name)
+    
+    def start_stream(self):
+        """شروع ضبط پیوسته از میکروفن و تقطیع گفتار به جملات"""
+        if self.is_streaming:
+            return
             
-            return audio_data
+        import pyaudio
+        
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.chunk_size
+        )
+        self.vad.reset()
+        self.is_streaming = True
+        
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._capture_thread.start()
+        logger.info("Microphone stream started")
+    
+    def stop_stream(self):
+        """توقف ضبط پیوسته و ارسال آخرین جمله ناتمام"""
+        if not self.is_streaming:
+            return
             
+        self.is_streaming = False
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=1.0)
+            self._capture_thread = None
+        
+        try:
+            if self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
         except Exception as e:
-            print(f"Error processing uploaded audio: {e}")
-            return None
+            logger.error("Error closing microphone stream", error=str(e))
+        finally:
+            self._stream = None
+            self._pyaudio = None
+        
+        utterance = self.vad.flush()
+        if utterance is not None:
+            self._enqueue_utterance(utterance)
+        logger.info("Microphone stream stopped")
+    
+    def _capture_loop(self):
+        """خواندن پیوسته فریم‌ها و اجرای VAD روی هر فریم"""
+        while self.is_streaming:
+            try:
+                data = self._stream.read(self.chunk_size, exception_on_overflow=False)
+            except Exception as e:
+                logger.error("Error reading microphone stream", error=str(e))
+                metrics.ERRORS.inc(component="capture")
+                time.sleep(0.1)
+                continue
+            
+            frame = AudioBuffer.from_bytes(data, self.sample_rate, self.channels).to_mono().as_float32()
+            if self.is_recording:
+                self.add_audio_chunk(frame)
+            
+            utterance = self.vad.process_frame(frame)
+            if utterance is not None:
+                self._enqueue_utterance(utterance)
+    
+    def _enqueue_utterance(self, utterance):
+        metrics.AUDIO_SECONDS.inc(utterance.duration, stage="capture")
+        
+        # trace جمله از لحظه تشخیص پایان آن شروع می‌شود؛ ضبط و انتظار VAD برای سکوت
+        # (hangover) پیش از آن بوده‌اند و با زمان‌های محاسبه شده ثبت می‌شوند
+        trace = tracing.start_trace("utterance", duration=round(utterance.duration, 2))
+        if trace is not None:
+            detected_at = time.perf_counter()
+            tracing.record(trace, "capture", detected_at - utterance.duration, detected_at)
+            tracing.record(trace, "vad_hangover", detected_at - self.vad.last_trailing_silence, detected_at)
+        
+        try:
+            self.utterance_queue.put_nowait((utterance, trace))
+        except queue.Full:
+            # اگر پردازش عقب بماند، قدیمی‌ترین جمله کنار گذاشته می‌شود
+            try:
+                self.utterance_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.utterance_queue.put_nowait((utterance, trace))
+            logger.warning("Utterance queue full, dropped oldest utterance")
+            metrics.ERRORS.inc(component="utterance_queue")
+        metrics.QUEUE_DEPTH.set(self.utterance_queue.qsize(), queue="utterances")
+    
+    def capture_chunk(self, timeout=0.1):
+        """
+        دریافت جمله کامل بعدی (AudioBuffer از نوع float32) یا None اگر جمله‌ای آماده نباشد
+        """
+        return self.capture_utterance(timeout)[0]
+    
+    def capture_utterance(self, timeout=0.1):
+        """
+        دریافت جمله کامل بعدی به همراه trace آن: (AudioBuffer، Trace یا None)؛
+        (None، None) اگر جمله‌ای آماده نباشد
+        """
+        try:
+            utterance, trace = self.utterance_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+        metrics.QUEUE_DEPTH.set(self.utterance_queue.qsize(), queue="utterances")
+        if trace is not None:
+            tracing.record(trace, "utterance_queue", trace.start_time, time.perf_counter())
+        return utterance, trace
     
     def start_recording(self):
         """شروع ضبط صدا (برای سازگاری با کد قدیمی)"""
+        self.audio_buffer.clear()
         self.is_recording = True
-        self.audio_buffer = []
-        print("Recording started (Web-based)...")
+        logger.info("Recording started (Web-based)")
     
     def stop_recording(self):
         """توقف ضبط صدا (برای سازگاری با کد قدیمی)"""
         self.is_recording = False
-        print("Recording stopped.")
+        logger.info("Recording stopped")
+    
+    def add_audio_chunk(self, audio_chunk):
+        """افزودن صدای ضبط شده به بافر (سمت تولیدکننده)"""
+        written = self.audio_buffer.write(AudioBuffer.wrap(audio_chunk, sample_rate=self.sample_rate).as_float32())
+        if written < len(audio_chunk):
+            logger.warning("Recording buffer full, dropped newest audio", dropped_samples=len(audio_chunk) - written)
+        return written
+    
+    def get_audio_window(self, duration=None):
+        """
+        view (بدون کپی) از آخرین duration ثانیه صدای بافر بدون مصرف آن؛ فقط تا
+        مصرف بعدی بافر معتبر است
+        """
+        if duration is None:
+            return self.audio_buffer.peek()
+        return self.audio_buffer.latest(int(duration * self.sample_rate))
     
     def get_audio_data(self):
         """دریافت داده‌های صوتی ضبط شده (برای سازگاری با کد قدیمی)"""
-        with self.buffer_lock:
-            if not self.audio_buffer:
-                return None
-                
-            # ترکیب تمام chunk های صوتی
-            audio_data = np.concatenate(self.audio_buffer)
-            
-            # پاک کردن بافر
-            self.audio_buffer = []
-            
-            return audio_data
+        if len(self.audio_buffer) == 0:
+            return None
+        
+        # یک کپی پیوسته از کل بافر و آزاد کردن آن برای ضبط بعدی
+        return AudioBuffer(self.audio_buffer.read(), sample_rate=self.sample_rate)
     
     def get_audio_duration(self):
-        """محاسبه مدت زمان صوتی موجود در بافر"""
-        with self.buffer_lock:
-            if not self.audio_buffer:
-                return 0
-            total_samples = sum(len(chunk) for chunk in self.audio_buffer)
-            return total_samples / self.sample_rate
+        """مدت زمان صوتی موجود در بافر (O(1))"""
+        return self.audio_buffer.duration
     
     def save_audio_to_file(self, filename, audio_data):
         """ذخیره داده‌های صوتی در فایل WAV"""
         try:
-            # تبدیل numpy array به AudioSegment
+            # تبدیل به PCM 16 بیتی و AudioSegment
+            audio_data = AudioBuffer.wrap(audio_data, sample_rate=self.sample_rate)
             audio_segment = AudioSegment(
                 audio_data.tobytes(),
-                frame_rate=self.sample_rate,
+                frame_rate=audio_data.sample_rate,
                 sample_width=2,  # 16-bit
                 channels=1
             )
             
             # ذخیره فایل
             audio_segment.export(filename, format="wav")
-            print(f"Audio saved to {filename}")
+            logger.info("Audio saved", filename=filename)
             return True
         except Exception as e:
-            print(f"Error saving audio: {e}")
+            logger.error("Error saving audio", filename=filename, error=str(e))
             return False
     
-    def play_audio(self, audio_data):
-        """پخش فایل صوتی"""
+    def play_audio(self, audio_data, sample_rate=None):
+        """
+        افزودن صدا (AudioBuffer، PCM 16 بیتی خام یا numpy array) به صف پخش؛
+        بلافاصله برمی‌گردد و پخش در worker پخش انجام می‌شود
+        """
         try:
-            # تبدیل به AudioSegment
-            audio_segment = AudioSegment(
-                audio_data.tobytes(),
-                frame_rate=self.sample_rate,
-                sample_width=2,
-                channels=1
-            )
-            
-            # پخش صدا
-            audio_segment.play()
-            
+            audio_data = AudioBuffer.wrap(audio_data, sample_rate=sample_rate or self.sample_rate)
+            return self.playback.play(audio_data)
         except Exception as e:
-            print(f"Error playing audio: {e}")
+            logger.error("Error playing audio", error=str(e))
+            metrics.ERRORS.inc(component="playback")
+            return False
+    
+    def end_playback(self):
+        """اعلام پایان صدای یک جمله (صدای باقیمانده بدون انتظار برای بافر jitter پخش می‌شود)"""
+        self.playback.end_stream()
+    
+    def play_stream(self, audio_chunks, sample_rate=None, wait=True):
+        """
+        پخش chunk های PCM به محض رسیدن؛ سنتز chunk بعدی همزمان با پخش chunk
+        فعلی ادامه می‌یابد
+        """
+        try:
+            for chunk in audio_chunks:
+                self.play_audio(chunk, sample_rate=sample_rate)
+        except Exception as e:
+            logger.error("Error producing audio stream", error=str(e))
+        finally:
+            self.end_playback()
+        
+        if wait:
+            self.playback.wait()
+    
+    def get_playback_stats(self):
+        """آمار پخش (عمق صف، underrun ها و ...)"""
+        return self.playback.get_stats()
     
     def cleanup(self):
         """پاک‌سازی منابع"""
+        self.stop_stream()
         self.stop_recording()
-        print("Audio Handler cleaned up.")
+        self.playback.stop()
+        logger.info("Audio Handler cleaned up")
     
     def get_available_devices(self):
         """دریافت لیست دستگاه‌های صوتی موجود (برای سازگاری)"""
@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from src import metrics
+
+class ServerOverloaded(Exception):
+    """ظرفیت اجرا و صف انتظار پر است؛ درخواست باید بعداً تکرار شود"""
+
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after or config.API_RETRY_AFTER
+        super().__init__(f"Inference queue full, retry after {self.retry_after} s")
+
+class InferenceExecutor:
+    """
+    اجرای استنتاج‌های مسدودکننده برای سرور asyncio در یک thread pool محدود، با
+    کنترل پذیرش: حداکثر max_workers کار همزمان و max_pending کار در انتظار؛
+    درخواست‌های بیشتر فوراً با ServerOverloaded رد می‌شوند.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or config.API_INFERENCE_WORKERS
+        self.max_pending = config.API_MAX_PENDING if max_pending is None else max_pending
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        # کارهای پذیرفته شده (در حال اجرا یا در صف pool)
+        self.active = 0
+
+        # آمار
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self.active >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise ServerOverloaded()
+            self.active += 1
+            self.admitted += 1
+            metrics.QUEUE_DEPTH.set(max(0, self.active - self.max_workers), queue="inference")
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.active -= 1
+            metrics.QUEUE_DEPTH.set(max(0, self.active - self.max_workers), queue="inference")
+
+    async def run(self, func, *args, timeout=None):
+        """
+        اجرای func(*args) در pool. با پایان timeout، TimeoutError به فراخواننده
+        برمی‌گردد اما ظرفیت فقط پس از پایان واقعی کار آزاد می‌شود.
+        """
+        self._acquire()
+        loop = asyncio.get_running_loop()
+        # run_in_executor برخلاف asyncio.to_thread context را منتقل نمی‌کند (مثلاً trace درخواست)
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self.pool, context.run, func, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def iterate(self, iterator, timeout=None):
+        """
+        پیمایش یک iterator مسدودکننده (مثلاً سنتز جریانی) در pool با یک ظرفیت
+        برای کل پیمایش؛ timeout برای هر گام اعمال می‌شود
+        """
+        self._acquire()
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        done = object()
+        future = None
+        try:
+            while True:
+                future = loop.run_in_executor(self.pool, context.run, next, iterator, done)
+                try:
+                    item = await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise
+                if item is done:
+                    break
+                yield item
+        finally:
+            if future is not None and not future.done():
+                future.add_done_callback(self._release)
+            else:
+                self._release()
+
+    def get_stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": self.active,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
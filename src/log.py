@@ -0,0 +1,94 @@
+import json
+import logging
+import sys
+import threading
+import time
+import config
+
+# لاگ ساختاریافته: هر رویداد یک پیام ثابت و فیلدهای کلید/مقدار دارد تا خروجی
+# (متنی یا JSON با LOG_FORMAT) قابل جستجو و پردازش باشد
+
+_ROOT_LOGGER = "linguastream"
+_configure_lock = threading.RLock()
+_configured = False
+
+class StructuredFormatter(logging.Formatter):
+    """قالب‌بندی رکورد با فیلدهای ساختاریافته؛ json_output=True یک شیء JSON در هر خط"""
+
+    def __init__(self, json_output=False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        logger_name = record.name[len(_ROOT_LOGGER) + 1:] if record.name.startswith(_ROOT_LOGGER + ".") else record.name
+
+        if self.json_output:
+            entry = {"time": timestamp, "level": record.levelname, "logger": logger_name, "event": record.getMessage()}
+            entry.update(fields)
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        line = f"{timestamp} {record.levelname:<7} {logger_name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={self._format_field(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+    @staticmethod
+    def _format_field(value):
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        text = str(value)
+        return json.dumps(text, ensure_ascii=False) if not text or any(c in text for c in ' ="') else text
+
+class StructuredLogger:
+    """لایه نازک روی logging.Logger: logger.info("event", key=value, ...)"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=exc_info)
+
+def configure_logging(level=None, log_format=None):
+    """تنظیم handler لاگ‌های LinguaStream (یک بار در هر process)"""
+    global _configured
+    with _configure_lock:
+        root = logging.getLogger(_ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(StructuredFormatter(json_output=(log_format or config.LOG_FORMAT) == "json"))
+        root.addHandler(handler)
+        root.setLevel((level or config.LOG_LEVEL).upper())
+        # جلوگیری از چاپ دوباره توسط handler های root (مثلاً streamlit)
+        root.propagate = False
+        _configured = True
+
+def get_logger(name):
+    """logger ساختاریافته یک ماژول؛ در اولین استفاده پیکربندی پیش‌فرض اعمال می‌شود"""
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                configure_logging()
+    return StructuredLogger(logging.getLogger(f"{_ROOT_LOGGER}.{name}"))
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    کش LRU thread-safe با محدودیت اندازه کل؛ اندازه هر مقدار با تابع sizeof
+    محاسبه می‌شود (پیش‌فرض: هر مقدار یک واحد، یعنی محدودیت تعداد)
+    """
+
+    def __init__(self, max_size, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_size = 0
+
+        # شمارنده‌ها
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        # مقادیر بزرگ‌تر از کل ظرفیت ذخیره نمی‌شوند
+        if size > self.max_size:
+            return False
+
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.total_size -= previous[1]
+            self._data[key] = (value, size)
+            self.total_size += size
+
+            while self.total_size > self.max_size:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.total_size -= evicted_size
+                self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.total_size -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        """آمار کش شامل نرخ برخورد"""
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size": self.total_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions
+        }
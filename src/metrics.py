@@ -0,0 +1,328 @@
+import threading
+import time
+import config
+
+# مرزهای پیش‌فرض histogram تأخیر (ثانیه)؛ MAX_LATENCY هم یک مرز است تا عبور از بودجه تأخیر دیده شود
+LATENCY_BUCKETS = tuple(sorted({0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, float(config.MAX_LATENCY)}))
+# مرزهای ضریب بلادرنگ (زمان پردازش / طول صدا)
+RTF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+# مرزهای انتظار زمان‌بند batch (ثانیه)؛ مهلت STT_BATCH_MAX_WAIT_MS در حد چند میلی‌ثانیه است
+WAIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+# مرزهای اندازه batch (تعداد کلیپ)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        """(پسوند نام، مقادیر برچسب، برچسب اضافه، مقدار) برای خروجی متنی"""
+        raise NotImplementedError
+
+    def drain(self):
+        """برداشتن مقادیر ثبت شده از آخرین drain و صفر کردن آن‌ها (ارسال از process worker)"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        """افزودن مقادیر drain شده یک process دیگر"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, values, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """شمارنده افزایشی"""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, None, value) for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    """مقدار لحظه‌ای (مثلاً عمق صف)"""
+
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def drain(self):
+        # مقدار لحظه‌ای فقط در process خودش معنا دارد (مثلاً عمق صف‌های همان process)
+        return {}
+
+    def merge(self, values):
+        pass
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, None, value) for key, value in sorted(self._values.items())]
+
+class Histogram(_Metric):
+    """توزیع مقادیر در bucket های تجمعی به همراه مجموع و تعداد"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = [list(counts), total, count]
+                    continue
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def time(self, **labels):
+        """context manager برای ثبت مدت اجرای یک بلوک"""
+        return _Timer(self, labels)
+
+    def get(self, **labels):
+        """(تعداد، مجموع) مشاهدات"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state[2], state[1]) if state else (0, 0.0)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append(("_bucket", key, ("le", _format_value(float(bound))), cumulative))
+                samples.append(("_sum", key, None, total))
+                samples.append(("_count", key, None, count))
+        return samples
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start_time", "elapsed")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start_time = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.elapsed = time.perf_counter() - self.start_time
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+class MetricsRegistry:
+    """
+    رجیستری سراسری metric ها در سطح process؛ خروجی با قالب متنی Prometheus
+    (text exposition format 0.0.4) از render گرفته می‌شود
+    """
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def drain(self):
+        """
+        مقادیر ثبت شده از آخرین drain به تفکیک نام metric (بدون gauge ها) و صفر کردن آن‌ها؛
+        process های worker آن را همراه هر نتیجه برمی‌گردانند تا در process اصلی merge شود
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        deltas = {}
+        for metric in metrics:
+            values = metric.drain()
+            if values:
+                deltas[metric.name] = values
+        return deltas
+
+    def merge(self, deltas):
+        """افزودن خروجی drain یک process دیگر به همین رجیستری"""
+        for name, values in deltas.items():
+            with self._lock:
+                metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+# نمونه سراسری مشترک بین تمام اجزای یک process
+registry = MetricsRegistry()
+
+# metric های مشترک اجزا
+STAGE_LATENCY = registry.histogram(
+    "linguastream_stage_latency_seconds",
+    "Latency of each processing stage (decode, stt, stt_batch, translate, tts, ...)",
+    ["stage"]
+)
+AUDIO_SECONDS = registry.counter(
+    "linguastream_audio_seconds_total",
+    "Seconds of audio processed (stt: input audio, tts: synthesized audio, capture: recorded utterances)",
+    ["stage"]
+)
+REAL_TIME_FACTOR = registry.histogram(
+    "linguastream_real_time_factor",
+    "Processing time divided by audio duration",
+    ["stage"],
+    buckets=RTF_BUCKETS
+)
+QUEUE_DEPTH = registry.gauge(
+    "linguastream_queue_depth",
+    "Items waiting in internal queues",
+    ["queue"]
+)
+STT_BATCH_SIZE = registry.histogram(
+    "linguastream_stt_batch_size",
+    "Clips per transcribe_batch call dispatched by the STT micro-batching scheduler",
+    buckets=BATCH_SIZE_BUCKETS
+)
+STT_BATCH_WAIT = registry.histogram(
+    "linguastream_stt_batch_wait_seconds",
+    "Time from the first request of a batch arriving until the batch is dispatched",
+    buckets=WAIT_BUCKETS
+)
+STT_QUEUE_DELAY = registry.histogram(
+    "linguastream_stt_queue_delay_seconds",
+    "Time each request spends in the STT scheduler queue before its batch is dispatched",
+    buckets=WAIT_BUCKETS
+)
+CACHE_REQUESTS = registry.counter(
+    "linguastream_cache_requests_total",
+    "Cache lookups by result (hit or miss)",
+    ["cache", "result"]
+)
+ERRORS = registry.counter(
+    "linguastream_errors_total",
+    "Errors by component",
+    ["component"]
+)
+PLAYBACK_UNDERRUNS = registry.counter(
+    "linguastream_playback_underruns_total",
+    "Playback periods with not enough buffered audio"
+)
+TIME_TO_FIRST_OUTPUT = registry.histogram(
+    "linguastream_time_to_first_output_seconds",
+    "Time from submitting an utterance to the pipeline until its first output reaches the last stage"
+)
+LATENCY_BUDGET_EXCEEDED = registry.counter(
+    "linguastream_latency_budget_exceeded_total",
+    "Utterances or requests that took longer than MAX_LATENCY",
+    ["scope"]
+)
+API_REQUESTS = registry.counter(
+    "linguastream_api_requests_total",
+    "API requests by endpoint and HTTP status",
+    ["endpoint", "status"]
+)
+API_LATENCY = registry.histogram(
+    "linguastream_api_request_latency_seconds",
+    "API request latency until the response has been sent",
+    ["endpoint"]
+)
+
+def observe_audio_stage(stage, elapsed, audio_duration):
+    """ثبت تأخیر، ثانیه‌های صدا و ضریب بلادرنگ یک مرحله صوتی"""
+    STAGE_LATENCY.observe(elapsed, stage=stage)
+    if audio_duration > 0:
+        AUDIO_SECONDS.inc(audio_duration, stage=stage)
+        REAL_TIME_FACTOR.observe(elapsed / audio_duration, stage=stage)
+
+def observe_request(endpoint, status, elapsed):
+    """ثبت یک درخواست API؛ درخواست‌های کندتر از MAX_LATENCY جداگانه شمرده می‌شوند"""
+    API_REQUESTS.inc(endpoint=endpoint, status=status)
+    API_LATENCY.observe(elapsed, endpoint=endpoint)
+    if elapsed > config.MAX_LATENCY:
+        LATENCY_BUDGET_EXCEEDED.inc(scope="api")
@@ -0,0 +1,95 @@
+import threading
+import time
+from src.log import get_logger
+
+logger = get_logger("model_registry")
+
+class _RegistryEntry:
+    def __init__(self):
+        self.model = None
+        self.refcount = 0
+        self.load_time = None
+        # قفل هر مدل: هم بارگذاری و هم استنتاج روی یک مدل مشترک را سریالی می‌کند
+        self.lock = threading.RLock()
+
+class ModelRegistry:
+    """
+    رجیستری سراسری مدل‌ها در سطح process: هر مدل فقط یک بار بارگذاری می‌شود و
+    تمام نمونه‌های موتورها (جلسات Streamlit، سرور API و خط لوله) آن را به اشتراک می‌گذارند.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _RegistryEntry()
+                self._entries[key] = entry
+            return entry
+
+    def acquire(self, key, loader):
+        """
+        دریافت مدل با کلید key؛ اگر بارگذاری نشده باشد loader فراخوانی می‌شود.
+        هر acquire باید با یک release متناظر شود.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _RegistryEntry()
+                self._entries[key] = entry
+            entry.refcount += 1
+
+        # بارگذاری خارج از قفل سراسری تا مدل‌های مختلف همزمان بارگذاری شوند
+        with entry.lock:
+            if entry.model is None:
+                try:
+                    start_time = time.perf_counter()
+                    entry.model = loader()
+                    entry.load_time = time.perf_counter() - start_time
+                    logger.info("Model loaded into shared registry", key=key, load_time=entry.load_time)
+                except Exception:
+                    self.release(key)
+                    raise
+        return entry.model
+
+    def release(self, key):
+        """کاهش شمارنده ارجاع؛ با رسیدن به صفر مدل از حافظه آزاد می‌شود"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount > 0:
+                return
+            del self._entries[key]
+
+        with entry.lock:
+            entry.model = None
+        logger.info("Model released from shared registry", key=key)
+
+    def lock(self, key):
+        """قفل استنتاج مدل برای دسترسی thread-safe به مدل مشترک"""
+        return self._get_entry(key).lock
+
+    def is_loaded(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.model is not None
+
+    def get_stats(self):
+        """وضعیت مدل‌های موجود در رجیستری"""
+        with self._lock:
+            return {
+                key: {
+                    "loaded": entry.model is not None,
+                    "refcount": entry.refcount,
+                    "load_time": entry.load_time
+                }
+                for key, entry in self._entries.items()
+            }
+
+# نمونه سراسری مشترک بین تمام موتورهای یک process
+registry = ModelRegistry()
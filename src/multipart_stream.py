@@ -0,0 +1,44 @@
+import json
+
+# قالب پاسخ جریانی /api/translate: multipart/mixed که هر بخش آن به محض آماده شدن
+# (با انتقال chunked) ارسال می‌شود تا کلاینت پیش از پایان کل خط لوله شروع به نمایش و پخش کند
+
+BOUNDARY = "linguastream-part"
+CONTENT_TYPE = f"multipart/mixed; boundary={BOUNDARY}"
+
+def part(name, content_type, payload):
+    """
+    یک بخش کامل multipart؛ Content-Length در هدر بخش آمده تا کلاینت بدون
+    جستجوی boundary در داده باینری (مثلاً PCM) بخش را جدا کند
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    headers = (
+        f"--{BOUNDARY}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f'Content-Disposition: inline; name="{name}"\r\n'
+        f"Content-Length: {len(payload)}\r\n\r\n"
+    )
+    return headers.encode("ascii") + payload + b"\r\n"
+
+def text_part(name, text):
+    return part(name, "text/plain; charset=utf-8", text)
+
+def pcm_content_type(sample_rate, channels=1):
+    """
+    نوع محتوای PCM خام 16 بیتی little-endian (ترتیب بایت numpy روی x86/ARM)؛
+    audio/L16 طبق RFC 2586 big-endian است، پس برای اجتناب از byteswap هر جمله از آن استفاده نمی‌شود
+    """
+    return f"audio/pcm; rate={sample_rate}; channels={channels}; bits=16; endianness=little"
+
+def audio_part(audio):
+    """بخش PCM خام 16 بیتی یک جمله سنتز شده (AudioBuffer)"""
+    return part("audio", pcm_content_type(audio.sample_rate, audio.channels), audio.tobytes())
+
+def error_part(message):
+    """خطای رخ داده پس از شروع پاسخ (کد وضعیت دیگر قابل تغییر نیست)"""
+    return part("error", "application/json", json.dumps({"success": False, "error": message}, ensure_ascii=False))
+
+def end():
+    """پایان پیام multipart"""
+    return f"--{BOUNDARY}--\r\n".encode("ascii")
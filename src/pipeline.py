@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+import types
+import config
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("pipeline")
+
+# نشانگر پایان جریان که از همه مراحل عبور می‌کند
+_STOP = object()
+
+class PipelineStage:
+    """یک مرحله از خط لوله با یک worker اختصاصی و صف ورودی محدود"""
+
+    def __init__(self, name, func, input_queue, output_queue, on_item=None):
+        self.name = name
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        # فراخوانی با شماره ترتیب هر مورد دریافتی (برای سنجش زمان رسیدن به آخرین مرحله)
+        self.on_item = on_item
+        self.thread = None
+
+        # آمار مرحله
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _STOP:
+                self._forward(_STOP)
+                break
+
+            sequence, payload, trace, enqueued_at = item
+            metrics.QUEUE_DEPTH.set(self.input_queue.qsize(), queue=f"pipeline_{self.name}")
+            if self.on_item is not None:
+                self.on_item(sequence)
+            start_time = time.perf_counter()
+            tracing.record(trace, f"queue:{self.name}", enqueued_at, start_time)
+            forwarded = 0
+            try:
+                # trace مورد در این thread فعال می‌شود تا span های موتورها به آن اضافه شوند
+                with tracing.use(trace), tracing.span(f"stage:{self.name}", sequence=sequence):
+                    result = self.func(payload)
+                    # مرحله جریانی (generator): هر خروجی به محض تولید به مرحله بعد می‌رود
+                    outputs = result if isinstance(result, types.GeneratorType) else (result,)
+                    for output in outputs:
+                        # خروجی None یعنی این مورد ادامه مسیر را ندارد (مثلاً متن خالی)
+                        if output is not None:
+                            self._forward((sequence, output, trace, time.perf_counter()))
+                            forwarded += 1
+            except Exception as e:
+                logger.error("Error in pipeline stage", stage=self.name, error=str(e))
+                metrics.ERRORS.inc(component="pipeline")
+                self.errors += 1
+                continue
+            finally:
+                self.busy_time += time.perf_counter() - start_time
+
+            self.processed += 1
+            if not forwarded and self.output_queue is not None:
+                self.dropped += 1
+
+    def _forward(self, item):
+        if self.output_queue is not None:
+            self.output_queue.put(item)
+
+    def get_stats(self):
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "busy_time": self.busy_time,
+            "queue_depth": self.input_queue.qsize()
+        }
+
+class Pipeline:
+    """
+    خط لوله چندمرحله‌ای: هر مرحله در thread خود اجرا می‌شود و مراحل با صف‌های محدود
+    به هم متصل‌اند. چون هر مرحله یک worker دارد و صف‌ها FIFO هستند، ترتیب خروجی
+    همان ترتیب ورودی است.
+    """
+
+    def __init__(self, stages, queue_size=None):
+        queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+
+        queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.stages = []
+        for index, (name, func) in enumerate(stages):
+            last = index + 1 == len(queues)
+            output_queue = None if last else queues[index + 1]
+            self.stages.append(PipelineStage(
+                name, func, queues[index], output_queue, on_item=self._first_output if last else None
+            ))
+
+        self.input_queue = queues[0]
+        self.sequence = 0
+        self.is_running = False
+
+        # زمان ارسال هر مورد تا رسیدن اولین خروجی آن به آخرین مرحله
+        self._submit_times = {}
+        self._submit_lock = threading.Lock()
+
+    def start(self):
+        """شروع worker های تمام مراحل"""
+        if self.is_running:
+            return
+        for stage in self.stages:
+            stage.start()
+        self.is_running = True
+
+    def submit(self, item, timeout=None, trace=None):
+        """
+        ارسال یک مورد به مرحله اول؛ در صورت پر بودن صف تا timeout منتظر می‌ماند.
+        trace (در صورت وجود) همراه مورد و خروجی‌های آن از تمام مراحل عبور می‌کند
+        """
+        submit_time = time.perf_counter()
+        with self._submit_lock:
+            self._submit_times[self.sequence] = submit_time
+        try:
+            self.input_queue.put((self.sequence, item, trace, submit_time), timeout=timeout)
+        except queue.Full:
+            with self._submit_lock:
+                self._submit_times.pop(self.sequence, None)
+            return False
+        self.sequence += 1
+        return True
+
+    def _first_output(self, sequence):
+        """ثبت زمان رسیدن اولین خروجی یک مورد به آخرین مرحله (تأخیر تا شروع پخش)"""
+        with self._submit_lock:
+            submit_time = self._submit_times.pop(sequence, None)
+            # ترتیب FIFO است: موارد قدیمی‌تر باقیمانده خروجی نداشته‌اند (مثلاً متن خالی)
+            for stale in [key for key in self._submit_times if key < sequence]:
+                del self._submit_times[stale]
+        if submit_time is None:
+            return
+
+        elapsed = time.perf_counter() - submit_time
+        metrics.TIME_TO_FIRST_OUTPUT.observe(elapsed)
+        if elapsed > config.MAX_LATENCY:
+            metrics.LATENCY_BUDGET_EXCEEDED.inc(scope="pipeline")
+
+    def stop(self, timeout=None):
+        """ارسال نشانگر پایان و انتظار برای تخلیه تمام مراحل"""
+        if not self.is_running:
+            return
+        self.input_queue.put(_STOP)
+        for stage in self.stages:
+            stage.thread.join(timeout=timeout)
+        self.is_running = False
+
+    def get_stats(self):
+        """آمار هر مرحله"""
+        return {stage.name: stage.get_stats() for stage in self.stages}
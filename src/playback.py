@@ -0,0 +1,277 @@
+import collections
+import queue
+import threading
+import time
+from math import gcd
+import numpy as np
+from scipy.signal import resample_poly
+import config
+from src.audio_buffer import AudioBuffer
+from src.ring_buffer import RingBuffer
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("playback")
+
+# نشانگر پایان یک جریان (مثلاً آخرین جمله یک ترجمه)؛ خالی شدن بافر پس از آن underrun نیست
+END_OF_STREAM = object()
+
+def resample(audio, orig_sr, target_sr):
+    """تبدیل نرخ نمونه float32 با فیلتر polyphase"""
+    if orig_sr == target_sr:
+        return audio
+    divisor = gcd(int(orig_sr), int(target_sr))
+    return resample_poly(audio, int(target_sr) // divisor, int(orig_sr) // divisor).astype(np.float32)
+
+class PlaybackEngine:
+    """
+    پخش غیرمسدودکننده در یک worker اختصاصی. chunk ها در صف قرار می‌گیرند، هر chunk
+    یک بار به نرخ دستگاه تبدیل و در بافر jitter نوشته می‌شود و پخش فقط پس از
+    پر شدن حداقل PLAYBACK_JITTER_DURATION صدا شروع (یا پس از underrun ادامه) می‌یابد.
+    """
+
+    def __init__(self, device_rate=None, jitter_duration=None, buffer_duration=None, queue_size=None):
+        self.requested_rate = device_rate or config.PLAYBACK_SAMPLE_RATE
+        self.jitter_duration = config.PLAYBACK_JITTER_DURATION if jitter_duration is None else jitter_duration
+        self.buffer_duration = buffer_duration or config.PLAYBACK_BUFFER_DURATION
+        self.period_frames = config.CHUNK_SIZE
+        self.queue = queue.Queue(maxsize=queue_size or config.PLAYBACK_QUEUE_SIZE)
+
+        self.device_rate = None
+        self.ring = None
+        self.is_running = False
+        self._thread = None
+        self._pyaudio = None
+        self._stream = None
+        self._pending = None
+        self._playing = False
+        self._ended = True
+
+        # موقعیت نمونه‌های تبدیل شده و پخش شده برای span پخش chunk های دارای trace:
+        # [موقعیت شروع، موقعیت پایان، trace، زمان شروع پخش]
+        self._converted_samples = 0
+        self._played_samples = 0
+        self._traced_chunks = collections.deque()
+
+        # آمار
+        self.chunks_played = 0
+        self.played_duration = 0.0
+        self.underruns = 0
+
+    def start(self):
+        """شروع worker پخش (در صورت اجرا نبودن)"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """توقف worker و بستن دستگاه خروجی"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._close_stream()
+
+    def play(self, audio, timeout=None):
+        """
+        افزودن صدا (AudioBuffer یا PCM 16 بیتی) به صف پخش و بازگشت فوری؛ فقط اگر صف
+        پر باشد تا timeout منتظر می‌ماند
+        """
+        self.start()
+        try:
+            # trace فعال همراه chunk به thread پخش می‌رود
+            self.queue.put((AudioBuffer.wrap(audio), tracing.current_trace(), time.perf_counter()), timeout=timeout)
+        except queue.Full:
+            return False
+        metrics.QUEUE_DEPTH.set(self.queue.qsize(), queue="playback")
+        return True
+
+    def end_stream(self):
+        """اعلام پایان صدای فعلی تا صدای باقیمانده بدون انتظار برای jitter پخش شود"""
+        self.start()
+        self.queue.put(END_OF_STREAM)
+
+    def wait(self, timeout=None):
+        """انتظار تا پخش تمام صدای در صف"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_running and (self.queue.qsize() or self._pending is not None
+                                   or (self.ring is not None and len(self.ring))):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _open_stream(self):
+        import pyaudio
+
+        self._pyaudio = pyaudio.PyAudio()
+        rate = self.requested_rate or int(self._pyaudio.get_default_output_device_info()["defaultSampleRate"])
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=rate,
+            output=True,
+            frames_per_buffer=self.period_frames
+        )
+        self.device_rate = rate
+        self.ring = RingBuffer(int(self.buffer_duration * rate), dtype=np.int16, sample_rate=rate)
+        logger.info("Playback device opened", rate=rate)
+
+    def _close_stream(self):
+        try:
+            if self._stream is not None:
+                self._stream.stop_stream()
+                self._stream.close()
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+        except Exception as e:
+            logger.error("Error closing playback device", error=str(e))
+            metrics.ERRORS.inc(component="playback")
+        finally:
+            self._stream = None
+            self._pyaudio = None
+
+    def _run(self):
+        try:
+            self._open_stream()
+        except Exception as e:
+            # بدون دستگاه خروجی، chunk ها با pydub پخش می‌شوند (همچنان خارج از thread پردازش)
+            logger.warning("Error opening playback device, falling back to pydub", error=str(e))
+            metrics.ERRORS.inc(component="playback")
+            self._run_fallback()
+            return
+
+        # حداقل یک دوره کامل پیش از شروع پخش
+        jitter_samples = max(int(self.jitter_duration * self.device_rate), self.period_frames)
+        while self.is_running:
+            # تا شروع پخش یا وقتی کمتر از یک دوره صدا بافر شده، روی صف منتظر می‌ماند
+            # (بدون polling)؛ حین پخش فقط chunk های آماده برداشته می‌شوند
+            waiting = not self._playing or len(self.ring) < self.period_frames
+            self._fill(timeout=0.1 if waiting else 0)
+
+            if not self._playing:
+                # بافر jitter: شروع پخش پس از رسیدن صدای کافی یا پایان جریان
+                if len(self.ring) >= jitter_samples or (self._ended and len(self.ring) > 0):
+                    self._playing = True
+                else:
+                    continue
+
+            # دوره ناقص (پس از انتظار روی صف بالا) همان‌طور پخش می‌شود
+            period = self.ring.peek(self.period_frames)
+            if len(period) == 0:
+                if not self._ended:
+                    # بافر حین پخش خالی شده و جریان ادامه دارد: underrun؛ پخش تا پر شدن
+                    # دوباره بافر jitter متوقف می‌شود
+                    self.underruns += 1
+                    metrics.PLAYBACK_UNDERRUNS.inc()
+                self._playing = False
+                continue
+
+            write_time = time.perf_counter()
+            try:
+                self._stream.write(period.tobytes())
+            except Exception as e:
+                logger.error("Error writing to playback device", error=str(e))
+                metrics.ERRORS.inc(component="playback")
+            self.ring.consume(len(period))
+            self.played_duration += len(period) / self.device_rate
+            self._played_samples += len(period)
+            if self._traced_chunks:
+                self._trace_played(write_time)
+
+    def _trace_played(self, write_time):
+        """ثبت span پخش chunk هایی که اولین یا آخرین نمونه آن‌ها در این دوره به دستگاه رسید"""
+        for chunk in self._traced_chunks:
+            if chunk[0] >= self._played_samples:
+                break
+            if chunk[3] is None:
+                chunk[3] = write_time
+        while self._traced_chunks and self._traced_chunks[0][1] <= self._played_samples:
+            _, _, trace, started_at = self._traced_chunks.popleft()
+            tracing.record(trace, "playback", started_at, time.perf_counter())
+
+    def _fill(self, timeout):
+        """انتقال chunk های صف (پس از تبدیل نرخ) به بافر jitter تا حد ظرفیت آن"""
+        while True:
+            if self._pending is None:
+                try:
+                    item = self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()
+                except queue.Empty:
+                    return
+                timeout = 0
+                metrics.QUEUE_DEPTH.set(self.queue.qsize(), queue="playback")
+                if item is END_OF_STREAM:
+                    self._ended = True
+                    continue
+                self._ended = False
+                audio, trace, enqueued_at = item
+                dequeued_at = time.perf_counter()
+                tracing.record(trace, "playback_queue", enqueued_at, dequeued_at)
+                self._pending = self._convert(audio)
+                if trace is not None:
+                    tracing.record(trace, "resample", dequeued_at, time.perf_counter(),
+                                   source_rate=audio.sample_rate, device_rate=self.device_rate)
+                    end = self._converted_samples + len(self._pending)
+                    self._traced_chunks.append([self._converted_samples, end, trace, None])
+                self._converted_samples += len(self._pending)
+                self.chunks_played += 1
+
+            written = self.ring.write(self._pending[:self.ring.free])
+            if written < len(self._pending):
+                self._pending = self._pending[written:]
+                return
+            self._pending = None
+
+    def _convert(self, audio):
+        """تبدیل یک باره chunk به PCM 16 بیتی مونو با نرخ دستگاه"""
+        audio = audio.to_mono()
+        if audio.sample_rate != self.device_rate:
+            audio = AudioBuffer(
+                resample(audio.as_float32(), audio.sample_rate, self.device_rate),
+                sample_rate=self.device_rate
+            )
+        return audio.as_int16()
+
+    def _run_fallback(self):
+        from pydub import AudioSegment
+
+        while self.is_running:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is END_OF_STREAM:
+                continue
+            audio, trace, enqueued_at = item
+            start_time = time.perf_counter()
+            tracing.record(trace, "playback_queue", enqueued_at, start_time)
+            try:
+                AudioSegment(
+                    audio.tobytes(),
+                    frame_rate=audio.sample_rate,
+                    sample_width=2,
+                    channels=audio.channels
+                ).play()
+                self.chunks_played += 1
+                self.played_duration += audio.duration
+            except Exception as e:
+                logger.error("Error playing audio", error=str(e))
+                metrics.ERRORS.inc(component="playback")
+            tracing.record(trace, "playback", start_time, time.perf_counter())
+
+    def get_stats(self):
+        """آمار پخش: عمق صف، صدای بافر شده، underrun ها"""
+        return {
+            "device_rate": self.device_rate,
+            "queue_depth": self.queue.qsize(),
+            "buffered_duration": self.ring.duration if self.ring is not None else 0.0,
+            "chunks_played": self.chunks_played,
+            "played_duration": self.played_duration,
+            "underruns": self.underruns,
+            "playing": self._playing
+        }
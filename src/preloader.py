@@ -0,0 +1,109 @@
+import threading
+import time
+import numpy as np
+import config
+from src.audio_buffer import AudioBuffer
+from src.log import get_logger
+from src import metrics
+
+logger = get_logger("preloader")
+
+class ModelPreloader:
+    """
+    بارگذاری همزمان مدل‌ها در thread های پس‌زمینه هنگام راه‌اندازی، به همراه یک
+    استنتاج کوتاه (warmup) برای آماده‌سازی kernel ها و allocator ها. تا پایان
+    warmup همه اجزا، سرویس آماده (ready) گزارش نمی‌شود.
+    """
+
+    def __init__(self, components):
+        # components: نام → موتور (STTEngine، Translator یا TTSEngine)
+        self.components = components
+        self.status = {
+            name: {
+                "state": "pending",
+                "load_time": None,
+                "warmup_time": None,
+                "error": None
+            }
+            for name in components
+        }
+        self.threads = []
+        self.status_lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        """شروع بارگذاری تمام اجزا به صورت موازی"""
+        if self.started:
+            return
+        self.started = True
+
+        for name, engine in self.components.items():
+            thread = threading.Thread(target=self._preload, args=(name, engine), name=f"preload-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info("Preloading models", components=",".join(self.components))
+
+    def wait(self, timeout=None):
+        """انتظار برای پایان بارگذاری و warmup همه اجزا"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self.threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(timeout=remaining)
+        return self.is_ready()
+
+    def _set(self, name, **values):
+        with self.status_lock:
+            self.status[name].update(values)
+
+    def _preload(self, name, engine):
+        try:
+            self._set(name, state="loading")
+            start_time = time.perf_counter()
+            engine._load_model()
+            load_time = time.perf_counter() - start_time
+            self._set(name, state="warming_up", load_time=load_time)
+
+            start_time = time.perf_counter()
+            self._warmup(engine)
+            warmup_time = time.perf_counter() - start_time
+            self._set(name, state="ready", warmup_time=warmup_time)
+            logger.info("Component ready", component=name, load_time=load_time, warmup_time=warmup_time)
+        except Exception as e:
+            self._set(name, state="error", error=str(e))
+            logger.error("Error preloading component", component=name, error=str(e))
+            metrics.ERRORS.inc(component="preloader")
+
+    def _warmup(self, engine):
+        """
+        یک استنتاج کوتاه و بی‌اثر با ورودی مصنوعی؛ ترجمه و سنتز بدون کش اجرا می‌شوند
+        تا ورودی warmup ذخیره شده از اجرای قبلی مدل را دور نزند.
+        transcribe و _translate_sentences خطا را با خروجی خالی پنهان می‌کنند، پس خطا یا
+        خروجی خالی برای ورودی غیرخالی باعث شکست warmup (وضعیت error) می‌شود
+        """
+        if hasattr(engine, "transcribe"):
+            # یک ثانیه نویز ضعیف تا encoder و decoder هر دو اجرا شوند؛ متن خالی برای نویز مجاز است،
+            # پس backend مستقیماً (بدون except) فراخوانی می‌شود تا خطای آن به _preload برسد
+            noise = AudioBuffer(np.random.default_rng(0).normal(0, 0.01, config.SAMPLE_RATE).astype(np.float32))
+            with engine.model_lock:
+                result = engine.model.transcribe(engine._normalize_audio(noise), language="fa")
+            if "text" not in result:
+                raise RuntimeError("STT warmup returned no transcription")
+        elif hasattr(engine, "translate"):
+            sentences = engine.split_sentences(config.WARMUP_TRANSLATION_TEXT)
+            outputs = engine._translate_sentences(sentences)
+            if not all(outputs):
+                raise RuntimeError("Translation warmup returned an empty translation")
+        elif hasattr(engine, "synthesize"):
+            samples = engine._synthesize_uncached(config.WARMUP_TTS_TEXT)
+            if samples is None or len(samples) == 0:
+                raise RuntimeError("TTS warmup returned no audio")
+
+    def is_ready(self):
+        """آیا همه اجزا بارگذاری و warmup شده‌اند"""
+        with self.status_lock:
+            return all(status["state"] == "ready" for status in self.status.values())
+
+    def get_status(self):
+        """وضعیت بارگذاری و warmup هر جزء"""
+        with self.status_lock:
+            return {name: dict(status) for name, status in self.status.items()}
@@ -0,0 +1,92 @@
+import numpy as np
+
+class RingBuffer:
+    """
+    بافر حلقوی با ظرفیت ثابت و حافظه از پیش تخصیص داده شده برای یک تولیدکننده و
+    یک مصرف‌کننده (SPSC) بدون قفل: فقط تولیدکننده write_index و فقط مصرف‌کننده
+    read_index را تغییر می‌دهد.
+
+    هر نمونه در دو نیمه یک آرایه با طول دو برابر ظرفیت نوشته می‌شود (mirror)، بنابراین
+    هر پنجره تا اندازه ظرفیت همیشه پیوسته است و به صورت view (بدون کپی) خوانده می‌شود.
+    """
+
+    def __init__(self, capacity, dtype=np.float32, sample_rate=None):
+        if capacity <= 0:
+            raise ValueError("RingBuffer capacity must be positive")
+        self.capacity = int(capacity)
+        self.sample_rate = sample_rate
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+
+        # شمارنده‌های یکنواخت؛ موقعیت در آرایه باقیمانده تقسیم بر ظرفیت است
+        self.write_index = 0
+        self.read_index = 0
+        # نمونه‌هایی که به دلیل پر بودن بافر نوشته نشدند
+        self.overflow_samples = 0
+
+    def __len__(self):
+        return self.write_index - self.read_index
+
+    @property
+    def free(self):
+        return self.capacity - len(self)
+
+    @property
+    def duration(self):
+        """مدت زمان صدای خوانده نشده (ثانیه)"""
+        return len(self) / self.sample_rate if self.sample_rate else 0.0
+
+    def write(self, samples):
+        """
+        (تولیدکننده) افزودن نمونه‌ها؛ نمونه‌های بیش از فضای آزاد کنار گذاشته می‌شوند.
+        تعداد نمونه‌های نوشته شده برگردانده می‌شود.
+        """
+        samples = np.asarray(samples)
+        count = min(len(samples), self.free)
+        self.overflow_samples += len(samples) - count
+        if count == 0:
+            return 0
+
+        start = self.write_index % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[start + self.capacity:start + self.capacity + first] = samples[:first]
+        if first < count:
+            rest = count - first
+            self._data[:rest] = samples[first:count]
+            self._data[self.capacity:self.capacity + rest] = samples[first:count]
+
+        # به‌روزرسانی شاخص پس از نوشتن داده، تا مصرف‌کننده نمونه ناقص نبیند
+        self.write_index += count
+        return count
+
+    def peek(self, count=None, offset=0):
+        """
+        (مصرف‌کننده) view پیوسته از count نمونه پس از offset بدون مصرف آن‌ها.
+        view تا پیش از consume همان ناحیه معتبر است.
+        """
+        available = len(self) - offset
+        if available <= 0:
+            return self._data[:0]
+        count = available if count is None else min(count, available)
+        start = (self.read_index + offset) % self.capacity
+        return self._data[start:start + count]
+
+    def latest(self, count):
+        """(مصرف‌کننده) view از آخرین count نمونه خوانده نشده"""
+        return self.peek(count, offset=max(0, len(self) - count))
+
+    def consume(self, count=None):
+        """(مصرف‌کننده) آزاد کردن count نمونه از ابتدای بافر"""
+        count = len(self) if count is None else min(count, len(self))
+        self.read_index += count
+        return count
+
+    def read(self, count=None):
+        """(مصرف‌کننده) کپی و مصرف count نمونه"""
+        samples = self.peek(count).copy()
+        self.consume(len(samples))
+        return samples
+
+    def clear(self):
+        """(مصرف‌کننده) دور ریختن تمام نمونه‌های خوانده نشده"""
+        self.read_index = self.write_index
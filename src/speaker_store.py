@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+import numpy as np
+import soundfile as sf
+import config
+from src.log import get_logger
+
+logger = get_logger("speaker_store")
+
+class SpeakerStore:
+    """
+    ذخیره‌ساز پایدار conditioning صدای گوینده برای کلون صدا.
+    embedding و latent های هر نمونه صدا فقط یک بار محاسبه و با کلید هش محتوای
+    فایل روی دیسک ذخیره می‌شوند؛ بارگذاری‌های بعدی با memory-map انجام می‌شود.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(config.MODELS_DIR, "speakers")
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, speaker_wav_path, model_name=None):
+        """هش محتوای فایل به همراه نام مدل (latent ها وابسته به مدل هستند)"""
+        digest = hashlib.sha256()
+        digest.update((model_name or config.TTS_MODEL_NAME).encode("utf-8"))
+        with open(speaker_wav_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def prepare_clip(self, speaker_wav_path):
+        """
+        خواندن نمونه صدا، تبدیل به مونو، بررسی مدت زمان و تبدیل نرخ نمونه به VOICE_SAMPLE_RATE
+        """
+        audio, sample_rate = sf.read(speaker_wav_path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+
+        duration = len(audio) / sample_rate
+        if duration < config.MIN_VOICE_DURATION or duration > config.MAX_VOICE_DURATION:
+            raise ValueError(
+                f"Speaker clip must be {config.MIN_VOICE_DURATION}-{config.MAX_VOICE_DURATION} s long, "
+                f"got {duration:.1f} s"
+            )
+
+        if sample_rate != config.VOICE_SAMPLE_RATE:
+            import librosa
+            audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=config.VOICE_SAMPLE_RATE)
+        return audio.astype(np.float32)
+
+    def _paths(self, speaker_hash, names):
+        return {name: os.path.join(self.directory, f"{speaker_hash}.{name}.npy") for name in names}
+
+    def load(self, speaker_wav_path, compute_fn, names=("gpt_cond_latent", "speaker_embedding")):
+        """
+        دریافت پروفایل گوینده؛ در صورت نبود روی دیسک، compute_fn(audio, sample_rate)
+        یک بار اجرا و خروجی آن (نام → آرایه) ذخیره می‌شود
+        """
+        speaker_hash = self.content_hash(speaker_wav_path)
+
+        with self._lock:
+            profile = self._profiles.get(speaker_hash)
+            if profile is not None:
+                return profile
+
+            paths = self._paths(speaker_hash, names)
+            if not all(os.path.exists(path) for path in paths.values()):
+                audio = self.prepare_clip(speaker_wav_path)
+                arrays = compute_fn(audio, config.VOICE_SAMPLE_RATE)
+                if arrays:
+                    os.makedirs(self.directory, exist_ok=True)
+                    for name, path in paths.items():
+                        # نوشتن در فایل موقت و جایگزینی اتمی تا فایل نیمه‌کاره باقی نماند
+                        temp_path = f"{path}.tmp.npy"
+                        np.save(temp_path, np.ascontiguousarray(arrays[name]))
+                        os.replace(temp_path, path)
+                    logger.info("Speaker conditioning cached", speaker=speaker_hash[:12])
+
+            profile = {"hash": speaker_hash, "path": speaker_wav_path}
+            if all(os.path.exists(path) for path in paths.values()):
+                for name, path in paths.items():
+                    profile[name] = np.load(path, mmap_mode="r")
+
+            self._profiles[speaker_hash] = profile
+            return profile
@@ -0,0 +1,96 @@
+import numpy as np
+import config
+from src.audio_handler import VoiceActivityDetector
+from src import tracing
+
+class StreamingSession:
+    """
+    جلسه ترجمه جریانی یک کلاینت: فریم‌های PCM پیوسته با VAD تقطیع می‌شوند، صدای
+    گفتار به StreamingTranscriber داده می‌شود و متن جزئی/نهایی به همراه ترجمه آن
+    به صورت رویداد برگردانده می‌شود.
+
+    تمام متدها باید از یک thread در هر لحظه فراخوانی شوند (مثلاً کارهای پشت سر هم
+    یک اتصال WebSocket).
+    """
+
+    def __init__(self, stt_engine, translator, sample_rate=None):
+        self.sample_rate = sample_rate or config.SAMPLE_RATE
+        self.vad = VoiceActivityDetector(sample_rate=self.sample_rate)
+        self.transcriber = stt_engine.create_stream()
+        self.translator = translator
+        self.utterance_index = 0
+        # trace جمله جاری از شروع گفتار تا رویداد final
+        self._trace = None
+        # آخرین متن تأیید شده‌ای که ترجمه شده (برای جلوگیری از ترجمه تکراری)
+        self._translated_text = ""
+
+    def feed(self, frames):
+        """
+        پردازش فریم‌های float32 جدید و برگرداندن لیست رویدادها
+        (partial برای متن در حال شکل‌گیری، final برای جمله کامل)
+        """
+        events = []
+        for frame in frames:
+            was_in_speech = self.vad.in_speech
+            utterance = self.vad.process_frame(frame)
+
+            if utterance is not None:
+                # پایان جمله: فریم آخر (سکوت انتهایی) هم به رمزگشای جریانی داده می‌شود
+                self.transcriber.insert_audio(frame)
+                events.append(self._final())
+            elif self.vad.in_speech:
+                if not was_in_speech:
+                    # شروع گفتار: صدای پیش از شروع (pre-roll) هم ارسال می‌شود
+                    self._trace = tracing.start_trace("stream_utterance", utterance=self.utterance_index)
+                    self.transcriber.insert_audio(np.concatenate(self.vad.frames))
+                else:
+                    self.transcriber.insert_audio(frame)
+            elif was_in_speech:
+                # صدای کوتاه‌تر از MIN_AUDIO_DURATION (مثلاً نویز لحظه‌ای) کنار گذاشته می‌شود
+                self.transcriber.reset()
+                self._translated_text = ""
+                self._trace = None
+
+        with tracing.use(self._trace), tracing.span("partial"):
+            result = self.transcriber.process()
+            if result is not None and result["text"]:
+                events.append(self._partial(result))
+        return events
+
+    def finish(self):
+        """پایان جلسه: جمله ناتمام نهایی می‌شود"""
+        if self.vad.flush() is None:
+            self.transcriber.reset()
+            return []
+        return [self._final()]
+
+    def _partial(self, result):
+        event = {
+            "type": "partial",
+            "utterance": self.utterance_index,
+            "committed": result["committed"],
+            "partial": result["partial"],
+            "text": result["text"]
+        }
+        # فقط متن تأیید شده ترجمه می‌شود؛ پیشوندهای موقت در کش ترجمه ذخیره نمی‌شوند تا
+        # ورودی‌های مفید کش پایدار را بیرون نکنند (فقط جمله نهایی ذخیره می‌شود)
+        committed = result["committed"]
+        if committed and committed != self._translated_text:
+            event["translation"] = self.translator.translate(committed, cache_result=False)
+            self._translated_text = committed
+        return event
+
+    def _final(self):
+        with tracing.use(self._trace), tracing.span("final"):
+            result = self.transcriber.finish()
+            text = result["text"]
+            event = {
+                "type": "final",
+                "utterance": self.utterance_index,
+                "text": text,
+                "translation": self.translator.translate(text) if text else ""
+            }
+        self.utterance_index += 1
+        self._translated_text = ""
+        self._trace = None
+        return event
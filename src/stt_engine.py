@@ -4,20 +4,217 @@ except ImportError:
     try:
         from openai import whisper
     except ImportError:
-        print("❌ Neither 'whisper' nor 'openai-whisper' is installed!")
-        print("Please install: pip install openai-whisper")
-        raise
+        # backend ctranslate2 بدون openai-whisper هم کار می‌کند
+        whisper = None
 import config
 import numpy as np
 import os
 import tempfile
 import soundfile as sf
 import re
+import time
+from src.model_registry import registry as model_registry
+from src.audio_buffer import AudioBuffer
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("stt_engine")
+
+# طول پنجره ورودی Whisper (30 ثانیه)
+WHISPER_WINDOW_SAMPLES = 30 * 16000
+
+class WhisperBackend:
+    """
+    رابط backend های Whisper. هر backend نتیجه را با یک قالب مشترک برمی‌گرداند:
+    {"text": str, "language": str, "segments": [{"start", "end", "text", "words": [{"word", "start", "end"}]}]}
+    """
+
+    name = None
+
+    def load(self):
+        """بارگذاری مدل و برگرداندن خود backend (برای ثبت در رجیستری)"""
+        raise NotImplementedError
+
+    def transcribe(self, audio, language="fa", word_timestamps=False, initial_prompt=None):
+        """تشخیص گفتار یک آرایه float32 یا مسیر فایل"""
+        raise NotImplementedError
+
+    def transcribe_batch(self, audio_list, language="fa"):
+        """تشخیص گفتار چند کلیپ حداکثر 30 ثانیه‌ای در یک batch"""
+        raise NotImplementedError
+
+    def get_device(self):
+        return "CPU"
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """پیاده‌سازی مرجع openai-whisper با PyTorch"""
+
+    name = "openai"
 
-class STTEngine:
     def __init__(self):
         self.model = None
+
+    def load(self):
+        if whisper is None:
+            raise ImportError("openai-whisper is not installed. Please install: pip install openai-whisper")
+        self.model = whisper.load_model(config.WHISPER_MODEL)
+        if tracing.tracer.enabled:
+            # encoder و decoder درون model.transcribe اجرا می‌شوند؛ span ها با forward hook ثبت می‌شوند
+            tracing.instrument_module(self.model.encoder, "whisper_encoder")
+            tracing.instrument_module(self.model.decoder, "whisper_decoder")
+        return self
+
+    def transcribe(self, audio, language="fa", word_timestamps=False, initial_prompt=None):
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            fp16=False,    # سازگاری با CPU
+            verbose=None if word_timestamps else False,
+            word_timestamps=word_timestamps,
+            condition_on_previous_text=not word_timestamps,
+            initial_prompt=initial_prompt
+        )
+        return {
+            "text": result["text"],
+            "language": result.get("language", language),
+            "segments": [
+                {
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": segment["text"],
+                    "words": [
+                        {"word": word["word"], "start": word["start"], "end": word["end"]}
+                        for word in segment.get("words", [])
+                    ]
+                }
+                for segment in result.get("segments", [])
+            ]
+        }
+
+    def transcribe_batch(self, audio_list, language="fa"):
+        import torch
+
+        # محاسبه log-mel هر کلیپ (پس از pad تا 30 ثانیه) و ساخت یک batch
+        with tracing.span("log_mel", batch_size=len(audio_list)):
+            mels = [
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+                for audio in audio_list
+            ]
+            mel_batch = torch.stack(mels).to(self.model.device)
+
+        options = whisper.DecodingOptions(language=language, fp16=False, without_timestamps=True)
+        decoded = whisper.decode(self.model, mel_batch, options)
+        return [{"text": result.text, "language": language, "segments": []} for result in decoded]
+
+    def get_device(self):
+        return str(self.model.device).upper() if self.model is not None else "CPU"
+
+class CTranslate2WhisperBackend(WhisperBackend):
+    """Whisper با CTranslate2 (پکیج faster-whisper) و وزن‌های int8 برای CPU"""
+
+    name = "ctranslate2"
+
+    def __init__(self):
+        self.model = None
+        # یک Tokenizer به ازای هر زبان؛ توکن زبان بخشی از sot_sequence است
+        self.tokenizers = {}
+
+    def load(self):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            config.WHISPER_MODEL,
+            device="cpu",
+            compute_type=config.STT_COMPUTE_TYPE,
+            cpu_threads=config.STT_CPU_THREADS,
+            download_root=os.path.join(config.MODELS_DIR, "whisper-ct2")
+        )
+        return self
+
+    def _tokenizer(self, language):
+        tokenizer = self.tokenizers.get(language)
+        if tokenizer is None:
+            from faster_whisper.tokenizer import Tokenizer
+
+            tokenizer = self.tokenizers[language] = Tokenizer(
+                self.model.hf_tokenizer,
+                self.model.model.is_multilingual,
+                task="transcribe",
+                language=language
+            )
+        return tokenizer
+
+    def transcribe(self, audio, language="fa", word_timestamps=False, initial_prompt=None):
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=5,
+            word_timestamps=word_timestamps,
+            condition_on_previous_text=not word_timestamps,
+            initial_prompt=initial_prompt
+        )
+        # segments یک generator است؛ رمزگشایی هنگام پیمایش انجام می‌شود
+        segments = [
+            {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "words": [
+                    {"word": word.word, "start": word.start, "end": word.end}
+                    for word in (segment.words or [])
+                ]
+            }
+            for segment in segments
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "segments": segments
+        }
+
+    def transcribe_batch(self, audio_list, language="fa"):
+        # ویژگی‌های هر کلیپ (pad تا 30 ثانیه) در یک batch به encoder داده می‌شوند
+        n_frames = self.model.feature_extractor.nb_max_frames
+        with tracing.span("log_mel", batch_size=len(audio_list)):
+            features = np.stack([
+                self.model.feature_extractor(np.pad(audio, (0, max(0, WHISPER_WINDOW_SAMPLES - len(audio)))))[:, :n_frames]
+                for audio in audio_list
+            ])
+        with tracing.span("whisper_encoder", batch_size=len(audio_list)):
+            encoder_output = self.model.encode(features)
+
+        tokenizer = self._tokenizer(language)
+        prompt = list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
+        with tracing.span("whisper_decoder", batch_size=len(audio_list)):
+            results = self.model.model.generate(
+                encoder_output,
+                [prompt] * len(audio_list),
+                beam_size=5,
+                max_length=self.model.max_length
+            )
+        return [
+            {"text": tokenizer.decode(result.sequences_ids[0]), "language": language, "segments": []}
+            for result in results
+        ]
+
+    def get_device(self):
+        return f"CPU ({config.STT_COMPUTE_TYPE})"
+
+_BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    CTranslate2WhisperBackend.name: CTranslate2WhisperBackend
+}
+
+class STTEngine:
+    def __init__(self, backend=None):
+        self.model = None
         self.model_loaded = False
+        self.backend = backend or config.STT_BACKEND
+        if self.backend not in _BACKENDS:
+            raise ValueError(f"Unknown STT backend: {self.backend}")
+        self.model_key = f"whisper:{self.backend}:{config.WHISPER_MODEL}"
+        self.model_lock = None
         self.tone_patterns = {
             'question': [
                 r'آیا\s+.*\?',
@@ -44,7 +241,7 @@ class STTEngine:
                 r'بگیر\s+.*'
             ]
         }
-        print("STT Engine initialized. Model will be loaded on first use.")
+        logger.info("STT Engine initialized. Model will be loaded on first use")
 
     def _load_model(self):
         """بارگذاری مدل Whisper (فقط یک بار)"""
@@ -52,15 +249,30 @@ class STTEngine:
             return
             
         try:
-            print("Loading Whisper model...")
+            logger.info("Loading Whisper model", model=config.WHISPER_MODEL, backend=self.backend)
             # مدل به صورت خودکار دانلود می‌شود اگر موجود نباشد
-            self.model = whisper.load_model(config.WHISPER_MODEL)
+            # و فقط یک بار در هر process بارگذاری می‌شود
+            self.model = model_registry.acquire(
+                self.model_key,
+                lambda: _BACKENDS[self.backend]().load()
+            )
+            self.model_lock = model_registry.lock(self.model_key)
             self.model_loaded = True
-            print(f"Whisper model '{config.WHISPER_MODEL}' loaded successfully.")
+            logger.info("Whisper model loaded", model=config.WHISPER_MODEL, backend=self.backend)
         except Exception as e:
-            print(f"Error loading Whisper model: {e}")
+            logger.error("Error loading Whisper model", model=config.WHISPER_MODEL, error=str(e))
+            metrics.ERRORS.inc(component="stt")
             raise
 
+    def release(self):
+        """آزاد کردن ارجاع این موتور به مدل مشترک"""
+        if not self.model_loaded:
+            return
+        model_registry.release(self.model_key)
+        self.model = None
+        self.model_lock = None
+        self.model_loaded = False
+
     def detect_tone_and_punctuation(self, text):
         """تشخیص لحن و اضافه کردن علامت‌گذاری مناسب"""
         if not text or not text.strip():
@@ -95,9 +307,18 @@ class STTEngine:
         
         return text, detected_tone
 
+    def _normalize_audio(self, audio_data):
+        """تبدیل به float32 و نرمال‌سازی دامنه صدا"""
+        if isinstance(audio_data, AudioBuffer):
+            # درجا و فقط یک بار؛ بافر نرمال‌شده (مثلاً فایل آپلودی) دوباره پیمایش نمی‌شود
+            return audio_data.normalize()
+        
+        # آرایه خام متعلق به فراخواننده است و دست‌نخورده می‌ماند
+        return AudioBuffer.wrap(audio_data).normalize(inplace=False)
+
     def transcribe(self, audio_data):
         """
-        تبدیل داده‌های صوتی (numpy array) به متن فارسی
+        تبدیل داده‌های صوتی (AudioBuffer یا numpy array) به متن فارسی
         """
         if audio_data is None or len(audio_data) == 0:
             return ""
@@ -106,42 +327,101 @@ class STTEngine:
         if not self.model_loaded:
             self._load_model()
         
+        start_time = time.perf_counter()
         try:
-            # نرمال‌سازی داده‌های صوتی
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            
-            # نرمال‌سازی دامنه صدا
-            if np.max(np.abs(audio_data)) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
+            with tracing.span("normalize"):
+                audio_data = self._normalize_audio(audio_data)
             
             # تشخیص گفتار با Whisper
-            result = self.model.transcribe(
-                audio_data, 
-                language="fa",  # زبان فارسی
-                fp16=False,    # سازگاری با CPU
-                verbose=False   # کاهش خروجی
-            )
-            
-            text = result["text"].strip()
+            with self.model_lock, tracing.span("whisper", duration=len(audio_data) / config.SAMPLE_RATE):
+                result = self.model.transcribe(audio_data, language="fa")
             
-            # پاک‌سازی متن و تشخیص لحن
-            if text:
-                # تشخیص لحن و اضافه کردن علامت‌گذاری
-                processed_text, detected_tone = self.detect_tone_and_punctuation(text)
-                
-                print(f"Transcribed: {processed_text}")
-                if detected_tone:
-                    print(f"Detected tone: {detected_tone}")
-                
-                return processed_text
-            else:
-                return ""
+            text = self._postprocess(result["text"])
+            metrics.observe_audio_stage("stt", time.perf_counter() - start_time, len(audio_data) / config.SAMPLE_RATE)
+            return text
                 
         except Exception as e:
-            print(f"Error in transcription: {e}")
+            logger.error("Error in transcription", error=str(e))
+            metrics.ERRORS.inc(component="stt")
             return ""
 
+    def _postprocess(self, text):
+        """پاک‌سازی متن و تشخیص لحن"""
+        text = text.strip()
+        if not text:
+            return ""
+        
+        # تشخیص لحن و اضافه کردن علامت‌گذاری
+        processed_text, detected_tone = self.detect_tone_and_punctuation(text)
+        
+        logger.info("Transcribed", text=processed_text, tone=detected_tone)
+        
+        return processed_text
+
+    def transcribe_batch(self, audio_list):
+        """
+        تبدیل چند کلیپ صوتی به متن فارسی در یک فراخوانی encoder/decoder
+        نتایج به همان ترتیب ورودی برگردانده می‌شوند
+        """
+        if not audio_list:
+            return []
+            
+        # بارگذاری مدل در صورت نیاز
+        if not self.model_loaded:
+            self._load_model()
+        
+        results = [""] * len(audio_list)
+        pending = []
+        
+        for index, audio_data in enumerate(audio_list):
+            if audio_data is None or len(audio_data) == 0:
+                continue
+            # کلیپ‌های بلندتر از پنجره 30 ثانیه‌ای Whisper به رمزگشایی پنجره‌ای نیاز دارند
+            if len(audio_data) > WHISPER_WINDOW_SAMPLES:
+                results[index] = self.transcribe(audio_data)
+                continue
+            pending.append(index)
+        
+        for start in range(0, len(pending), config.STT_BATCH_SIZE):
+            indices = pending[start:start + config.STT_BATCH_SIZE]
+            start_time = time.perf_counter()
+            try:
+                with tracing.span("normalize", batch_size=len(indices)):
+                    batch = [self._normalize_audio(audio_list[index]) for index in indices]
+                with self.model_lock, tracing.span("whisper_batch", batch_size=len(indices)):
+                    decoded = self.model.transcribe_batch(batch, language="fa")
+                
+                for index, result in zip(indices, decoded):
+                    results[index] = self._postprocess(result["text"])
+                
+                metrics.observe_audio_stage(
+                    "stt_batch", time.perf_counter() - start_time, sum(len(audio) for audio in batch) / config.SAMPLE_RATE
+                )
+                    
+            except Exception as e:
+                logger.error("Error in batch transcription", batch_size=len(indices), error=str(e))
+                metrics.ERRORS.inc(component="stt")
+        
+        return results
+
+    def create_stream(self, callback=None):
+        """ایجاد یک جلسه تشخیص گفتار جریانی"""
+        if not self.model_loaded:
+            self._load_model()
+        return StreamingTranscriber(self, callback=callback)
+
+    def transcribe_stream(self, audio_chunks, callback=None):
+        """
+        تشخیص گفتار جریانی: chunk های صوتی را مصرف و نتایج جزئی و نهایی را yield می‌کند
+        """
+        stream = self.create_stream(callback=callback)
+        for chunk in audio_chunks:
+            stream.insert_audio(chunk)
+            result = stream.process()
+            if result is not None:
+                yield result
+        yield stream.finish()
+
     def transcribe_file(self, file_path):
         """
         تبدیل فایل صوتی به متن
@@ -150,7 +430,8 @@ class STTEngine:
             if not self.model_loaded:
                 self._load_model()
                 
-            result = self.model.transcribe(file_path, language="fa", fp16=False)
+            with self.model_lock:
+                result = self.model.transcribe(file_path, language="fa")
             text = result["text"].strip()
             
             if text:
@@ -161,7 +442,8 @@ class STTEngine:
                 return ""
             
         except Exception as e:
-            print(f"Error transcribing file {file_path}: {e}")
+            logger.error("Error transcribing file", file_path=file_path, error=str(e))
+            metrics.ERRORS.inc(component="stt")
             return ""
 
     def get_model_info(self):
@@ -175,8 +457,140 @@ class STTEngine:
         
         return {
             "model_name": config.WHISPER_MODEL,
+            "backend": self.backend,
             "language": "Persian (fa)",
-            "device": "CPU" if not config.TTS_USE_GPU else "GPU",
+            "device": self.model.get_device(),
             "tone_detection": "Enabled",
             "supported_tones": list(self.tone_patterns.keys())
-        }
\ No newline at end of file
+        }
+
+class StreamingTranscriber:
+    """
+    تشخیص گفتار افزایشی با پنجره لغزان و سیاست توافق محلی (LocalAgreement-2):
+    پنجره صوتی با رسیدن صدای جدید دوباره رمزگشایی می‌شود و فقط پیشوندی از کلمات
+    که در دو رمزگشایی متوالی یکسان بوده‌اند تأیید (commit) می‌شود.
+    """
+
+    def __init__(self, engine, callback=None):
+        self.engine = engine
+        self.callback = callback
+        self.sample_rate = config.SAMPLE_RATE
+        self.step_samples = int(config.STREAM_STEP_DURATION * self.sample_rate)
+        self.window_samples = int(config.STREAM_WINDOW_DURATION * self.sample_rate)
+        self.reset()
+
+    def reset(self):
+        """شروع جلسه جدید"""
+        self.audio_buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0       # زمان مطلق شروع بافر (ثانیه)
+        self.pending_samples = 0       # صدای رسیده از آخرین رمزگشایی
+        self.committed_words = []      # (کلمه، شروع، پایان) با زمان مطلق
+        self.hypothesis = []           # کلمات تأیید نشده آخرین رمزگشایی
+
+    def insert_audio(self, audio_chunk):
+        """افزودن chunk صوتی جدید (AudioBuffer، float32 یا int16) به بافر"""
+        if audio_chunk is None or len(audio_chunk) == 0:
+            return
+        audio_chunk = AudioBuffer.wrap(audio_chunk, sample_rate=self.sample_rate).as_float32()
+        self.audio_buffer = np.concatenate([self.audio_buffer, audio_chunk])
+        self.pending_samples += len(audio_chunk)
+
+    def process(self):
+        """
+        اگر صدای کافی رسیده باشد پنجره را رمزگشایی و نتیجه جزئی را برمی‌گرداند، وگرنه None
+        """
+        if self.pending_samples < self.step_samples:
+            return None
+        self.pending_samples = 0
+
+        words = self._decode()
+        committed = self._agree(words)
+        self.committed_words.extend(committed)
+        self._trim_buffer()
+        return self._emit(is_final=False)
+
+    def finish(self):
+        """رمزگشایی نهایی صدای باقیمانده و تأیید تمام کلمات"""
+        if len(self.audio_buffer) > 0:
+            self.committed_words.extend(self._decode())
+        self.hypothesis = []
+        result = self._emit(is_final=True)
+        self.reset()
+        return result
+
+    def _decode(self):
+        """رمزگشایی پنجره فعلی و برگرداندن کلمات بعد از آخرین کلمه تأیید شده"""
+        if len(self.audio_buffer) == 0:
+            return []
+
+        start_time = time.perf_counter()
+        try:
+            audio_data = self.engine._normalize_audio(self.audio_buffer)
+            with self.engine.model_lock, tracing.span("whisper", duration=len(audio_data) / config.SAMPLE_RATE):
+                result = self.engine.model.transcribe(
+                    audio_data,
+                    language="fa",
+                    word_timestamps=True,
+                    initial_prompt=self._prompt()
+                )
+        except Exception as e:
+            logger.error("Error in streaming transcription", error=str(e))
+            metrics.ERRORS.inc(component="stt")
+            return []
+        # هر گام پنجره کامل را دوباره رمزگشایی می‌کند؛ RTF نسبت به طول پنجره است
+        metrics.observe_audio_stage("stt_stream", time.perf_counter() - start_time, len(audio_data) / config.SAMPLE_RATE)
+
+        last_end = self.committed_words[-1][2] if self.committed_words else 0.0
+        words = []
+        for segment in result["segments"]:
+            for word in segment["words"]:
+                start = word["start"] + self.buffer_offset
+                end = word["end"] + self.buffer_offset
+                text = word["word"].strip()
+                # کلماتی که قبلاً تأیید شده‌اند دوباره اضافه نمی‌شوند
+                if text and end > last_end + 0.05:
+                    words.append((text, start, end))
+        return words
+
+    def _agree(self, words):
+        """تأیید طولانی‌ترین پیشوند مشترک بین رمزگشایی قبلی و فعلی"""
+        agreed = 0
+        for previous, current in zip(self.hypothesis, words):
+            if previous[0] != current[0]:
+                break
+            agreed += 1
+        self.hypothesis = words[agreed:]
+        return words[:agreed]
+
+    def _trim_buffer(self):
+        """کوتاه کردن پنجره تا انتهای آخرین کلمه تأیید شده"""
+        if len(self.audio_buffer) <= self.window_samples or not self.committed_words:
+            return
+
+        cut_time = self.committed_words[-1][2] - self.buffer_offset
+        cut_samples = min(int(cut_time * self.sample_rate), len(self.audio_buffer))
+        if cut_samples > 0:
+            self.audio_buffer = self.audio_buffer[cut_samples:]
+            self.buffer_offset += cut_samples / self.sample_rate
+
+    def _prompt(self):
+        if not self.committed_words:
+            return None
+        return " ".join(word[0] for word in self.committed_words[-config.STREAM_PROMPT_WORDS:])
+
+    def _emit(self, is_final):
+        committed_text = " ".join(word[0] for word in self.committed_words)
+        partial_text = " ".join(word[0] for word in self.hypothesis)
+
+        if is_final and committed_text:
+            committed_text, _ = self.engine.detect_tone_and_punctuation(committed_text)
+
+        result = {
+            "committed": committed_text,
+            "partial": partial_text,
+            "text": " ".join(part for part in (committed_text, partial_text) if part),
+            "is_final": is_final
+        }
+        if self.callback is not None:
+            self.callback(result)
+        return result
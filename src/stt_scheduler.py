@@ -0,0 +1,176 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+import config
+from src import metrics
+from src import tracing
+from src.inference_executor import ServerOverloaded
+
+# نشانگر توقف worker
+_STOP = object()
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": float(p50), "p95": float(p95), "max": float(max(values))}
+
+class STTBatchScheduler:
+    """
+    زمان‌بند micro-batching بین handler های API و STTEngine: درخواست‌های همزمان
+    حداکثر max_wait_ms (از رسیدن اولین درخواست) یا تا رسیدن max_batch_size جمع و در یک
+    فراخوانی transcribe_batch اجرا می‌شوند؛ هر فراخواننده نتیجه خود را از Future می‌گیرد.
+    """
+
+    def __init__(self, engine, max_batch_size=None, max_wait_ms=None, max_pending=None, concurrency=1):
+        self.engine = engine
+        # تعداد batch های همزمان (مثلاً برابر تعداد worker های pool)
+        self.concurrency = concurrency
+        self.max_batch_size = max_batch_size or config.STT_BATCH_SIZE
+        self.max_wait = (config.STT_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.queue = queue.Queue(maxsize=max_pending or config.STT_SCHEDULER_MAX_PENDING)
+        self.is_running = False
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+        # آمار
+        self.requests = 0
+        self.batches = 0
+        self.batch_sizes = collections.Counter()
+        # مقادیر اخیر برای صدک‌ها (ثانیه)
+        self.wait_times = collections.deque(maxlen=1000)
+        self.queue_delays = collections.deque(maxlen=1000)
+        self.batch_times = collections.deque(maxlen=1000)
+
+    def start(self):
+        with self._start_lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._threads = [
+                threading.Thread(target=self._run, name=f"stt-scheduler-{index}", daemon=True)
+                for index in range(self.concurrency)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        if not self.is_running:
+            return
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self.is_running = False
+
+    def submit(self, audio_data):
+        """
+        ثبت یک کلیپ برای تشخیص گفتار و برگرداندن Future متن؛ اگر صف پر باشد
+        ServerOverloaded ایجاد می‌شود
+        """
+        self.start()
+        future = Future()
+        try:
+            # trace فراخواننده همراه درخواست تا thread توزیع batch می‌رود
+            self.queue.put_nowait((audio_data, future, time.perf_counter(), tracing.current_trace()))
+        except queue.Full:
+            raise ServerOverloaded()
+        metrics.QUEUE_DEPTH.set(self.queue.qsize(), queue="stt_scheduler")
+        return future
+
+    def transcribe(self, audio_data, timeout=None):
+        """
+        نسخه مسدودکننده submit (برای handler های همگام)؛ با پایان timeout درخواست لغو
+        می‌شود (اگر هنوز در batch ی اجرا نشده) و TimeoutError ایجاد می‌شود
+        """
+        future = self.submit(audio_data)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+
+            # جمع‌آوری درخواست‌ها تا پر شدن batch یا پایان مهلت انتظار اولین درخواست
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                # پس از پایان مهلت، درخواست‌های از قبل در صف (مثلاً رسیده حین batch قبلی) بدون انتظار برداشته می‌شوند
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            metrics.QUEUE_DEPTH.set(self.queue.qsize(), queue="stt_scheduler")
+            self._dispatch(batch)
+            if stopping:
+                break
+
+    def _dispatch(self, batch):
+        # درخواست‌هایی که فراخواننده آن‌ها منصرف شده (مثلاً timeout) اجرا نمی‌شوند
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        dispatch_time = time.perf_counter()
+        wait_time = dispatch_time - batch[0][2]
+        self.wait_times.append(wait_time)
+        metrics.STT_BATCH_WAIT.observe(wait_time)
+        metrics.STT_BATCH_SIZE.observe(len(batch))
+        for _, _, submitted, trace in batch:
+            self.queue_delays.append(dispatch_time - submitted)
+            metrics.STT_QUEUE_DELAY.observe(dispatch_time - submitted)
+            tracing.record(trace, "stt_scheduler_queue", submitted, dispatch_time)
+
+        # span های داخل batch (از جمله span های worker pool) در یک trace موقت جمع و سپس
+        # به trace هر درخواست batch کپی می‌شوند
+        traces = [trace for _, _, _, trace in batch if trace is not None]
+        collector = tracing.Trace(0, "stt_batch", {}) if traces else None
+        try:
+            with tracing.use(collector):
+                results = self.engine.transcribe_batch([audio_data for audio_data, _, _, _ in batch])
+        except Exception as e:
+            for _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            end_time = time.perf_counter()
+            self.batch_times.append(end_time - dispatch_time)
+            self.requests += len(batch)
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+            for trace in traces:
+                tracing.record(trace, "stt_batch", dispatch_time, end_time, batch_size=len(batch))
+                trace.add_spans(collector.spans)
+
+        for (_, future, _, _), text in zip(batch, results):
+            future.set_result(text)
+
+    def get_stats(self):
+        """آمار batch ها: توزیع اندازه، زمان انتظار batch و تأخیر صف هر درخواست"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self.queue.qsize(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "wait_time": _percentiles(list(self.wait_times)),
+            "queue_delay": _percentiles(list(self.queue_delays)),
+            "batch_time": _percentiles(list(self.batch_times))
+        }
@@ -0,0 +1,217 @@
+import collections
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import config
+from src.log import get_logger
+
+logger = get_logger("tracing")
+
+# ردیابی هر جمله (یا درخواست API): هر trace یک شناسه و فهرستی از span ها دارد.
+# trace فعال در یک contextvar نگه داشته می‌شود تا موتورها بدون تغییر امضای متدها
+# span ثبت کنند؛ هر جا کار به thread دیگری می‌رود (صف‌های خط لوله، pool استنتاج،
+# زمان‌بند batch) trace همراه کار منتقل و در آنجا دوباره فعال می‌شود. کارهای worker pool
+# در process استنتاج زیر یک trace محلی اجرا می‌شوند و span های آن همراه نتیجه برمی‌گردد
+# (perf_counter در لینوکس و ویندوز بین process ها مشترک است).
+# خروجی با قالب Chrome trace-event است و در Perfetto (ui.perfetto.dev) باز می‌شود.
+
+_current_trace = contextvars.ContextVar("linguastream_trace", default=None)
+
+class Trace:
+    """span های یک جمله؛ ثبت از چند thread همزمان امن است"""
+
+    __slots__ = ("trace_id", "name", "args", "start_time", "spans", "_lock")
+
+    def __init__(self, trace_id, name, args):
+        self.trace_id = trace_id
+        self.name = name
+        self.args = args
+        self.start_time = time.perf_counter()
+        # (نام، شروع، پایان، thread id، نام thread، آرگومان‌ها)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start_time, end_time, **args):
+        """ثبت span با زمان‌های perf_counter (برای بازه‌هایی که بعداً معلوم می‌شوند، مثلاً انتظار در صف)"""
+        thread = threading.current_thread()
+        with self._lock:
+            self.spans.append((name, start_time, end_time, thread.ident, thread.name, args))
+
+    def add_spans(self, spans):
+        """افزودن span های ثبت شده در trace دیگر (مثلاً در process worker یا batch مشترک)"""
+        with self._lock:
+            self.spans.extend(spans)
+
+class _Span:
+    __slots__ = ("trace", "name", "args", "start_time")
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        self.trace.add_span(self.name, self.start_time, time.perf_counter(), **self.args)
+        return False
+
+class _NullSpan:
+    """span بدون اثر وقتی trace فعالی نیست (هزینه تقریباً صفر)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Activation:
+    __slots__ = ("trace", "token")
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_trace.reset(self.token)
+        return False
+
+class Tracer:
+    """نگهداری آخرین TRACE_MAX_TRACES trace و تبدیل آن‌ها به JSON قابل نمایش در Perfetto"""
+
+    def __init__(self, max_traces=None):
+        self.enabled = config.TRACING_ENABLED
+        self._traces = collections.deque(maxlen=max_traces or config.TRACE_MAX_TRACES)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_trace(self, name, **args):
+        """trace جدید یا None اگر ردیابی غیرفعال باشد"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            trace = Trace(next(self._ids), name, args)
+            self._traces.append(trace)
+        return trace
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def to_chrome_trace(self):
+        """
+        رویدادهای Chrome trace: هر trace یک process جدا (pid = شناسه trace) و هر thread
+        یک track است؛ span های تو در تو روی یک thread به صورت تو در تو نمایش داده می‌شوند
+        """
+        with self._lock:
+            traces = list(self._traces)
+
+        events = []
+        for trace in traces:
+            with trace._lock:
+                spans = list(trace.spans)
+            label = f"{trace.name} #{trace.trace_id}"
+            if trace.args:
+                label += " " + " ".join(f"{key}={value}" for key, value in trace.args.items())
+            events.append({"name": "process_name", "ph": "M", "pid": trace.trace_id, "tid": 0, "args": {"name": label}})
+            events.append({"name": "process_sort_index", "ph": "M", "pid": trace.trace_id, "tid": 0,
+                           "args": {"sort_index": trace.trace_id}})
+
+            thread_names = {}
+            for name, start_time, end_time, thread_id, thread_name, args in spans:
+                thread_names[thread_id] = thread_name
+                events.append({
+                    "name": name,
+                    "cat": trace.name,
+                    "ph": "X",
+                    "ts": start_time * 1e6,
+                    "dur": max(0.0, end_time - start_time) * 1e6,
+                    "pid": trace.trace_id,
+                    "tid": thread_id,
+                    "args": args
+                })
+            for thread_id, thread_name in thread_names.items():
+                events.append({"name": "thread_name", "ph": "M", "pid": trace.trace_id, "tid": thread_id,
+                               "args": {"name": thread_name}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path=None):
+        """نوشتن trace ها در فایل JSON (پیش‌فرض TRACE_FILE) و برگرداندن مسیر آن"""
+        path = path or config.TRACE_FILE
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False, default=str)
+        logger.info("Trace written", path=path, traces=len(self._traces))
+        return path
+
+# نمونه سراسری مشترک بین تمام اجزای یک process
+tracer = Tracer()
+
+def start_trace(name, **args):
+    return tracer.start_trace(name, **args)
+
+def current_trace():
+    return _current_trace.get()
+
+def use(trace):
+    """فعال کردن trace در context فعلی (with tracing.use(trace): ...)؛ trace=None یعنی بدون ردیابی"""
+    return _Activation(trace)
+
+def activate(trace):
+    """فعال کردن trace بدون بلوک with؛ توکن برگشتی باید به deactivate داده شود"""
+    return _current_trace.set(trace)
+
+def deactivate(token):
+    _current_trace.reset(token)
+
+def span(name, **args):
+    """span تو در تو در trace فعال؛ بدون trace فعال اثری ندارد"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, args)
+
+def record(trace, name, start_time, end_time, **args):
+    """ثبت span با زمان‌های معلوم در trace مشخص (trace=None نادیده گرفته می‌شود)"""
+    if trace is not None:
+        trace.add_span(name, start_time, end_time, **args)
+
+def instrument_module(module, name):
+    """
+    ثبت span برای هر فراخوانی forward یک ماژول PyTorch (مثلاً encoder و decoder مدل Whisper
+    که درون model.transcribe صدا زده می‌شوند) با forward hook
+    """
+    starts = threading.local()
+
+    def pre_hook(_module, _inputs):
+        if _current_trace.get() is not None:
+            starts.stack = getattr(starts, "stack", [])
+            starts.stack.append(time.perf_counter())
+
+    def post_hook(_module, _inputs, _output):
+        trace = _current_trace.get()
+        stack = getattr(starts, "stack", None)
+        if trace is not None and stack:
+            trace.add_span(name, stack.pop(), time.perf_counter())
+
+    module.register_forward_pre_hook(pre_hook)
+    module.register_forward_hook(post_hook)
@@ -0,0 +1,188 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import config
+from src.lru_cache import LRUCache
+from src.log import get_logger
+from src import metrics
+
+logger = get_logger("translation_cache")
+
+# یکسان‌سازی نویسه‌های عربی و فارسی
+_CHARACTER_MAP = str.maketrans({
+    "\u064a": "\u06cc",  # ي → ی
+    "\u0649": "\u06cc",  # ى → ی
+    "\u0643": "\u06a9",  # ك → ک
+    "\u200b": " ",       # zero width space
+    "\u200c": " ",       # ZWNJ (نیم‌فاصله)
+    "\u200d": " ",       # zero width joiner
+    "\ufeff": " ",       # BOM
+    "\u00ad": "",        # soft hyphen
+    "\u0640": "",        # کشیده (ـ)
+    "?": "\u061f",
+    "\uff1f": "\u061f",  # ؟ تمام‌عرض
+    "\uff01": "!",       # ! تمام‌عرض
+    ",": "\u060c",
+    ";": "\u061b",
+    **{chr(0x0660 + digit): chr(0x06f0 + digit) for digit in range(10)}  # ارقام عربی → فارسی
+})
+_DIACRITICS = re.compile("[\u064b-\u0652\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+# نقطه‌ای که detect_tone_and_punctuation به انتهای جمله خبری اضافه می‌کند؛ ؟ و ! در کلید
+# می‌مانند تا جمله پرسشی یا تعجبی ترجمه جمله خبری را نگیرد
+_TRAILING_PERIOD = re.compile(r"[\s.]+$")
+
+def normalize_persian_text(text):
+    """
+    نرمال‌سازی متن فارسی برای کلید کش: یکسان‌سازی ی/ک عربی، نیم‌فاصله و
+    نویسه‌های نامرئی، حذف اعراب و نقطه انتهای جمله
+    """
+    text = text.translate(_CHARACTER_MAP)
+    text = _DIACRITICS.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    text = _TRAILING_PERIOD.sub("", text)
+    return text
+
+class TranslationCache:
+    """
+    کش دوسطحی ترجمه: LRU در حافظه جلوی یک پایگاه SQLite روی دیسک.
+    حجم دیسک با حذف قدیمی‌ترین ورودی‌ها (بر اساس آخرین دسترسی) محدود می‌شود.
+    """
+
+    def __init__(self, path=None, memory_entries=None, max_disk_bytes=None):
+        self.path = path or os.path.join(config.CACHE_DIR, "translations.sqlite3")
+        self.max_disk_bytes = max_disk_bytes or config.TRANSLATION_CACHE_MAX_DISK_BYTES
+        self.memory = LRUCache(memory_entries or config.TRANSLATION_CACHE_MEMORY_ENTRIES)
+
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disk_bytes = 0
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL: خواندن worker ها همزمان با نوشتن یکی از آن‌ها مسدود نمی‌شود
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS translations_last_access ON translations (last_access)"
+            )
+            self._connection.commit()
+            self._disk_bytes = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM translations"
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            # بدون دیسک، فقط کش حافظه استفاده می‌شود
+            logger.warning("Translation disk cache unavailable", error=str(e))
+            self._connection = None
+
+    @staticmethod
+    def make_key(text, model_name=None, backend=None):
+        """کلید کش: مدل و backend (خروجی int8/onnx با fp32 یکسان نیست) و متن نرمال‌شده"""
+        model_name = model_name or config.TRANSLATION_MODEL_NAME
+        backend = backend or config.TRANSLATION_BACKEND
+        return f"{model_name}\x00{backend}\x00{normalize_persian_text(text)}"
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self._connection is None:
+            return value
+
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    "SELECT value FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.disk_misses += 1
+                    return None
+                self._connection.execute(
+                    "UPDATE translations SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.error("Error reading translation cache", error=str(e))
+                metrics.ERRORS.inc(component="translation_cache")
+                return None
+
+        self.disk_hits += 1
+        self.memory.put(key, row[0])
+        return row[0]
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self._connection is None:
+            return
+
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        with self._lock:
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO translations (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, size, time.time())
+                )
+                # حجم از خود جدول خوانده می‌شود چون worker های دیگر هم در همین فایل می‌نویسند؛
+                # قفل نوشتن SQLite تا commit نگه داشته می‌شود پس این عدد تا پایان حذف‌ها معتبر است
+                self._disk_bytes = self._connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM translations"
+                ).fetchone()[0]
+                self._evict()
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.error("Error writing translation cache", error=str(e))
+                metrics.ERRORS.inc(component="translation_cache")
+
+    def _evict(self):
+        """حذف قدیمی‌ترین ورودی‌ها تا رسیدن حجم به زیر سقف مجاز"""
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._connection.execute(
+                "SELECT key, size FROM translations ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            for key, size in rows:
+                self._connection.execute("DELETE FROM translations WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+
+    def get_stats(self):
+        """شمارنده‌های برخورد و عدم برخورد هر دو سطح"""
+        memory_stats = self.memory.get_stats()
+        hits = memory_stats["hits"] + self.disk_hits
+        # با فعال بودن دیسک، عدم برخورد نهایی همان عدم برخورد دیسک است
+        misses = self.disk_misses if self._connection is not None else memory_stats["misses"]
+        return {
+            "memory": memory_stats,
+            "disk": {
+                "enabled": self._connection is not None,
+                "bytes": self._disk_bytes,
+                "max_bytes": self.max_disk_bytes,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses
+            },
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+# کش مشترک بین تمام مترجم‌های یک process
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_translation_cache():
+    """دریافت (و در صورت نیاز ایجاد) کش مشترک ترجمه"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TranslationCache()
+        return _shared_cache
@@ -1,11 +1,92 @@
-from transformers import pipeline
+from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import os
+import re
+import time
+import difflib
 import config
+from src.model_registry import registry as model_registry
+from src.translation_cache import TranslationCache, get_translation_cache
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("translator")
+
+# مرز جمله: علامت پایان جمله (فارسی یا لاتین) و سپس فاصله
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u061f])\s+")
+
+# جملات پیش‌فرض برای مقایسه خروجی backend ها با مدل fp32
+PARITY_SENTENCES = [
+    "سلام، حال شما چطور است؟",
+    "امروز هوا خیلی خوب است.",
+    "لطفاً این سند را تا فردا برای من ارسال کنید.",
+    "جلسه بعدی ما ساعت سه بعد از ظهر برگزار می‌شود.",
+    "متشکرم، خیلی به من کمک کردید!"
+]
+
+def _artifact_path(suffix):
+    """مسیر فایل‌های تبدیل شده مدل در MODELS_DIR"""
+    model_name = config.TRANSLATION_MODEL_NAME.replace("/", "--")
+    return os.path.join(config.MODELS_DIR, "translation", f"{model_name}-{suffix}")
+
+def _load_pytorch_pipeline():
+    """مدل کامل fp32 با PyTorch"""
+    return pipeline("translation", model=config.TRANSLATION_MODEL_NAME)
+
+def _load_int8_pipeline():
+    """مدل با کوانتیزاسیون پویای int8 برای لایه‌های Linear (اجرای CPU)"""
+    import torch
+
+    tokenizer = AutoTokenizer.from_pretrained(config.TRANSLATION_MODEL_NAME)
+    path = _artifact_path("int8.pt")
+
+    if os.path.exists(path):
+        # مدل کوانتیزه ذخیره شده مستقیماً بارگذاری می‌شود (بدون وزن‌های fp32)
+        model = torch.load(path, weights_only=False)
+    else:
+        logger.info("Quantizing translation model to int8 (one-time conversion)", model=config.TRANSLATION_MODEL_NAME)
+        model = AutoModelForSeq2SeqLM.from_pretrained(config.TRANSLATION_MODEL_NAME)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(model, path)
+
+    model.eval()
+    return pipeline("translation", model=model, tokenizer=tokenizer)
+
+def _load_onnx_pipeline():
+    """گراف ONNX اجرا شده با onnxruntime (نیازمند پکیج optimum)"""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    path = _artifact_path("onnx")
+    if os.path.isdir(path):
+        model = ORTModelForSeq2SeqLM.from_pretrained(path)
+        tokenizer = AutoTokenizer.from_pretrained(path)
+    else:
+        logger.info("Exporting translation model to ONNX (one-time conversion)", model=config.TRANSLATION_MODEL_NAME)
+        model = ORTModelForSeq2SeqLM.from_pretrained(config.TRANSLATION_MODEL_NAME, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(config.TRANSLATION_MODEL_NAME)
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+
+    return pipeline("translation", model=model, tokenizer=tokenizer)
+
+_BACKEND_LOADERS = {
+    "pytorch": _load_pytorch_pipeline,
+    "int8": _load_int8_pipeline,
+    "onnx": _load_onnx_pipeline
+}
 
 class Translator:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.translator = None
         self.model_loaded = False
-        print("Translator initialized. Model will be loaded on first use.")
+        self.backend = backend or config.TRANSLATION_BACKEND
+        if self.backend not in _BACKEND_LOADERS:
+            raise ValueError(f"Unknown translation backend: {self.backend}")
+        self.model_key = f"translation:{config.TRANSLATION_MODEL_NAME}:{self.backend}"
+        self.model_lock = None
+        self.cache = get_translation_cache() if config.TRANSLATION_CACHE_ENABLED else None
+        logger.info("Translator initialized. Model will be loaded on first use")
 
     def _load_model(self):
         """بارگذاری مدل ترجمه (فقط یک بار)"""
@@ -13,40 +94,178 @@ class Translator:
             return
             
         try:
-            print("Loading translation model...")
+            logger.info("Loading translation model", model=config.TRANSLATION_MODEL_NAME, backend=self.backend)
             # مدل به صورت خودکار دانلود می‌شود اگر موجود نباشد
-            self.translator = pipeline("translation", model=config.TRANSLATION_MODEL_NAME)
+            self.translator = model_registry.acquire(self.model_key, _BACKEND_LOADERS[self.backend])
+            self.model_lock = model_registry.lock(self.model_key)
             self.model_loaded = True
-            print(f"Translation model '{config.TRANSLATION_MODEL_NAME}' loaded successfully.")
+            logger.info("Translation model loaded", model=config.TRANSLATION_MODEL_NAME, backend=self.backend)
         except Exception as e:
-            print(f"Error loading translation model: {e}")
+            logger.error("Error loading translation model", model=config.TRANSLATION_MODEL_NAME, error=str(e))
+            metrics.ERRORS.inc(component="translator")
             raise
 
-    def translate(self, text):
+    def release(self):
+        """آزاد کردن ارجاع این مترجم به مدل مشترک"""
+        if not self.model_loaded:
+            return
+        model_registry.release(self.model_key)
+        self.translator = None
+        self.model_lock = None
+        self.model_loaded = False
+
+    def translate(self, text, cache_result=True):
         """
         ترجمه متن از فارسی به انگلیسی
+        با cache_result=False کش فقط خوانده می‌شود (مثلاً برای متن‌های جزئی موقت)
         """
         if not text or not text.strip():
             return ""
+        
+        return self.translate_batch([text], cache_result=cache_result)[0]
+
+    def split_sentences(self, text):
+        """تقسیم متن به جملات بر اساس علامت‌های پایان جمله فارسی"""
+        return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text.strip()) if sentence.strip()]
+
+    def translate_batch(self, texts, cache_result=True):
+        """
+        ترجمه چند متن: متن‌ها به جمله تقسیم می‌شوند، جملات بر اساس طول توکن
+        دسته‌بندی و با هم ترجمه می‌شوند و نتیجه به ترتیب ورودی بازسازی می‌شود
+        """
+        start_time = time.perf_counter()
+        
+        # (شماره متن، جمله) برای تمام جملات ورودی
+        sentences = []
+        for index, text in enumerate(texts):
+            if text and text.strip():
+                sentences.extend((index, sentence) for sentence in self.split_sentences(text))
+        
+        translations = [None] * len(sentences)
+        
+        # جملات تکراری یک بار ترجمه می‌شوند و جملات موجود در کش اصلاً به مدل نمی‌رسند
+        pending = {}
+        for position, (_, sentence) in enumerate(sentences):
+            if self.cache is not None:
+                cache_key = TranslationCache.make_key(sentence, backend=self.backend)
+                cached = self.cache.get(cache_key)
+                metrics.CACHE_REQUESTS.inc(cache="translation", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    translations[position] = cached
+                    continue
+            else:
+                cache_key = sentence
+            pending.setdefault(cache_key, []).append(position)
+        
+        if pending:
+            # بارگذاری مدل در صورت نیاز
+            if not self.model_loaded:
+                self._load_model()
             
-        # بارگذاری مدل در صورت نیاز
+            unique = list(pending.items())
+            with tracing.span("translate", sentences=len(unique), cached=len(sentences) - sum(map(len, pending.values()))):
+                outputs = self._translate_sentences([sentences[positions[0]][1] for _, positions in unique])
+            for (cache_key, positions), result in zip(unique, outputs):
+                for position in positions:
+                    translations[position] = result
+                if result and cache_result and self.cache is not None:
+                    self.cache.put(cache_key, result)
+        
+        # بازسازی هر متن از ترجمه جملاتش
+        parts = [[] for _ in texts]
+        for (index, _), result in zip(sentences, translations):
+            if result:
+                parts[index].append(result)
+        
+        metrics.STAGE_LATENCY.observe(time.perf_counter() - start_time, stage="translate")
+        return [" ".join(part) for part in parts]
+
+    def _translate_sentences(self, sentences, translator=None, lock=None):
+        """ترجمه جملات در batch هایی با طول توکن مشابه"""
+        translator = translator or self.translator
+        lock = lock or self.model_lock
+        outputs = [""] * len(sentences)
+        
+        try:
+            lengths = [len(ids) for ids in translator.tokenizer(sentences)["input_ids"]]
+        except Exception as e:
+            logger.error("Error tokenizing sentences", error=str(e))
+            metrics.ERRORS.inc(component="translator")
+            return outputs
+        
+        # مرتب‌سازی بر اساس طول تا padding هر batch حداقل باشد؛ هزینه هر batch
+        # (طول بلندترین جمله × تعداد جملات) از TRANSLATION_BATCH_TOKENS بیشتر نمی‌شود
+        batches = []
+        batch = []
+        for index in sorted(range(len(sentences)), key=lambda i: lengths[i]):
+            if batch and (
+                (len(batch) + 1) * lengths[index] > config.TRANSLATION_BATCH_TOKENS
+                or len(batch) >= config.TRANSLATION_MAX_BATCH_SIZE
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        
+        for batch in batches:
+            try:
+                # ترجمه متن
+                with lock, tracing.span("translation_generate", batch_size=len(batch)):
+                    translated = translator(
+                        [sentences[index] for index in batch],
+                        src_lang=config.TRANSLATION_SOURCE_LANG,
+                        tgt_lang=config.TRANSLATION_TARGET_LANG,
+                        batch_size=len(batch)
+                    )
+                for index, item in zip(batch, translated):
+                    outputs[index] = item['translation_text'].strip()
+                    logger.info("Translated", text=outputs[index])
+            except Exception as e:
+                logger.error("Error in translation", batch_size=len(batch), error=str(e))
+                metrics.ERRORS.inc(component="translator")
+        
+        return outputs
+
+    def check_parity(self, sentences=None):
+        """
+        مقایسه خروجی backend فعلی با مدل مرجع fp32 (بدون استفاده از کش)
+        """
+        sentences = sentences or PARITY_SENTENCES
         if not self.model_loaded:
             self._load_model()
         
+        reference_key = f"translation:{config.TRANSLATION_MODEL_NAME}:pytorch"
+        reference = model_registry.acquire(reference_key, _load_pytorch_pipeline)
         try:
-            # ترجمه متن
-            translated = self.translator(text)
-            result = translated[0]['translation_text']
-            
-            if result:
-                print(f"Translated: {result}")
-                return result
-            else:
-                return ""
-                
-        except Exception as e:
-            print(f"Error in translation: {e}")
-            return ""
+            expected = self._translate_sentences(sentences, reference, model_registry.lock(reference_key))
+        finally:
+            model_registry.release(reference_key)
+        actual = self._translate_sentences(sentences)
+        
+        similarities = [
+            difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+            for a, b in zip(expected, actual)
+        ]
+        exact_matches = sum(1 for a, b in zip(expected, actual) if a == b)
+        report = {
+            "backend": self.backend,
+            "sentences": len(sentences),
+            "exact_match_rate": exact_matches / len(sentences),
+            "mean_similarity": sum(similarities) / len(similarities),
+            "min_similarity": min(similarities),
+            "mismatches": [
+                {"source": source, "reference": a, "output": b}
+                for source, a, b in zip(sentences, expected, actual) if a != b
+            ]
+        }
+        logger.info(
+            "Parity check against fp32",
+            backend=self.backend,
+            exact_match_rate=report['exact_match_rate'],
+            mean_similarity=report['mean_similarity']
+        )
+        return report
 
     def get_model_info(self):
         """دریافت اطلاعات مدل"""
@@ -55,6 +274,8 @@ class Translator:
         
         return {
             "model_name": config.TRANSLATION_MODEL_NAME,
+            "backend": self.backend,
             "source_language": "Persian (fa)",
-            "target_language": "English (en)"
+            "target_language": "English (en)",
+            "cache": self.cache.get_stats() if self.cache is not None else None
         }
\ No newline at end of file
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import config
+from src.lru_cache import LRUCache
+from src.log import get_logger
+from src import metrics
+
+logger = get_logger("tts_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_synthesis_text(text):
+    """نرمال‌سازی متن انگلیسی برای کلید کش (فاصله‌ها؛ حروف بزرگ و علامت‌ها روی لحن اثر دارند)"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+class SynthesisCache:
+    """
+    کش PCM سنتز شده با کلید (متن نرمال‌شده، هش گوینده، زبان، مدل).
+    سطح حافظه LRU با محدودیت مجموع بایت‌هاست؛ سطح اختیاری دیسک فایل‌های
+    خام int16 نگه می‌دارد که هنگام خواندن memory-map می‌شوند.
+    """
+
+    def __init__(self, max_bytes=None, directory=None, persist=None, max_disk_bytes=None):
+        self.memory = LRUCache(max_bytes or config.TTS_CACHE_MAX_BYTES, sizeof=lambda value: value.nbytes)
+        self.persist = config.TTS_CACHE_PERSIST if persist is None else persist
+        self.directory = directory or os.path.join(config.CACHE_DIR, "tts")
+        self.max_disk_bytes = max_disk_bytes or config.TTS_CACHE_MAX_DISK_BYTES
+
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        # فایل‌های دیسک به ترتیب دسترسی (قدیمی‌ترین اول)؛ زمان دسترسی همان mtime فایل است
+        # تا process های دیگری که همین پوشه را به اشتراک دارند (worker pool) هم آن را ببینند
+        self._disk_index = OrderedDict()
+        self._disk_bytes = 0
+
+        if self.persist:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self._scan()
+            except OSError as e:
+                logger.warning("TTS disk cache unavailable", error=str(e))
+                self.persist = False
+
+    def _scan(self):
+        """بازسازی فهرست و حجم دیسک از خود پوشه (شامل فایل‌های نوشته یا حذف شده توسط process های دیگر)"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pcm"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._disk_index = OrderedDict((name, size) for _, name, size in entries)
+        self._disk_bytes = sum(size for _, _, size in entries)
+
+    @staticmethod
+    def make_key(text, speaker, language, model):
+        return "\x00".join((normalize_synthesis_text(text), speaker or "", language, model))
+
+    def _filename(self, key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pcm"
+
+    def get(self, key):
+        """آرایه int16 ذخیره شده (در حافظه یا نگاشت‌شده از دیسک) یا None"""
+        value = self.memory.get(key)
+        if value is not None or not self.persist:
+            return value
+
+        # فایل مستقیماً باز می‌شود (ممکن است process دیگری آن را نوشته یا حذف کرده باشد)
+        filename = self._filename(key)
+        path = os.path.join(self.directory, filename)
+        try:
+            value = np.memmap(path, dtype=np.int16, mode="r")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.disk_misses += 1
+                size = self._disk_index.pop(filename, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        except (OSError, ValueError) as e:
+            logger.error("Error reading TTS cache", error=str(e))
+            metrics.ERRORS.inc(component="tts_cache")
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            if filename not in self._disk_index:
+                self._disk_bytes += value.nbytes
+            self._disk_index[filename] = value.nbytes
+            self._disk_index.move_to_end(filename)
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key, samples):
+        self.memory.put(key, samples)
+        if not self.persist or len(samples) == 0:
+            return
+
+        filename = self._filename(key)
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            if filename in self._disk_index and os.path.exists(path):
+                return
+            try:
+                # نام موقت یکتا برای هر process؛ چند worker ممکن است همزمان یک عبارت را ذخیره کنند
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(memoryview(np.ascontiguousarray(samples)))
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.error("Error writing TTS cache", error=str(e))
+                metrics.ERRORS.inc(component="tts_cache")
+                return
+
+            # سقف حجم برای کل پوشه (مشترک بین process ها) اعمال می‌شود، نه فقط فایل‌های همین process
+            try:
+                self._scan()
+            except OSError as e:
+                logger.error("Error scanning TTS cache", error=str(e))
+                metrics.ERRORS.inc(component="tts_cache")
+                return
+
+            # حذف قدیمی‌ترین فایل‌ها تا رسیدن حجم به زیر سقف مجاز
+            while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+                evicted, size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(os.path.join(self.directory, evicted))
+                except FileNotFoundError:
+                    # قبلاً توسط process دیگری حذف شده
+                    pass
+                except OSError as e:
+                    logger.error("Error evicting TTS cache file", error=str(e))
+                    metrics.ERRORS.inc(component="tts_cache")
+
+    def get_stats(self):
+        """آمار کش شامل نرخ برخورد کل"""
+        memory_stats = self.memory.get_stats()
+        hits = memory_stats["hits"] + self.disk_hits
+        # با فعال بودن دیسک، عدم برخورد نهایی همان عدم برخورد دیسک است
+        misses = self.disk_misses if self.persist else memory_stats["misses"]
+        return {
+            "memory": memory_stats,
+            "disk": {
+                "enabled": self.persist,
+                "files": len(self._disk_index),
+                "bytes": self._disk_bytes,
+                "max_bytes": self.max_disk_bytes,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses
+            },
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+# کش مشترک بین تمام موتورهای TTS یک process
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_synthesis_cache():
+    """دریافت (و در صورت نیاز ایجاد) کش مشترک سنتز"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SynthesisCache()
+        return _shared_cache
@@ -1,88 +1,293 @@
 import config
 import io
+import re
 import tempfile
 import os
+import time
+import numpy as np
+from src.model_registry import registry as model_registry
+from src.speaker_store import SpeakerStore
+from src.tts_cache import SynthesisCache, get_synthesis_cache
+from src.audio_buffer import AudioBuffer
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("tts_engine")
+
+try:
+    from TTS.api import TTS
+except ImportError:
+    # بدون پکیج TTS، موتور در حالت placeholder (فاز اول) اجرا می‌شود
+    TTS = None
+
+# مرز جمله و مرز عبارت (برای تقسیم جملات بلند)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:])\s+")
+
+def split_for_synthesis(text, max_chars=None):
+    """
+    تقسیم متن به جملات و تقسیم جملات بلندتر از max_chars به عبارت‌ها
+    """
+    max_chars = max_chars or config.TTS_STREAM_MAX_CHARS
+    pieces = []
+    for sentence in _SENTENCE_BOUNDARY.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        # ادغام عبارت‌های کوتاه تا جای ممکن، بدون عبور از max_chars
+        current = ""
+        for clause in _CLAUSE_BOUNDARY.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            pieces.append(current)
+    return pieces
+
+def _load_xtts():
+    """بارگذاری مدل XTTS-v2 روی GPU در صورت امکان"""
+    import torch
+
+    device = "cuda" if config.TTS_USE_GPU and torch.cuda.is_available() else "cpu"
+    return TTS(config.TTS_MODEL_NAME).to(device)
 
 class TTSEngine:
     def __init__(self):
         self.tts_model = None
         self.model_loaded = False
-        print("TTS Engine initialized. Model will be loaded on first use.")
+        self.model_key = f"tts:{config.TTS_MODEL_NAME}"
+        self.model_lock = None
+        # نرخ نمونه خروجی: XTTS-v2 با 24kHz و placeholder با نرخ Whisper
+        self.sample_rate = config.SAMPLE_RATE
+        # conditioning گوینده فعلی (latent ها به صورت tensor روی دستگاه مدل)
+        self.speaker_store = SpeakerStore()
+        self.speaker = None
+        self.speaker_latents = None
+        self.cache = get_synthesis_cache() if config.TTS_CACHE_ENABLED else None
+        logger.info("TTS Engine initialized. Model will be loaded on first use")
 
     def _load_model(self):
         """بارگذاری مدل TTS (فقط یک بار)"""
         if self.model_loaded:
             return
-            
+
         try:
-            print("Loading TTS model...")
-            # برای فاز اول، TTS ساده پیاده‌سازی می‌شود
-            # در فاز‌های بعدی از XTTS-v2 استفاده خواهد شد
+            logger.info("Loading TTS model", model=config.TTS_MODEL_NAME)
+            if TTS is not None:
+                self.tts_model = model_registry.acquire(self.model_key, _load_xtts)
+                self.model_lock = model_registry.lock(self.model_key)
+                self.sample_rate = self.tts_model.synthesizer.output_sample_rate
+            else:
+                # برای فاز اول، TTS ساده پیاده‌سازی می‌شود
+                logger.warning("TTS package not installed, using placeholder synthesis")
             self.model_loaded = True
-            print("TTS model loaded successfully.")
+            logger.info("TTS model loaded", sample_rate=self.sample_rate)
+            
+            if config.TTS_SPEAKER_WAV and self.speaker is None:
+                self.load_speaker_model(config.TTS_SPEAKER_WAV)
         except Exception as e:
-            print(f"Error loading TTS model: {e}")
+            logger.error("Error loading TTS model", model=config.TTS_MODEL_NAME, error=str(e))
+            metrics.ERRORS.inc(component="tts")
             raise
 
+    def release(self):
+        """آزاد کردن ارجاع این موتور به مدل مشترک"""
+        if not self.model_loaded:
+            return
+        if self.tts_model is not None:
+            model_registry.release(self.model_key)
+        self.tts_model = None
+        self.model_lock = None
+        self.model_loaded = False
+        self.sample_rate = config.SAMPLE_RATE
+
     def synthesize(self, text):
         """
-        سنتز متن به گفتار (نسخه ساده برای فاز اول)
+        سنتز متن به گفتار؛ خروجی AudioBuffer با PCM 16 بیتی مونو و نرخ self.sample_rate
+        (در صورت برخورد با کش دیسک، نمونه‌ها مستقیماً از فایل نگاشت‌شده خوانده می‌شوند)
         """
         if not text or not text.strip():
             return None
-            
+
         # بارگذاری مدل در صورت نیاز
         if not self.model_loaded:
             self._load_model()
-        
+
         try:
-            # برای فاز اول، یک فایل صوتی خالی برمی‌گردانیم
-            # در فاز‌های بعدی اینجا سنتز واقعی انجام خواهد شد
-            print(f"TTS Synthesis (placeholder): {text}")
-            
-            # ایجاد یک فایل صوتی خالی برای تست
-            audio_bytes = self._create_silent_audio(len(text) * 0.1)  # 0.1 ثانیه برای هر کاراکتر
-            return audio_bytes
-                
+            return self._synthesize_chunk(text)
+
         except Exception as e:
-            print(f"Error in TTS synthesis: {e}")
+            logger.error("Error in TTS synthesis", error=str(e))
+            metrics.ERRORS.inc(component="tts")
             return None
 
+    def synthesize_stream(self, text):
+        """
+        سنتز جمله به جمله: AudioBuffer هر جمله (یا عبارت) به محض آماده شدن yield می‌شود
+        تا پخش پیش از سنتز کل متن شروع شود
+        """
+        if not text or not text.strip():
+            return
+
+        # بارگذاری مدل در صورت نیاز
+        if not self.model_loaded:
+            self._load_model()
+
+        for piece in split_for_synthesis(text):
+            try:
+                audio = self._synthesize_chunk(piece)
+            except Exception as e:
+                logger.error("Error in TTS synthesis", error=str(e))
+                metrics.ERRORS.inc(component="tts")
+                continue
+            if len(audio) > 0:
+                yield audio
+
+    def _synthesize_chunk(self, text):
+        """سنتز یک قطعه متن (با استفاده از کش PCM برای عبارات تکراری)"""
+        start_time = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(text)
+            cached = self.cache.get(cache_key)
+            metrics.CACHE_REQUESTS.inc(cache="tts", result="miss" if cached is None else "hit")
+            if cached is not None:
+                tracing.record(tracing.current_trace(), "tts", start_time, time.perf_counter(),
+                               characters=len(text), cached=True)
+                return AudioBuffer(cached, sample_rate=self.sample_rate)
+        
+        samples = self._synthesize_uncached(text)
+        if cache_key is not None and len(samples) > 0:
+            self.cache.put(cache_key, samples)
+        audio = AudioBuffer(samples, sample_rate=self.sample_rate)
+        end_time = time.perf_counter()
+        tracing.record(tracing.current_trace(), "tts", start_time, end_time,
+                       characters=len(text), duration=audio.duration, cached=False)
+        metrics.observe_audio_stage("tts", end_time - start_time, audio.duration)
+        return audio
+
+    def _cache_key(self, text):
+        """کلید کش: متن، گوینده، زبان و مدل (به همراه نرخ نمونه خروجی)"""
+        speaker = self.speaker["hash"] if self.speaker else config.TTS_DEFAULT_SPEAKER
+        model = config.TTS_MODEL_NAME if self.tts_model is not None else "placeholder"
+        return SynthesisCache.make_key(text, speaker, config.TTS_LANGUAGE, f"{model}@{self.sample_rate}")
+
+    def _synthesize_uncached(self, text):
+        """سنتز بدون کش؛ خروجی آرایه int16"""
+        if self.tts_model is not None:
+            return self._synthesize_xtts(text)
+
+        # برای فاز اول، یک فایل صوتی خالی برمی‌گردانیم
+        logger.info("TTS Synthesis (placeholder)", text=text)
+
+        # ایجاد یک فایل صوتی خالی برای تست
+        return self._create_silent_audio(len(text) * 0.1)  # 0.1 ثانیه برای هر کاراکتر
+
+    def _synthesize_xtts(self, text):
+        """سنتز با XTTS-v2 و تبدیل خروجی float به PCM 16 بیتی"""
+        with self.model_lock, tracing.span("xtts_inference", characters=len(text)):
+            if self.speaker_latents is not None:
+                # latent های ذخیره شده مستقیماً استفاده می‌شوند و reference encoder اجرا نمی‌شود
+                output = self.tts_model.synthesizer.tts_model.inference(
+                    text,
+                    config.TTS_LANGUAGE,
+                    self.speaker_latents["gpt_cond_latent"],
+                    self.speaker_latents["speaker_embedding"]
+                )
+                wav = output["wav"]
+                if hasattr(wav, "cpu"):
+                    wav = wav.cpu().numpy()
+            else:
+                wav = self.tts_model.tts(text=text, language=config.TTS_LANGUAGE, speaker=config.TTS_DEFAULT_SPEAKER)
+
+        return AudioBuffer(np.asarray(wav, dtype=np.float32), sample_rate=self.sample_rate).as_int16()
+
     def _create_silent_audio(self, duration):
         """ایجاد صوتی خالی برای تست"""
         import numpy as np
         import wave
-        
+
         # ایجاد آرایه صفر برای مدت زمان مشخص
         sample_rate = 16000
         samples = int(duration * sample_rate)
         silent_audio = np.zeros(samples, dtype=np.int16)
+        return silent_audio
+
+    def _compute_conditioning_latents(self, audio, sample_rate):
+        """محاسبه latent های GPT و embedding گوینده با XTTS-v2 (فقط در اولین استفاده از هر نمونه)"""
+        if self.tts_model is None:
+            return {}
         
-        # تبدیل به بایت
-        audio_bytes = silent_audio.tobytes()
-        return audio_bytes
+        import torch
+        
+        xtts = self.tts_model.synthesizer.tts_model
+        audio_tensor = torch.from_numpy(audio).unsqueeze(0).to(xtts.device)
+        with self.model_lock, torch.inference_mode():
+            gpt_cond_latent = xtts.get_gpt_cond_latents(
+                audio_tensor,
+                sample_rate,
+                length=xtts.config.gpt_cond_len,
+                chunk_length=xtts.config.gpt_cond_chunk_len
+            )
+            speaker_embedding = xtts.get_speaker_embedding(audio_tensor, sample_rate)
+        return {
+            "gpt_cond_latent": gpt_cond_latent.cpu().numpy(),
+            "speaker_embedding": speaker_embedding.cpu().numpy()
+        }
 
     def load_speaker_model(self, speaker_wav_path):
-        """بارگذاری نمونه صدای کاربر (برای فاز‌های بعدی)"""
+        """بارگذاری نمونه صدای کاربر و conditioning آن از کش دیسک (یا محاسبه یک‌باره)"""
         try:
-            if os.path.exists(speaker_wav_path):
-                print(f"Speaker model loaded from: {speaker_wav_path}")
-                return True
-            else:
-                print(f"Speaker file not found: {speaker_wav_path}")
+            if not os.path.exists(speaker_wav_path):
+                logger.warning("Speaker file not found", path=speaker_wav_path)
                 return False
+            
+            if not self.model_loaded:
+                self._load_model()
+            
+            self.speaker = self.speaker_store.load(speaker_wav_path, self._compute_conditioning_latents)
+            self.speaker_latents = None
+            if self.tts_model is not None and "gpt_cond_latent" in self.speaker:
+                import torch
+                
+                device = self.tts_model.synthesizer.tts_model.device
+                self.speaker_latents = {
+                    name: torch.tensor(self.speaker[name], device=device)
+                    for name in ("gpt_cond_latent", "speaker_embedding")
+                }
+            logger.info("Speaker model loaded", path=speaker_wav_path)
+            return True
         except Exception as e:
-            print(f"Error loading speaker model: {e}")
+            logger.error("Error loading speaker model", path=speaker_wav_path, error=str(e))
+            metrics.ERRORS.inc(component="tts")
             return False
 
     def get_model_info(self):
         """دریافت اطلاعات مدل"""
         if not self.model_loaded:
             return "Model not loaded"
-        
+
+        if self.tts_model is not None:
+            return {
+                "model_name": config.TTS_MODEL_NAME,
+                "language": config.TTS_LANGUAGE,
+                "device": str(self.tts_model.synthesizer.tts_model.device),
+                "sample_rate": self.sample_rate,
+                "speaker": self.speaker["hash"][:12] if self.speaker else None,
+                "cache": self.cache.get_stats() if self.cache is not None else None
+            }
+
         return {
             "model_name": "TTS Placeholder (Phase 1)",
             "language": config.TTS_LANGUAGE,
             "device": "CPU",
-            "status": "Placeholder for future XTTS-v2 integration"
-        }
\ No newline at end of file
+            "status": "Placeholder for future XTTS-v2 integration",
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
@@ -0,0 +1,366 @@
+import contextlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import config
+from src.log import get_logger
+from src import metrics
+from src import tracing
+
+logger = get_logger("worker_pool")
+
+# متدهایی از هر جزء که از process اصلی قابل فراخوانی هستند
+_REMOTE_METHODS = {
+    "stt": {"transcribe", "transcribe_batch"},
+    "translator": {"translate", "translate_batch"},
+    "tts": {"synthesize"}
+}
+
+class WorkerCrashed(RuntimeError):
+    """worker پیش از برگرداندن نتیجه از کار افتاد"""
+
+# متغیرهای محیطی اندازه pool thread های BLAS و OpenMP
+_THREAD_LIMIT_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+@contextlib.contextmanager
+def _thread_limit_environment(threads):
+    """
+    تنظیم موقت متغیرهای محدودیت thread در process اصلی هنگام شروع worker: فرزند spawn
+    پیش از اجرای _worker_main دوباره __main__ (سرور API) را import می‌کند که numpy و torch
+    را بارگذاری می‌کند، پس این متغیرها باید از لحظه شروع process در محیط آن باشند
+    """
+    previous = {name: os.environ.get(name) for name in _THREAD_LIMIT_VARIABLES}
+    os.environ.update({name: str(threads) for name in _THREAD_LIMIT_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _limit_threads(threads):
+    """محدود کردن thread های intra-op در process worker (torch و backend ctranslate2)"""
+    config.STT_CPU_THREADS = threads
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+def _create_engine(component):
+    # import پس از تنظیم محدودیت thread ها
+    if component == "stt":
+        from src.stt_engine import STTEngine
+        return STTEngine()
+    if component == "translator":
+        from src.translator import Translator
+        return Translator()
+    if component == "tts":
+        from src.tts_engine import TTSEngine
+        return TTSEngine()
+    raise ValueError(f"Unknown worker component: {component}")
+
+def _worker_main(index, tasks, results, threads, component_names):
+    """حلقه اصلی process worker: بارگذاری مدل‌ها و اجرای کارها به ترتیب رسیدن"""
+    _limit_threads(threads)
+    from src.preloader import ModelPreloader
+
+    # فقط اجزایی که از process اصلی به pool فرستاده می‌شوند بارگذاری می‌شوند
+    components = {name: _create_engine(name) for name in component_names}
+    # بدون PRELOAD_MODELS مدل‌ها هنگام اولین کار بارگذاری می‌شوند و worker (مثل process
+    # اصلی بدون pool) آماده گزارش نمی‌شود
+    preloader = ModelPreloader(components)
+    if config.PRELOAD_MODELS:
+        preloader.start()
+        preloader.wait()
+    # metric های هر process در رجیستری خودش ثبت می‌شوند؛ تغییرات از آخرین ارسال همراه
+    # هر پیام برمی‌گردد تا در /api/metrics process اصلی دیده شوند
+    startup = {"pid": os.getpid(), "ready": preloader.is_ready(), "models": preloader.get_status()}
+    results.put((None, index, "ready", startup, metrics.registry.drain(), None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, component, method, args, kwargs, traced = task
+        # کار دارای trace در process اصلی زیر یک trace محلی اجرا می‌شود و span های آن
+        # (با pid این process به عنوان thread) همراه نتیجه برمی‌گردد
+        trace = tracing.Trace(task_id, component, {}) if traced else None
+        try:
+            with tracing.use(trace), tracing.span(f"worker:{component}.{method}", worker=index):
+                if method not in _REMOTE_METHODS.get(component, ()):
+                    raise ValueError(f"Method not allowed in worker: {component}.{method}")
+                value = getattr(components[component], method)(*args, **kwargs)
+            status = "ok"
+        except Exception as e:
+            status, value = "error", f"{type(e).__name__}: {e}"
+        spans = None
+        if trace is not None:
+            thread_name = f"inference-worker-{index}"
+            spans = [(name, start, end, os.getpid(), thread_name, span_args)
+                     for name, start, end, _, _, span_args in trace.spans]
+        results.put((task_id, index, status, value, metrics.registry.drain(), spans))
+
+    for engine in components.values():
+        engine.release()
+
+class _Worker:
+    __slots__ = ("index", "process", "tasks", "results", "pending", "ready", "state", "models",
+                 "completed", "restarts")
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.results = None
+        self.pending = {}
+        # ready فقط وقتی True است که تمام اجزای worker بارگذاری و warmup شده باشند
+        self.ready = False
+        # starting، ready، started (بدون PRELOAD_MODELS) یا error (خطا در بارگذاری یا warmup یکی از اجزا)
+        self.state = "starting"
+        # وضعیت بارگذاری/warmup هر جزء (خروجی ModelPreloader.get_status در worker)
+        self.models = {}
+        self.completed = 0
+        self.restarts = 0
+
+class RemoteEngine:
+    """نماینده یک جزء (stt، translator، tts) که فراخوانی‌ها را به worker pool می‌فرستد"""
+
+    def __init__(self, pool, component, timeout=None):
+        self.pool = pool
+        self.component = component
+        # حداکثر انتظار برای نتیجه هر فراخوانی (None = بدون محدودیت)
+        self.timeout = timeout
+
+    def __getattr__(self, method):
+        if method not in _REMOTE_METHODS.get(self.component, ()):
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self.pool.call(self.component, method, *args, timeout=self.timeout, **kwargs)
+
+class RemoteTTSEngine(RemoteEngine):
+    """نماینده TTSEngine؛ سنتز جریانی هر قطعه را جداگانه به pool می‌فرستد"""
+
+    def synthesize_stream(self, text):
+        """همان رابط TTSEngine.synthesize_stream: AudioBuffer هر قطعه به محض سنتز در worker"""
+        from src.tts_engine import split_for_synthesis
+
+        if not text or not text.strip():
+            return
+        for piece in split_for_synthesis(text):
+            audio = self.synthesize(piece)
+            if audio is not None and len(audio) > 0:
+                yield audio
+
+class WorkerPool:
+    """
+    مجموعه process های استنتاج: هر worker نسخه بارگذاری شده خود از اجزای components
+    (پیش‌فرض فقط STTEngine) را با سهم خود از THREAD_COUNT به عنوان محدودیت thread های
+    intra-op دارد. هر کار به worker با کمترین کار در انتظار داده می‌شود و worker های
+    از کار افتاده دوباره راه‌اندازی می‌شوند.
+    """
+
+    def __init__(self, num_workers=None, threads_per_worker=None, components=("stt",)):
+        self.num_workers = num_workers or config.WORKER_PROCESSES
+        self.threads_per_worker = threads_per_worker or max(1, config.THREAD_COUNT // self.num_workers)
+        self.components = tuple(components)
+        self._context = multiprocessing.get_context("spawn")
+        self.workers = [_Worker(index) for index in range(self.num_workers)]
+        self.is_running = False
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._monitor_thread = None
+
+    def start(self):
+        """راه‌اندازی worker ها و thread های جمع‌آوری نتایج و نظارت"""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            for worker in self.workers:
+                self._spawn(worker)
+
+        self._monitor_thread = threading.Thread(target=self._monitor, name="worker-pool-monitor", daemon=True)
+        self._monitor_thread.start()
+        logger.info("Worker pool started", processes=self.num_workers, threads_per_worker=self.threads_per_worker)
+
+    def _spawn(self, worker):
+        # هر worker صف‌های خود را دارد؛ صف مشترک پس از kill شدن یک worker قابل اعتماد نیست
+        worker.tasks = self._context.Queue()
+        worker.results = self._context.Queue()
+        worker.ready = False
+        worker.state = "starting"
+        worker.models = {}
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.index, worker.tasks, worker.results, self.threads_per_worker, self.components),
+            name=f"inference-worker-{worker.index}",
+            daemon=True
+        )
+        with _thread_limit_environment(self.threads_per_worker):
+            worker.process.start()
+        threading.Thread(
+            target=self._collect, args=(worker, worker.results),
+            name=f"worker-pool-results-{worker.index}", daemon=True
+        ).start()
+
+    def stop(self, timeout=5.0):
+        """توقف worker ها پس از اتمام کار فعلی"""
+        with self._lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+            for worker in self.workers:
+                worker.tasks.put(None)
+
+        for worker in self.workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            self._fail_pending(worker, WorkerCrashed("Worker pool stopped"))
+        self._monitor_thread.join(timeout=timeout)
+
+    def submit(self, component, method, *args, **kwargs):
+        """ارسال کار به worker با کمترین کار در انتظار و برگرداندن Future نتیجه"""
+        if not self.is_running:
+            self.start()
+        future = Future()
+        # span های worker به trace فعال فراخواننده اضافه می‌شوند
+        trace = tracing.current_trace()
+        with self._lock:
+            worker = min(self.workers, key=lambda w: (len(w.pending), not w.ready))
+            task_id = next(self._task_ids)
+            worker.pending[task_id] = (future, trace)
+            worker.tasks.put((task_id, component, method, args, kwargs, trace is not None))
+        return future
+
+    def call(self, component, method, *args, timeout=None, **kwargs):
+        """نسخه مسدودکننده submit"""
+        return self.submit(component, method, *args, **kwargs).result(timeout=timeout)
+
+    def engine(self, component, timeout=None):
+        """نماینده جزء با همان رابط موتور محلی (مثلاً برای STTBatchScheduler)"""
+        if component not in self.components:
+            raise ValueError(f"Component not loaded in worker pool: {component}")
+        if component == "tts":
+            return RemoteTTSEngine(self, component, timeout)
+        return RemoteEngine(self, component, timeout)
+
+    def _collect(self, worker, results):
+        # با راه‌اندازی مجدد worker صف نتایج جدید می‌شود و این thread خارج می‌شود
+        while self.is_running and worker.results is results:
+            try:
+                task_id, index, status, value, metric_deltas, spans = results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            metrics.registry.merge(metric_deltas)
+
+            if status == "ready":
+                worker.models = value["models"]
+                worker.ready = value["ready"]
+                failed_models = [name for name, model in worker.models.items() if model["state"] == "error"]
+                worker.state = "ready" if worker.ready else "error" if failed_models else "started"
+                if worker.ready:
+                    logger.info("Inference worker ready", worker=index, pid=value["pid"])
+                elif not failed_models:
+                    logger.info("Inference worker started without preloading models", worker=index, pid=value["pid"])
+                else:
+                    logger.error("Inference worker failed to load models", worker=index, pid=value["pid"],
+                                 components=",".join(failed_models))
+                    metrics.ERRORS.inc(component="worker_pool")
+                continue
+
+            with self._lock:
+                entry = worker.pending.pop(task_id, None)
+            # نتیجه کاری که worker آن قبلاً از کار افتاده بود نادیده گرفته می‌شود
+            if entry is None:
+                continue
+            future, trace = entry
+            if trace is not None and spans:
+                trace.add_spans(spans)
+            worker.completed += 1
+            if status == "ok":
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _monitor(self):
+        while self.is_running:
+            time.sleep(1.0)
+            for worker in self.workers:
+                if self.is_running and not worker.process.is_alive():
+                    self._restart(worker)
+
+    def _restart(self, worker):
+        exit_code = worker.process.exitcode
+        logger.error("Inference worker died, restarting", worker=worker.index, exit_code=exit_code)
+        metrics.ERRORS.inc(component="worker_pool")
+        # برداشتن کارهای در انتظار و جایگزینی صف و process در یک قفل: کاری که بین این دو
+        # ثبت می‌شد در صف worker مرده می‌ماند و Future آن هرگز کامل نمی‌شد
+        with self._lock:
+            pending, worker.pending = worker.pending, {}
+            if self.is_running:
+                worker.restarts += 1
+                self._spawn(worker)
+        self._fail(pending, WorkerCrashed(f"Worker {worker.index} crashed with exit code {exit_code}"))
+
+    def _fail_pending(self, worker, error):
+        with self._lock:
+            pending, worker.pending = worker.pending, {}
+        self._fail(pending, error)
+
+    @staticmethod
+    def _fail(pending, error):
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def is_ready(self):
+        """آیا تمام worker ها همه اجزای خود را با موفقیت بارگذاری و warmup کرده‌اند"""
+        return self.is_running and all(worker.ready for worker in self.workers)
+
+    def get_stats(self):
+        """وضعیت هر worker: pid، آمادگی و وضعیت مدل‌ها، کار در انتظار، کار انجام شده و تعداد راه‌اندازی مجدد"""
+        return {
+            "workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "components": list(self.components),
+            "processes": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid if worker.process is not None else None,
+                    "alive": worker.process is not None and worker.process.is_alive(),
+                    "ready": worker.ready,
+                    "state": worker.state,
+                    "models": worker.models,
+                    "pending": len(worker.pending),
+                    "completed": worker.completed,
+                    "restarts": worker.restarts
+                }
+                for worker in self.workers
+            ]
+        }
+
+# pool مشترک بین سرورهای API یک process
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """دریافت (و در صورت نیاز ایجاد) worker pool مشترک؛ با WORKER_PROCESSES = 0 غیرفعال است"""
+    global _shared_pool
+    if config.WORKER_PROCESSES <= 0:
+        return None
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            # STT (از طریق زمان‌بند batch)، ترجمه و سنتز همه در process های استنتاج اجرا می‌شوند
+            _shared_pool = WorkerPool(components=("stt", "translator", "tts"))
+        return _shared_pool
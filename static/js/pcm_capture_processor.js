@@ -0,0 +1,82 @@
+// AudioWorklet Processor - تبدیل صدای میکروفن به فریم‌های PCM 16 بیتی مونو 16kHz
+// این فایل در AudioWorkletGlobalScope اجرا می‌شود (sampleRate نرخ AudioContext است)
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const processorOptions = (options && options.processorOptions) || {};
+
+        // تنظیمات خروجی
+        this.targetSampleRate = processorOptions.targetSampleRate || 16000;
+        this.frameSize = processorOptions.frameSize || 1600;  // 100ms در 16kHz
+
+        // نسبت نرخ ورودی به خروجی؛ در AudioContext با نرخ 16kHz برابر 1 است
+        this.ratio = sampleRate / this.targetSampleRate;
+        this.position = 0;          // موقعیت کسری خواندن در بلوک فعلی (-1 یعنی آخرین نمونه بلوک قبلی)
+        this.previousSample = 0;
+
+        this.frame = new Int16Array(this.frameSize);
+        this.frameLength = 0;
+
+        // درخواست ارسال فریم ناقص هنگام توقف
+        this.port.onmessage = (event) => {
+            if (event.data === 'flush') {
+                this.flush();
+            }
+        };
+    }
+
+    pushSample(sample) {
+        // تبدیل float [-1, 1] به int16
+        const clamped = Math.max(-1, Math.min(1, sample));
+        this.frame[this.frameLength++] = clamped < 0 ? clamped * 0x8000 : clamped * 0x7FFF;
+
+        if (this.frameLength === this.frameSize) {
+            // انتقال buffer بدون کپی به thread اصلی
+            this.port.postMessage(this.frame.buffer, [this.frame.buffer]);
+            this.frame = new Int16Array(this.frameSize);
+            this.frameLength = 0;
+        }
+    }
+
+    flush() {
+        if (this.frameLength > 0) {
+            const partial = this.frame.slice(0, this.frameLength);
+            this.port.postMessage(partial.buffer, [partial.buffer]);
+            this.frameLength = 0;
+        }
+        this.port.postMessage('flushed');
+    }
+
+    process(inputs) {
+        const input = inputs[0];
+        if (!input || input.length === 0 || input[0].length === 0) {
+            return true;
+        }
+
+        // فقط کانال اول (مونو)
+        const channel = input[0];
+
+        if (this.ratio === 1) {
+            for (let i = 0; i < channel.length; i++) {
+                this.pushSample(channel[i]);
+            }
+            return true;
+        }
+
+        // تبدیل نرخ نمونه با درون‌یابی خطی
+        while (Math.floor(this.position) + 1 < channel.length) {
+            const index = Math.floor(this.position);
+            const fraction = this.position - index;
+            const current = index < 0 ? this.previousSample : channel[index];
+            const next = channel[index + 1];
+            this.pushSample(current + (next - current) * fraction);
+            this.position += this.ratio;
+        }
+        this.position -= channel.length;
+        this.previousSample = channel[channel.length - 1];
+
+        return true;
+    }
+}
+
+registerProcessor('pcm-capture-processor', PcmCaptureProcessor);
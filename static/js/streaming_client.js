@@ -0,0 +1,232 @@
+// Streaming Client - ارسال پیوسته صدای میکروفن با WebSocket و دریافت متن و ترجمه زنده
+class StreamingTranslationClient {
+    constructor(options = {}) {
+        this.socket = null;
+        this.audioStream = null;
+        this.audioContext = null;
+        this.source = null;
+        this.workletNode = null;
+        this.isStreaming = false;
+
+        // تنظیمات اتصال و صدا
+        this.config = {
+            serverUrl: options.serverUrl ||
+                `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.hostname}:5000/api/stream`,
+            processorUrl: options.processorUrl || 'static/js/pcm_capture_processor.js',
+            sampleRate: 16000,
+            frameSize: 1600  // 100ms
+        };
+
+        // callback ها
+        this.onPartial = options.onPartial || ((event) => this.showTranscript(event));
+        this.onFinal = options.onFinal || ((event) => this.showTranscript(event));
+        this.onError = options.onError || ((message) => console.error('Streaming error:', message));
+
+        // متن نهایی جملات قبلی
+        this.finalTranscripts = [];
+        this.finalTranslations = [];
+        this.partialTranslation = '';
+
+        console.log('StreamingTranslationClient initialized');
+    }
+
+    async start() {
+        try {
+            if (this.isStreaming) {
+                return true;
+            }
+
+            // دسترسی به میکروفن
+            this.audioStream = await navigator.mediaDevices.getUserMedia({
+                audio: {
+                    sampleRate: this.config.sampleRate,
+                    channelCount: 1,
+                    echoCancellation: true,
+                    noiseSuppression: true,
+                    autoGainControl: true
+                }
+            });
+
+            // AudioContext با نرخ 16kHz (در صورت عدم پشتیبانی، worklet نرخ را تبدیل می‌کند)
+            this.audioContext = new (window.AudioContext || window.webkitAudioContext)({
+                sampleRate: this.config.sampleRate
+            });
+            await this.audioContext.audioWorklet.addModule(this.config.processorUrl);
+
+            // اتصال WebSocket
+            await this.connect();
+
+            this.source = this.audioContext.createMediaStreamSource(this.audioStream);
+            this.workletNode = new AudioWorkletNode(this.audioContext, 'pcm-capture-processor', {
+                processorOptions: {
+                    targetSampleRate: this.config.sampleRate,
+                    frameSize: this.config.frameSize
+                }
+            });
+
+            // ارسال هر فریم int16 به محض آماده شدن
+            this.workletNode.port.onmessage = (event) => {
+                if (event.data === 'flushed') {
+                    this.sendStop();
+                } else if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+                    this.socket.send(event.data);
+                }
+            };
+            this.source.connect(this.workletNode);
+
+            this.isStreaming = true;
+            console.log('Streaming started');
+            return true;
+        } catch (error) {
+            console.error('Error starting stream:', error);
+            this.onError(error.message);
+            this.cleanup();
+            return false;
+        }
+    }
+
+    connect() {
+        return new Promise((resolve, reject) => {
+            let ready = false;
+            this.socket = new WebSocket(this.config.serverUrl);
+            this.socket.binaryType = 'arraybuffer';
+
+            this.socket.onmessage = (message) => {
+                const event = JSON.parse(message.data);
+                if (event.type === 'ready') {
+                    ready = true;
+                    resolve();
+                } else if (event.type === 'partial') {
+                    this.onPartial(event);
+                } else if (event.type === 'final') {
+                    if (event.text) {
+                        this.finalTranscripts.push(event.text);
+                        this.finalTranslations.push(event.translation);
+                    }
+                    this.onFinal(event);
+                } else if (event.type === 'busy') {
+                    console.warn('Server busy, audio is buffered');
+                } else if (event.type === 'error') {
+                    this.onError(event.error);
+                }
+            };
+
+            this.socket.onerror = () => reject(new Error('خطا در اتصال به سرور'));
+            this.socket.onclose = (event) => {
+                // بسته شدن پیش از 'ready' (مثلاً 503 یا توقف سرور) باید start را هم پایان دهد
+                if (!ready) {
+                    reject(new Error(`اتصال پیش از آماده شدن سرور بسته شد (کد ${event.code})`));
+                }
+                this.socket = null;
+                this.cleanup();
+            };
+        });
+    }
+
+    stop() {
+        if (!this.isStreaming) {
+            return;
+        }
+        this.isStreaming = false;
+
+        // قطع میکروفن و ارسال فریم ناقص؛ پیام stop پس از 'flushed' ارسال می‌شود
+        if (this.source) {
+            this.source.disconnect();
+            this.source = null;
+        }
+        if (this.workletNode) {
+            this.workletNode.port.postMessage('flush');
+        } else {
+            this.sendStop();
+        }
+    }
+
+    sendStop() {
+        // سرور پس از نهایی کردن آخرین جمله اتصال را می‌بندد
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ type: 'stop' }));
+        }
+    }
+
+    showTranscript(event) {
+        // ترجمه متن تأیید شده جمله فعلی فقط هنگام تغییر ارسال می‌شود
+        if (event.type === 'partial' && event.translation) {
+            this.partialTranslation = event.translation;
+        } else if (event.type === 'final') {
+            this.partialTranslation = '';
+        }
+        const currentText = event.type === 'final' ? '' : event.text;
+
+        const transcriptElement = document.getElementById('liveTranscript');
+        if (transcriptElement) {
+            transcriptElement.textContent = [...this.finalTranscripts, currentText].join(' ').trim();
+        }
+
+        const translationElement = document.getElementById('liveTranslation');
+        if (translationElement) {
+            translationElement.textContent = [...this.finalTranslations, this.partialTranslation].join(' ').trim();
+        }
+    }
+
+    cleanup() {
+        this.isStreaming = false;
+
+        if (this.workletNode) {
+            this.workletNode.port.onmessage = null;
+            this.workletNode.disconnect();
+            this.workletNode = null;
+        }
+
+        if (this.source) {
+            this.source.disconnect();
+            this.source = null;
+        }
+
+        if (this.audioStream) {
+            this.audioStream.getTracks().forEach(track => track.stop());
+            this.audioStream = null;
+        }
+
+        if (this.audioContext) {
+            this.audioContext.close();
+            this.audioContext = null;
+        }
+
+        if (this.socket) {
+            this.socket.close();
+            this.socket = null;
+        }
+
+        console.log('StreamingTranslationClient cleaned up');
+    }
+}
+
+// ایجاد instance سراسری
+window.streamingTranslationClient = new StreamingTranslationClient();
+
+// توابع سراسری برای استفاده در HTML
+window.startLiveTranslation = async function() {
+    const client = window.streamingTranslationClient;
+    client.finalTranscripts = [];
+    client.finalTranslations = [];
+
+    const success = await client.start();
+    if (success) {
+        document.getElementById('liveStartBtn').style.display = 'none';
+        document.getElementById('liveStopBtn').style.display = 'inline-block';
+        if (window.streamlitAudioRecorder) {
+            window.streamlitAudioRecorder.updateUI('recording', 'ترجمه زنده...');
+        }
+    } else {
+        alert('خطا در شروع ترجمه زنده');
+    }
+};
+
+window.stopLiveTranslation = function() {
+    window.streamingTranslationClient.stop();
+    document.getElementById('liveStartBtn').style.display = 'inline-block';
+    document.getElementById('liveStopBtn').style.display = 'none';
+    if (window.streamlitAudioRecorder) {
+        window.streamlitAudioRecorder.updateUI('ready', 'آماده برای ضبط');
+    }
+};
@@ -216,6 +216,119 @@ class StreamlitAudioRecorder {
         }
     }
     
+    async translateRecordedAudio(audioBlob, onPart) {
+        // خط لوله کامل در یک درخواست: متن فارسی، متن انگلیسی و سپس PCM هر جمله
+        // به صورت بخش‌های multipart جریانی دریافت و صدا به محض رسیدن پخش می‌شود
+        const formData = new FormData();
+        formData.append('audio', audioBlob, 'recording.webm');
+        
+        const response = await fetch('/api/translate', {
+            method: 'POST',
+            body: formData
+        });
+        
+        if (!response.ok) {
+            throw new Error('خطا در ارسال فایل به سرور');
+        }
+        if (!(response.headers.get('Content-Type') || '').startsWith('multipart/')) {
+            // خطاهای پیش از شروع پاسخ به صورت JSON برمی‌گردند
+            return await response.json();
+        }
+        
+        const result = { success: true, transcription: '', translation: '' };
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = new Uint8Array(0);
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            const merged = new Uint8Array(buffer.length + value.length);
+            merged.set(buffer);
+            merged.set(value, buffer.length);
+            buffer = merged;
+            
+            // جدا کردن بخش‌های کامل با Content-Length هدر هر بخش
+            while (true) {
+                const headerEnd = this.indexOfSequence(buffer, [13, 10, 13, 10]);
+                if (headerEnd < 0) {
+                    break;
+                }
+                const headers = decoder.decode(buffer.subarray(0, headerEnd));
+                const lengthMatch = headers.match(/Content-Length: (\d+)/i);
+                if (!lengthMatch) {
+                    // پایان پیام multipart
+                    buffer = new Uint8Array(0);
+                    break;
+                }
+                const bodyStart = headerEnd + 4;
+                const bodyEnd = bodyStart + parseInt(lengthMatch[1], 10);
+                if (buffer.length < bodyEnd + 2) {
+                    break;
+                }
+                
+                const name = headers.match(/name="([^"]+)"/)[1];
+                const payload = buffer.slice(bodyStart, bodyEnd);
+                buffer = buffer.slice(bodyEnd + 2);
+                
+                if (name === 'audio') {
+                    const rate = parseInt(headers.match(/rate=(\d+)/)[1], 10);
+                    this.playPcmChunk(payload, rate);
+                } else if (name === 'error') {
+                    const error = JSON.parse(decoder.decode(payload));
+                    result.success = false;
+                    result.error = error.error;
+                } else {
+                    result[name] = decoder.decode(payload);
+                }
+                if (onPart) {
+                    onPart(name, result);
+                }
+            }
+        }
+        
+        return result;
+    }
+    
+    indexOfSequence(bytes, sequence) {
+        for (let i = 0; i <= bytes.length - sequence.length; i++) {
+            let match = true;
+            for (let j = 0; j < sequence.length; j++) {
+                if (bytes[i + j] !== sequence[j]) {
+                    match = false;
+                    break;
+                }
+            }
+            if (match) {
+                return i;
+            }
+        }
+        return -1;
+    }
+    
+    playPcmChunk(payload, sampleRate) {
+        // پخش پشت سر هم chunk های PCM 16 بیتی بدون فاصله
+        if (!this.playbackContext) {
+            this.playbackContext = new (window.AudioContext || window.webkitAudioContext)();
+            this.playbackTime = 0;
+        }
+        const samples = new Int16Array(payload.buffer, payload.byteOffset, payload.byteLength / 2);
+        const audioBuffer = this.playbackContext.createBuffer(1, samples.length, sampleRate);
+        const channel = audioBuffer.getChannelData(0);
+        for (let i = 0; i < samples.length; i++) {
+            channel[i] = samples[i] / 32768;
+        }
+        
+        const source = this.playbackContext.createBufferSource();
+        source.buffer = audioBuffer;
+        source.connect(this.playbackContext.destination);
+        this.playbackTime = Math.max(this.playbackTime, this.playbackContext.currentTime);
+        source.start(this.playbackTime);
+        this.playbackTime += audioBuffer.duration;
+    }
+    
     cleanup() {
         this.stopAudioLevelMonitoring();
         
@@ -287,12 +400,26 @@ window.stopWebRecording = async function() {
         document.getElementById('stopBtn').style.display = 'none';
         window.streamlitAudioRecorder.updateUI('processing', 'پردازش صدا...');
         
-        // پردازش فایل صوتی
-        const result = await window.streamlitAudioRecorder.processRecordedAudio(audioBlob);
+        // ترجمه کامل روی سرور؛ متن‌ها به محض رسیدن نمایش و صدا پخش می‌شود
+        let result;
+        try {
+            result = await window.streamlitAudioRecorder.translateRecordedAudio(audioBlob, (name, partial) => {
+                if (name === 'transcription') {
+                    window.streamlitAudioRecorder.updateUI('processing', 
+                        `متن: ${partial.transcription} - در حال ترجمه...`);
+                } else if (name === 'translation') {
+                    window.streamlitAudioRecorder.updateUI('success', 
+                        `✅ ${partial.transcription} → ${partial.translation}`);
+                }
+            });
+        } catch (error) {
+            console.error('Error translating audio:', error);
+            result = { success: false, error: error.message };
+        }
         
         if (result.success) {
             window.streamlitAudioRecorder.updateUI('success', 
-                `✅ متن تشخیص داده شد: ${result.transcription}`);
+                `✅ ${result.transcription} → ${result.translation}`);
         } else {
             window.streamlitAudioRecorder.updateUI('error', 
                 `❌ خطا: ${result.error}`);